@@ -0,0 +1,50 @@
+"""Full daily traces vs LTTB-thinned ones: points, Plotly JSON size and peak retention
+(the thinning itself is checked in tests/test_downsampling.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_downsampling.py [n_days]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from downsampling import bar_widths, downsample
+
+
+def figure(frame, thinned):
+    """The Daily Steps bars as dashboard.py draws them"""
+    return go.Figure(go.Bar(
+        x=frame['Date'],
+        y=frame['Step count'],
+        width=bar_widths(frame['Date']) if thinned else None,
+        offset=0 if thinned else None,
+    ))
+
+
+def main():
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n_days, freq='D')
+    daily = pd.DataFrame({'Date': dates, 'Step count': rng.gamma(4, 2500, n_days).astype(np.int32)})
+    # A handful of isolated record days a bucket average would flatten
+    spikes = rng.choice(n_days, 5, replace=False)
+    daily.loc[spikes, 'Step count'] = rng.integers(40000, 60000, len(spikes)).astype(np.int32)
+
+    seconds, thinned = timed(lambda: downsample(daily, 'Step count'))
+    full_json = figure(daily, False).to_json()
+    thin_json = figure(thinned, len(thinned) < n_days).to_json()
+
+    kept = np.isin(spikes, thinned.index).sum()
+    print(f"{n_days:,} days -> {len(thinned):,} points in {seconds * 1000:.1f}ms, kept {kept} of {len(spikes)} spikes")
+    print(f"Plotly JSON: {len(full_json) / 1e3:8.1f} kB full  {len(thin_json) / 1e3:8.1f} kB thinned")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Per-rerun cost of the sidebar filters.
+
+Run from the repository root:
+
+    python benchmarks/bench_filters.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_preprocessing import make_frame
+from filters import category_mask, date_slice
+from preprocessing import activity_bits, activity_type, add_activity_columns
+
+
+def timed(fn, repeat=5):
+    """Best wall time of fn() over a few runs, and its last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy(df, date_range, selected_activities, selected_locations):
+    """The original sidebar filter block from dashboard.py"""
+    if len(date_range) == 2:
+        filtered_df = df[
+            (df['Date'] >= pd.Timestamp(date_range[0])) &
+            (df['Date'] <= pd.Timestamp(date_range[1]))
+        ]
+    else:
+        filtered_df = df.copy()
+
+    if selected_activities:
+        def activity_matches(activity_type_str):
+            activities_in_row = [a.strip() for a in activity_type_str.split(',')]
+            return any(act in activities_in_row for act in selected_activities)
+        filtered_df = filtered_df[filtered_df['Activity Type'].apply(activity_matches)]
+
+    if selected_locations:
+        # The old frame held Location as plain strings
+        locations = filtered_df['Location'].astype(object)
+        filtered_df = filtered_df[locations.isin(selected_locations) | (locations == "Unknown")]
+    return filtered_df
+
+
+def make_filter_frame(n_rows):
+    """Synthetic intervals with the columns the filters read, in date order like load_data()"""
+    df = make_frame(n_rows)
+    add_activity_columns(df)
+    df['Activity Type'] = activity_type(df['Activity Mask'].to_numpy())
+    # Roughly ten years of 15-minute intervals at a million rows
+    df['Date'] = pd.Timestamp('2015-01-01') + pd.to_timedelta(np.arange(n_rows) // 96, unit='D')
+    df['Location'] = pd.Categorical(
+        np.where(df['Low latitude (deg)'].isna(), 'Unknown', 'Place ' + (np.arange(n_rows) % 300).astype(str))
+    )
+    return df
+
+
+def bench_activity_filter(df, selected):
+    def string_split():
+        def activity_matches(activity_type_str):
+            activities_in_row = [a.strip() for a in activity_type_str.split(',')]
+            return any(act in activities_in_row for act in selected)
+        return df[df['Activity Type'].apply(activity_matches)]
+
+    def bitmask():
+        return df[(df['Activity Mask'].to_numpy() & activity_bits(selected)) != 0]
+
+    old, old_result = timed(string_split, repeat=2)
+    new, new_result = timed(bitmask)
+    assert old_result.index.equals(new_result.index)
+    print(f"activity filter  split: {old * 1000:9.1f}ms  bitmask: {new * 1000:7.1f}ms  ({old / new:.0f}x)")
+
+
+def bench_date_filter(df, start, end):
+    def boolean_masks():
+        return df[(df['Date'] >= start) & (df['Date'] <= end)]
+
+    def binary_search():
+        return date_slice(df, start, end)
+
+    old, old_result = timed(boolean_masks)
+    new, new_result = timed(binary_search)
+    assert old_result.index.equals(new_result.index)
+    print(f"date filter      masks: {old * 1000:9.1f}ms  slice:   {new * 1000:7.3f}ms  ({old / new:.0f}x)")
+
+
+def bench_location_filter(df, selected):
+    # The old frame held Location as plain strings
+    names = df['Location'].astype(object)
+
+    def isin():
+        return (names.isin(selected) | (names == "Unknown")).to_numpy()
+
+    def codes():
+        return category_mask(df['Location'], selected + ["Unknown"])
+
+    old, old_mask = timed(isin)
+    new, new_mask = timed(codes)
+    assert (old_mask == new_mask).all()
+    print(f"location mask    isin:  {old * 1000:9.1f}ms  codes:   {new * 1000:7.1f}ms  ({old / new:.0f}x)")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = make_filter_frame(n_rows)
+    print(f"{n_rows:,} rows")
+
+    bench_activity_filter(df, ['Cycling', 'Running'])
+    end = df['Date'].iloc[-1]
+    bench_date_filter(df, end - pd.Timedelta(days=29), end)
+    bench_location_filter(df, [f"Place {i}" for i in range(10)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Server time of a heatmap metric switch, measured against a live Streamlit server.
+
+Starts `streamlit run dashboard.py` headless, talks to it over the browser's
+websocket protocol and times each interaction from the rerun request to the
+script_finished message. Run from the repository root, with the data in place:
+
+    python benchmarks/bench_fragments.py [switches]
+
+Since the sections became fragments the switch reruns only the calendar
+section; on an older checkout the same interaction reruns the whole script,
+which gives the "before" number.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRIC_LABEL = "Select Metric"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def wait_healthy(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health") as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("Streamlit server did not come up")
+
+
+async def rerun(ws, widget_states=(), fragment_id=''):
+    """Request a rerun and return (seconds until it finished, ForwardMsgs received)"""
+    msg = BackMsg()
+    msg.rerun_script.fragment_id = fragment_id
+    for widget_id, value in widget_states:
+        state = msg.rerun_script.widget_states.widgets.add()
+        state.id = widget_id
+        state.string_value = value
+    start = time.perf_counter()
+    await ws.send(msg.SerializeToString())
+    received = []
+    while True:
+        fwd = ForwardMsg()
+        fwd.ParseFromString(await ws.recv())
+        received.append(fwd)
+        if fwd.WhichOneof('type') == 'script_finished':
+            if fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - start, received
+
+
+def metric_selectbox(messages):
+    """Widget id, options and enclosing fragment id of the heatmap metric selectbox"""
+    for fwd in messages:
+        if fwd.WhichOneof('type') != 'delta' or fwd.delta.WhichOneof('type') != 'new_element':
+            continue
+        element = fwd.delta.new_element
+        if element.WhichOneof('type') == 'selectbox' and element.selectbox.label == METRIC_LABEL:
+            return element.selectbox.id, list(element.selectbox.options), fwd.delta.fragment_id
+    raise RuntimeError(f"no '{METRIC_LABEL}' selectbox on the page")
+
+
+async def measure(port, switches):
+    url = f"ws://localhost:{port}/_stcore/stream"
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None) as ws:
+        first, messages = await rerun(ws)
+        widget_id, options, fragment_id = metric_selectbox(messages)
+        print(f"first full run: {first * 1000:.0f}ms")
+        print(f"metric selectbox is {'inside fragment ' + fragment_id if fragment_id else 'not in a fragment'}")
+
+        times = []
+        for i in range(switches):
+            option = options[(i + 1) % len(options)]
+            seconds, _ = await rerun(ws, [(widget_id, option)], fragment_id)
+            times.append(seconds)
+        times.sort()
+        print(f"{switches} metric switches: median {times[len(times) // 2] * 1000:.0f}ms, best {times[0] * 1000:.0f}ms")
+
+
+def main():
+    switches = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', 'dashboard.py',
+         '--server.headless', 'true', '--server.port', str(port),
+         '--browser.gatherUsageStats', 'false'],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_healthy(port)
+        asyncio.run(measure(port, switches))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
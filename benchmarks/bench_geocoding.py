@@ -0,0 +1,95 @@
+"""Serial vs pooled Nominatim lookups against a local stub server.
+
+Run from the repository root:
+
+    python benchmarks/bench_geocoding.py [n_coords]
+
+or keep the stub running and point the dashboard at it:
+
+    python benchmarks/bench_geocoding.py --serve 8088
+    VERVE_NOMINATIM_URL=http://localhost:8088 streamlit run dashboard.py
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from geopy.geocoders import Nominatim
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocoding import LOOKUP_FAILED, nominatim_reverse, reverse_many
+
+# Simulated provider behaviour
+LATENCY = 0.2
+FAILURE_RATE = 0.1
+
+
+class StubNominatim(BaseHTTPRequestHandler):
+    """Answers /reverse like Nominatim, with latency and occasional 503s"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/reverse':
+            self.send_error(404)
+            return
+        time.sleep(LATENCY)
+        if random.random() < FAILURE_RATE:
+            self.send_error(503)
+            return
+        query = parse_qs(url.query)
+        lat, lon = float(query['lat'][0]), float(query['lon'][0])
+        body = json.dumps({
+            'lat': str(lat),
+            'lon': str(lon),
+            'display_name': f"Stub {lat:.2f} {lon:.2f}",
+            'address': {'city': f"Stub {lat:.2f} {lon:.2f}", 'country': 'Stubland'},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubNominatim)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--serve':
+        server = start_stub(int(sys.argv[2]))
+        print(f"Stub Nominatim on http://localhost:{server.server_port}")
+        threading.Event().wait()
+
+    n_coords = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    server = start_stub()
+    geocoder = Nominatim(user_agent="Verve_benchmark", domain=f"127.0.0.1:{server.server_port}", scheme='http')
+    lookup = partial(nominatim_reverse, geocoder)
+    coords = [(round(random.uniform(-60, 60), 2), round(random.uniform(-150, 150), 2)) for _ in range(n_coords)]
+
+    # The stub has no usage policy, so allow a generous rate to measure the pool itself
+    for label, workers in [('serial', 1), ('pooled', 8)]:
+        start = time.perf_counter()
+        results = reverse_many(lookup, coords, max_workers=workers, rate=50, backoff=0.05)
+        elapsed = time.perf_counter() - start
+        resolved = sum(label not in (None, LOOKUP_FAILED) for label in results.values())
+        print(f"{label:>7}: {elapsed:6.2f}s, {resolved}/{n_coords} resolved")
+
+    start = time.perf_counter()
+    reverse_many(lookup, coords[:10], max_workers=8, rate=5, backoff=0.05)
+    print(f"rate=5/s, 10 lookups: {time.perf_counter() - start:.2f}s (expect >= ~1.8s)")
+
+
+if __name__ == '__main__':
+    main()
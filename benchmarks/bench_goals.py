@@ -0,0 +1,83 @@
+"""Per-row goal streak loops vs one vectorized pass (parity is checked in tests/test_goals.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_goals.py [n_days]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from streaks import goal_progress
+
+GOALS = [('Step count', 10000), ('Heart Points', 21)]
+
+
+def legacy(daily_agg):
+    """The original iterrows() goal streaks from dashboard.py"""
+    steps_goal_streak = 0
+    if len(daily_agg) > 0:
+        sorted_agg = daily_agg.sort_values('Date', ascending=False)
+        for _, row in sorted_agg.iterrows():
+            if row['Step count'] >= 10000:
+                steps_goal_streak += 1
+            else:
+                break
+
+    heart_goal_streak = 0
+    if len(daily_agg) > 0:
+        for _, row in sorted_agg.iterrows():
+            if row['Heart Points'] >= 21:
+                heart_goal_streak += 1
+            else:
+                break
+    return steps_goal_streak, heart_goal_streak
+
+
+def vectorized(daily_agg):
+    goals = goal_progress(daily_agg, GOALS).set_index('metric')
+    return int(goals.at['Step count', 'trailing']), int(goals.at['Heart Points', 'trailing'])
+
+
+def reference_best(hits):
+    """Longest run of consecutive hits, by a plain loop"""
+    best = run = 0
+    for hit in hits:
+        run = run + 1 if hit else 0
+        best = max(best, run)
+    return best
+
+
+def make_days(n_days, hit_rate, rng):
+    """Date-sorted daily totals with some days missing from the rollup"""
+    dates = pd.date_range('2020-01-01', periods=n_days, freq='D')
+    keep = rng.random(n_days) < 0.9
+    steps = np.where(rng.random(n_days) < hit_rate, rng.integers(10000, 20000, n_days), rng.integers(0, 10000, n_days))
+    heart = np.where(rng.random(n_days) < hit_rate, rng.uniform(21, 60, n_days), rng.uniform(0, 21, n_days))
+    return pd.DataFrame({
+        'Date': dates[keep],
+        'Step count': steps[keep].astype(np.int32),
+        'Heart Points': heart[keep].astype(np.float32),
+    })
+
+
+def main():
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    rng = np.random.default_rng(0)
+
+    # Every day hits both goals: the loops walk back through all of them
+    df = make_days(n_days, 1.0, rng)
+    old, old_result = timed(lambda: legacy(df), repeat=1)
+    new, new_result = timed(lambda: vectorized(df))
+    assert old_result == new_result
+    print(f"{len(df):,} days, streaks {new_result}")
+    print(f"iterrows loops: {old * 1000:9.1f}ms  vectorized: {new * 1000:6.2f}ms  ({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Per-rerun calendar pivots vs precomputed heatmap grids (parity is checked in tests/test_heatmap.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_heatmap.py [years]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from rollups import heatmap_grids, heatmap_matrix
+
+
+def legacy(daily_agg, year, metric, year_start, year_end):
+    """The original complete-calendar merge and pivot from dashboard.py"""
+    year_data = daily_agg[daily_agg['Date'].dt.year == year].copy()
+    all_dates = pd.date_range(start=year_start, end=year_end, freq='D')
+
+    complete_calendar = pd.DataFrame({'Date': all_dates})
+    complete_calendar['Week'] = complete_calendar['Date'].dt.isocalendar().week
+    complete_calendar['Day'] = complete_calendar['Date'].dt.dayofweek
+    complete_calendar['Month'] = complete_calendar['Date'].dt.month
+
+    complete_calendar = complete_calendar.merge(year_data[['Date', metric]], on='Date', how='left')
+    complete_calendar[metric] = complete_calendar[metric].fillna(0)
+
+    return complete_calendar.pivot_table(index='Day', columns='Week', values=metric, aggfunc='sum')
+
+
+def make_daily(years, rng):
+    """Daily totals ending today, with some days missing"""
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=years * 365, freq='D')
+    dates = dates[rng.random(len(dates)) < 0.9]
+    return pd.DataFrame({
+        'Date': dates,
+        'Total Exercise (min)': rng.uniform(0, 120, len(dates)).astype(np.float32),
+        'Step count': rng.integers(0, 20000, len(dates)),
+        'Calories (kcal)': rng.uniform(1500, 3500, len(dates)).astype(np.float32),
+    })
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rng = np.random.default_rng(0)
+    daily = make_daily(years, rng)
+    grids = heatmap_grids(daily)
+
+    # One multi-year render: every year's heatmap for one metric
+    def pivots():
+        return [legacy(daily, year, 'Step count', pd.Timestamp(f"{year}-01-01"), pd.Timestamp(f"{year}-12-31"))
+                for year in grids]
+
+    def lookups():
+        return [heatmap_matrix(grids[year], 'Step count', f"{year}-01-01", f"{year}-12-31") for year in grids]
+
+    old, _ = timed(pivots, repeat=3)
+    new, _ = timed(lookups)
+    build, _ = timed(lambda: heatmap_grids(daily), repeat=3)
+    print(f"{len(grids)} years, {len(daily):,} days")
+    print(f"merge + pivot per rerun: {old * 1000:7.1f}ms  grid lookup: {new * 1000:5.2f}ms  ({old / new:.0f}x)")
+    print(f"building every (year, metric) grid once: {build * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
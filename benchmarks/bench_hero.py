@@ -0,0 +1,72 @@
+"""Hero stat totals: summing the filtered daily frame vs the running-totals index
+(parity is checked in tests/test_hero.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_hero.py [years]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from filters import apply_filters
+from rollups import DAILY_METRICS, DailyPrefix
+
+
+def make_daily(years, rng):
+    """Per-day totals with a tenth of the days missing, as after a location filter"""
+    dates = pd.date_range(end=pd.Timestamp('2024-12-31'), periods=years * 365, freq='D')
+    dates = dates[rng.random(len(dates)) > 0.1]
+    n = len(dates)
+    return pd.DataFrame({
+        'Date': dates,
+        'Step count': rng.integers(0, 20000, n).astype(np.int64),
+        'Calories (kcal)': rng.uniform(1500, 3000, n).astype(np.float32),
+        'Distance (m)': rng.uniform(0, 15000, n).astype(np.float32),
+        'Heart Points': rng.uniform(0, 60, n).astype(np.float32),
+        'Total Exercise (min)': np.where(rng.random(n) < 0.3, 0, rng.uniform(0, 120, n)).astype(np.float32),
+    })
+
+
+def legacy(daily, date_range):
+    """The original hero stat sums from dashboard.py"""
+    daily = apply_filters(daily, date_range, [], [])
+    totals = {metric: daily[metric].sum() for metric in DAILY_METRICS}
+    totals['days'] = len(daily)
+    totals['active_days'] = len(daily[daily['Total Exercise (min)'] > 0])
+    return totals
+
+
+def date_ranges(daily, rng, n_random=200):
+    """All time, the whole span, the last week, ranges hanging off either end and random ones"""
+    first, last = daily['Date'].iloc[0], daily['Date'].iloc[-1]
+    ranges = [[], [first, last], [last - pd.Timedelta(days=6), last],
+              [first - pd.Timedelta(days=30), first + pd.Timedelta(days=3)],
+              [last + pd.Timedelta(days=1), last + pd.Timedelta(days=9)]]
+    for _ in range(n_random):
+        start = first + pd.Timedelta(days=int(rng.integers(0, len(daily))))
+        ranges.append([start, start + pd.Timedelta(days=int(rng.integers(0, 3 * 365)))])
+    return ranges
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rng = np.random.default_rng(0)
+    daily = make_daily(years, rng)
+    build, prefix = timed(lambda: DailyPrefix(daily), repeat=3)
+    ranges = date_ranges(daily, rng)
+
+    old, _ = timed(lambda: [legacy(daily, r) for r in ranges], repeat=3)
+    new, _ = timed(lambda: [prefix.totals(r) for r in ranges], repeat=3)
+    print(f"{years} years, {len(daily):,} days, {len(ranges)} date ranges")
+    print(f"index build: {build * 1000:.2f}ms")
+    print(f"per range: sum {old / len(ranges) * 1e6:7.1f}us  prefix {new / len(ranges) * 1e6:6.1f}us  ({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
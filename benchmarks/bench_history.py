@@ -0,0 +1,77 @@
+"""Whole-frame Parquet load vs memory-mapped year partitions for a 30-day view.
+
+Run from the repository root:
+
+    python benchmarks/bench_history.py [years]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from bench_memory import compact
+from bench_parse import write_export
+from filters import date_slice
+from schema import read_export
+from storage import YearPartitions, write_parts
+
+
+def measured(fn):
+    """Best wall time of fn() and the peak Python-heap allocation of one call
+
+    Arrow's own buffers and mapped pages are not counted, which flatters
+    the Parquet read more than the partitions.
+    """
+    seconds, result = timed(fn, repeat=3)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_rows = years * 365 * 96
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'export.csv')
+        write_export(csv_path, n_rows)
+        df = compact(read_export(csv_path))
+        end = df['Date'].iloc[-1]
+        start = end - pd.Timedelta(days=29)
+
+        parquet_path = os.path.join(tmp, 'frame.parquet')
+        df.to_parquet(parquet_path, index=False)
+        parts = write_parts(os.path.join(tmp, 'history'), df, 'part-00000')
+        locations = sorted(df['Location'].unique())
+        del df
+
+        def whole_frame():
+            return date_slice(pd.read_parquet(parquet_path), start, end)
+
+        def partitions():
+            history = YearPartitions(os.path.join(tmp, 'history'), parts, locations)
+            return history.read_range(start, end)
+
+        print(f"{years} years, {n_rows:,} rows, last 30 days")
+        results = []
+        for name, fn in [('parquet whole frame', whole_frame), ('mmap year partitions', partitions)]:
+            seconds, peak, result = measured(fn)
+            results.append(result)
+            print(f"{name:>21}: {seconds * 1000:8.1f}ms  heap peak {peak / 1e6:7.1f} MB")
+        pd.testing.assert_frame_equal(
+            results[0].reset_index(drop=True), results[1], check_categorical=False
+        )
+
+        history = YearPartitions(os.path.join(tmp, 'history'), parts, locations)
+        seconds, _ = timed(lambda: (history.min_date, history.max_date, len(history)))
+        print(f"{'sidebar bounds':>21}: {seconds * 1e6:8.1f}us  (manifest only)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Top Locations: groupby over the filtered interval rows vs the location index
+(parity is checked in tests/test_locations.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_locations.py [years] [locations]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from filters import apply_filters
+from preprocessing import ACTIVITY_COLUMNS
+from rollups import LOCATION_STATS, LocationIndex
+
+ROWS_PER_DAY = 96
+
+
+def make_rows(years, n_locations, rng):
+    """15-minute interval rows, each at one of n_locations places or Unknown"""
+    dates = pd.date_range(end=pd.Timestamp('2024-12-31'), periods=years * 365, freq='D')
+    n = len(dates) * ROWS_PER_DAY
+    names = np.array(['Unknown'] + [f"Place {i}" for i in range(n_locations)])
+    # Mostly Unknown, the rest skewed towards a few favourite places
+    place = np.where(rng.random(n) < 0.6, 0, 1 + np.minimum(rng.zipf(1.3, n) - 1, n_locations - 1))
+    return pd.DataFrame({
+        'Date': np.repeat(dates, ROWS_PER_DAY),
+        'Activity Mask': rng.integers(0, 1 << len(ACTIVITY_COLUMNS), n).astype(np.uint8),
+        'Location': pd.Categorical(names[place], categories=names),
+        'Total Exercise (min)': rng.uniform(0, 15, n).astype(np.float32),
+        'Step count': rng.integers(0, 1500, n).astype(np.int32),
+        'Calories (kcal)': rng.uniform(10, 40, n).astype(np.float32),
+    })
+
+
+def legacy(rows, date_range, activities, locations):
+    """The original Top Locations groupby from dashboard.py"""
+    filtered = apply_filters(rows, date_range, activities, locations)
+    stats = filtered.groupby('Location', observed=True).agg({
+        'Total Exercise (min)': 'sum',
+        'Step count': 'sum',
+        'Calories (kcal)': 'sum'
+    }).reset_index()
+    stats = stats[stats['Location'] != 'Unknown']
+    return stats.sort_values('Total Exercise (min)', ascending=False).head(5)
+
+
+def location_rollup(rows):
+    """Per-day, per-activity-mask, per-location sums, as the daily rollup holds them"""
+    keys = ['Date', 'Activity Mask', 'Location']
+    return rows.groupby(keys, observed=True, sort=True)[LOCATION_STATS].sum().reset_index()
+
+
+def selections(rows):
+    """Sidebar selections as (date_range, activities, locations), by name"""
+    last = rows['Date'].iloc[-1]
+    return {
+        'all time': ([], [], []),
+        'last 30 days': ([last - pd.Timedelta(days=29), last], [], []),
+        'one activity': ([last - pd.Timedelta(days=364), last], [ACTIVITY_COLUMNS[0][0]], []),
+        'ten places': ([], [], [f"Place {i}" for i in range(0, 200, 20)]),
+    }
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n_locations = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    rng = np.random.default_rng(0)
+    rows = make_rows(years, n_locations, rng)
+    rollup = location_rollup(rows)
+
+    build, index = timed(lambda: LocationIndex(rollup), repeat=1)
+    print(f"{years} years, {len(rows):,} interval rows, {n_locations:,} locations, {len(rollup):,} rollup rows")
+    print(f"index build: {build * 1000:.1f}ms")
+    for name, (date_range, activities, locations) in selections(rows).items():
+        old, _ = timed(lambda: legacy(rows, date_range, activities, locations), repeat=3)
+        new, _ = timed(lambda: index.top(date_range, activities, locations), repeat=3)
+        print(f"{name:13s} groupby {old * 1000:8.2f}ms  index {new * 1000:7.2f}ms  ({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""One marker per GPS fix vs the stored grid cells of the map rollup per zoom: markers and payload
+(totals are checked in tests/test_spatial.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_map.py [years]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from filters import apply_filters
+from spatial import MAP_COORDS, MAP_SUMS, build_map_rollup, map_cells, split_levels, stored_level
+
+# Home towns the synthetic fixes scatter around
+CENTRES = [(51.5074, -0.1278), (48.8566, 2.3522), (40.7128, -74.0060), (35.6762, 139.6503)]
+
+
+def make_points(years, rng):
+    """Rows with coordinates: a few fixes a day spread a few km around each centre"""
+    n = years * 365 * 8
+    centre = rng.integers(0, len(CENTRES), n)
+    lat = np.array([c[0] for c in CENTRES])[centre] + rng.normal(0, 0.03, n)
+    lon = np.array([c[1] for c in CENTRES])[centre] + rng.normal(0, 0.05, n)
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2024-12-31') - pd.to_timedelta(np.sort(rng.integers(0, years * 365, n))[::-1], unit='D'),
+        'Activity Mask': rng.integers(1, 16, n).astype(np.uint8),
+        'Low latitude (deg)': lat,
+        'Low longitude (deg)': lon,
+        'Location': pd.Categorical(np.array(['London', 'Paris', 'New York', 'Tokyo'])[centre]),
+        'Total Exercise (min)': rng.uniform(0, 15, n).astype(np.float32),
+        'Calories (kcal)': rng.uniform(10, 40, n).astype(np.float32),
+        'Step count': rng.integers(0, 1500, n).astype(np.int32),
+    })
+
+
+def legacy(points):
+    """The original per-fix groupby from dashboard.py"""
+    return points.groupby(['Low latitude (deg)', 'Low longitude (deg)', 'Location'], observed=True).agg({
+        'Total Exercise (min)': 'sum',
+        'Calories (kcal)': 'sum',
+        'Step count': 'sum'
+    }).reset_index()
+
+
+def payload(cells):
+    """Plotly JSON size of the map trace built from cells"""
+    return len(go.Figure(go.Scattermapbox(
+        lat=cells[MAP_COORDS[0]],
+        lon=cells[MAP_COORDS[1]],
+        text=cells['Location'],
+        customdata=np.column_stack([cells[col] for col in MAP_SUMS]),
+    )).to_json())
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rng = np.random.default_rng(0)
+    points = make_points(years, rng)
+    build, rollup = timed(lambda: build_map_rollup(points), repeat=1)
+    levels = split_levels(rollup)
+
+    # The last year, as the sidebar would filter it
+    date_range = [points['Date'].max() - pd.Timedelta(days=364), points['Date'].max()]
+    old, per_fix = timed(lambda: legacy(apply_filters(points, date_range, [], [])), repeat=3)
+
+    print(f"{years} years, {len(points):,} rows with coordinates, {len(rollup):,} map rollup rows ({build * 1000:.0f}ms)")
+    print("stored rows per level: " + ", ".join(f"{level}: {len(rows):,}" for level, rows in levels.items()))
+    print(f"last year per-fix markers: {len(per_fix):7,}  {payload(per_fix) / 1e6:6.2f} MB  {old * 1000:6.1f}ms")
+    for zoom in (3, 8, 12, 16):
+        rows = levels[stored_level(zoom)]
+        new, cells = timed(lambda: map_cells(apply_filters(rows, date_range, [], []), zoom), repeat=3)
+        print(f"zoom {zoom:2d} cells:           {len(cells):7,}  {payload(cells) / 1e6:6.2f} MB  {new * 1000:6.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
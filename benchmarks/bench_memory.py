@@ -0,0 +1,82 @@
+"""Per-column memory of the enriched frame, old layout vs compact layout.
+
+Run from the repository root:
+
+    python benchmarks/bench_memory.py [n_rows]
+"""
+import os
+import pickle
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from bench_parse import write_export
+from preprocessing import (
+    ACTIVITY_COLUMNS, DAY_NAMES, MONTH_NAMES, activity_type, add_activity_columns, add_calendar_columns,
+)
+from schema import read_export
+
+
+def compact(raw):
+    """The enriched frame as build_data() lays it out now"""
+    df = raw.copy()
+    df['Hour'] = (df['Start time'] // 3600).astype('Int8')
+    add_activity_columns(df)
+    df['Total Exercise (min)'] = df[[col for _, col in ACTIVITY_COLUMNS]].fillna(0).sum(axis=1) / 60000
+    names = np.where(df['Low latitude (deg)'].isna(), 'Unknown', 'Place ' + (np.arange(len(df)) % 300).astype(str))
+    df['Location'] = pd.Categorical(names)
+    add_calendar_columns(df)
+    return df
+
+
+def legacy(df):
+    """The same rows with the dtypes load_data() used to produce"""
+    old = df.copy()
+    for col in old.columns:
+        if old[col].dtype in ('float32', 'int32'):
+            old[col] = old[col].astype('float64')
+    for col in ('Start time', 'End time'):
+        old[col] = pd.to_datetime(old[col], unit='s')
+    old['Hour'] = old['Hour'].astype('float64')
+    old['Activity Type'] = activity_type(old.pop('Activity Mask').to_numpy())
+    old['Primary Activity'] = old['Primary Activity'].astype(object)
+    old['Location'] = old['Location'].astype(object)
+    old['Year'] = old['Year'].astype('int32')
+    old['Month'] = old['Month'].astype('int32')
+    old['Month Name'] = np.array(MONTH_NAMES, dtype=object)[old['Month'] - 1]
+    old['Day of Week'] = old['Day of Week'].astype('int32')
+    old['Day Name'] = np.array(DAY_NAMES, dtype=object)[old['Day of Week']]
+    old['Week'] = old['Week'].astype('UInt32')
+    return old
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.csv')
+        write_export(path, n_rows)
+        new = compact(read_export(path))
+    old = legacy(new)
+
+    columns = old.columns.union(new.columns, sort=False)
+    before = old.memory_usage(deep=True, index=False).reindex(columns, fill_value=0)
+    after = new.memory_usage(deep=True, index=False).reindex(columns, fill_value=0)
+    print(f"{'column':<28}{'before MB':>10}{'after MB':>10}  after dtype")
+    for col in columns:
+        dtype = new[col].dtype if col in new else '(derived on demand)'
+        print(f"{col:<28}{before[col] / 1e6:10.1f}{after[col] / 1e6:10.1f}  {dtype}")
+    print(f"{'total':<28}{before.sum() / 1e6:10.1f}{after.sum() / 1e6:10.1f}  ({before.sum() / after.sum():.1f}x smaller)")
+
+    # st.cache_data hands out a pickled copy of the frame on every access
+    for name, frame in [('before', old), ('after', new)]:
+        seconds, blob = timed(lambda: pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL), repeat=3)
+        print(f"pickle {name:>6}: {len(blob) / 1e6:7.1f} MB in {seconds * 1000:6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Inferred-dtype CSV parse vs the declared export schema.
+
+Run from the repository root:
+
+    python benchmarks/bench_parse.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from schema import EXPORT_DTYPES, read_export
+
+
+def write_export(path, n_rows, seed=0):
+    """Synthetic Google Fit export with the real column set and formats"""
+    rng = np.random.default_rng(seed)
+    slot = np.arange(n_rows)
+    dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(slot // 96, unit='D')
+    starts = pd.to_datetime((slot % 96) * 900, unit='s')
+    df = pd.DataFrame({
+        'Date': dates.strftime('%d/%m/%y'),
+        'Start time': starts.strftime('%H:%M:%S.000'),
+        'End time': (starts + pd.Timedelta(minutes=15)).strftime('%H:%M:%S.000'),
+    })
+    for col in list(EXPORT_DTYPES)[3:]:
+        values = rng.uniform(0, 1000, n_rows)
+        if col.endswith('(ms)') or col in ('Step count', 'Move Minutes count', 'Heart Minutes'):
+            values = values.round()
+        values[rng.random(n_rows) < 0.5] = np.nan
+        df[col] = values
+    df.to_csv(path, index=False)
+
+
+def inferred(path):
+    """What load_data() did before: infer every dtype, then parse dates and times"""
+    df = pd.read_csv(path, sep=',')
+    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, format='%d/%m/%y')
+    df['Start time'] = pd.to_datetime(df['Start time'], format='%H:%M:%S.%f', errors='coerce')
+    df['End time'] = pd.to_datetime(df['End time'], format='%H:%M:%S.%f', errors='coerce')
+    return df
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.csv')
+        write_export(path, n_rows)
+        print(f"{n_rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB CSV")
+
+        cases = [('inferred', lambda: inferred(path))]
+        for engine in ('c', 'pyarrow'):
+            cases.append((f"schema/{engine}", lambda engine=engine: read_export(path, engine=engine)))
+
+        baseline = None
+        for name, fn in cases:
+            seconds, df = timed(fn, repeat=3)
+            memory = df.memory_usage(deep=True).sum() / 1e6
+            baseline = baseline or (seconds, memory)
+            print(
+                f"{name:>15}: {seconds:6.2f}s ({baseline[0] / seconds:4.1f}x)  "
+                f"{memory:7.0f} MB ({baseline[1] / memory:4.1f}x smaller)"
+            )
+
+
+if __name__ == '__main__':
+    main()
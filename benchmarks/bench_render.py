@@ -0,0 +1,90 @@
+"""Browser-side render time of the stacked exercise chart, SVG vs WebGL.
+
+A Streamlit page; run from the repository root with:
+
+    streamlit run benchmarks/bench_render.py
+
+The timings come from performance.now() around Plotly.newPlot in the
+browser, so they cover layout and drawing, not the Python side.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+import streamlit.components.v1 as components
+from plotly.offline import get_plotlyjs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import stacked_area_traces
+
+# The dashboard's stack colours
+LAYERS = [
+    ('Walking', '#4ECDC4'),
+    ('Cycling', '#6C63FF'),
+    ('Paced Walking', '#FFD93D'),
+    ('Running', '#FF6B6B'),
+]
+
+
+def stacked_figure(n_points, webgl):
+    """The Exercise by Type stacked area over n_points days"""
+    rng = np.random.default_rng(0)
+    x = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n_points, freq='D')
+    layers = [
+        dict(
+            y=rng.gamma(2, 10, n_points),
+            mode='lines',
+            name=name,
+            fillcolor=f'rgba({int(color[1:3], 16)}, {int(color[3:5], 16)}, {int(color[5:7], 16)}, 0.6)',
+            line=dict(width=0.5, color=color),
+            hovertemplate="%{y:.0f} min<extra></extra>"
+        )
+        for name, color in LAYERS
+    ]
+    # A threshold of -1 forces WebGL, n_points forces SVG
+    fig = go.Figure(stacked_area_traces(x, layers, -1 if webgl else n_points))
+    fig.update_layout(height=300, margin=dict(l=20, r=20, t=20, b=20), hovermode='x unified')
+    return fig
+
+
+st.title("Render benchmark")
+n_points = st.select_slider("Points per trace", options=[250, 500, 1000, 2500, 5000, 10000, 25000], value=5000)
+repeat = st.slider("Renders per mode", 1, 10, 5)
+
+specs = {mode: json.loads(pio.to_json(stacked_figure(n_points, mode == 'WebGL'))) for mode in ('SVG', 'WebGL')}
+
+components.html(f"""
+<script>{get_plotlyjs()}</script>
+<div id="results" style="font-family: sans-serif; color: #A0A0B0;">Rendering...</div>
+<div id="chart"></div>
+<script>
+const specs = {json.dumps(specs)};
+const frame = () => new Promise(resolve => requestAnimationFrame(() => resolve()));
+
+async function run() {{
+    const chart = document.getElementById('chart');
+    const rows = [];
+    for (const [mode, spec] of Object.entries(specs)) {{
+        const times = [];
+        for (let i = 0; i < {repeat}; i++) {{
+            Plotly.purge(chart);
+            await frame();
+            const t0 = performance.now();
+            await Plotly.newPlot(chart, spec.data, spec.layout);
+            await frame();
+            times.push(performance.now() - t0);
+        }}
+        times.sort((a, b) => a - b);
+        rows.push(`${{mode}}: median ${{times[Math.floor(times.length / 2)].toFixed(1)}} ms, best ${{times[0].toFixed(1)}} ms`);
+    }}
+    document.getElementById('results').innerHTML = `{n_points:,} points x 4 traces<br>` + rows.join('<br>');
+}}
+run();
+</script>
+""", height=420)
@@ -0,0 +1,84 @@
+"""Memory held by concurrent sessions: st.cache_data copies vs shared frames.
+
+st.cache_data unpickles a fresh copy of the cached frames for every
+session on every rerun; st.cache_resource hands every session the same
+objects, which session_frames() wraps in zero-copy handles. This holds N
+sessions' worth of frames plus their filtered results at once and reports
+the memory allocated for them.
+
+Run from the repository root:
+
+    python benchmarks/bench_sessions.py [n_rows]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_memory import compact
+from bench_parse import write_export
+from filters import apply_filters
+from preprocessing import ACTIVITY_NAMES
+from rollups import build_daily_rollup
+from schema import read_export
+from storage import session_frames
+
+SESSION_COUNTS = [1, 5, 10, 25, 50]
+
+
+def session(frames, date_range):
+    """One rerun: get the frames, filter them as the sidebar defaults do"""
+    df, daily = frames()
+    return [
+        df,
+        daily,
+        apply_filters(df, date_range, ACTIVITY_NAMES, []),
+        apply_filters(daily, date_range, ACTIVITY_NAMES, []),
+    ]
+
+
+def held_memory(frames, date_range, n_sessions):
+    """Bytes allocated while n_sessions sessions are alive at once"""
+    tracemalloc.start()
+    sessions = [session(frames, date_range) for _ in range(n_sessions)]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    return held
+
+
+def main():
+    pd.set_option('mode.copy_on_write', True)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.csv')
+        write_export(path, n_rows)
+        df = compact(read_export(path))
+    shared = (df, build_daily_rollup(df))
+    end = df['Date'].iloc[-1]
+    date_range = ((end - pd.Timedelta(days=29)).date(), end.date())
+
+    pickled = pickle.dumps(shared, protocol=pickle.HIGHEST_PROTOCOL)
+    strategies = [
+        ('cache_data copies', lambda: pickle.loads(pickled)),
+        ('shared frames', lambda: session_frames(shared)),
+    ]
+
+    view = session_frames(shared)[0]
+    assert np.shares_memory(view['Step count'].to_numpy(), df['Step count'].to_numpy())
+
+    print(f"{n_rows:,} rows, {len(pickled) / 1e6:.0f} MB pickled")
+    print(f"{'sessions':>8}" + ''.join(f"{name:>20}" for name, _ in strategies))
+    for n_sessions in SESSION_COUNTS:
+        row = [held_memory(frames, date_range, n_sessions) / 1e6 for _, frames in strategies]
+        print(f"{n_sessions:>8}" + ''.join(f"{mb:>17.1f} MB" for mb in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Python-loop vs vectorized streaks (parity is checked in tests/test_streaks.py).
+
+Run from the repository root:
+
+    python benchmarks/bench_streaks.py [n_days]
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import timed
+from streaks import current_streak, days_where, longest_streak
+
+
+def legacy(df):
+    """The original calculate_streak() from dashboard.py"""
+    if len(df) == 0:
+        return 0, 0
+
+    active_dates = df[df['Total Exercise (min)'] > 0]['Date'].dt.date.unique()
+    active_dates = sorted(active_dates)
+
+    if len(active_dates) == 0:
+        return 0, 0
+
+    today = datetime.now().date()
+    current_streak = 0
+    check_date = today
+
+    while check_date in active_dates or (check_date == today and today not in active_dates):
+        if check_date in active_dates:
+            current_streak += 1
+        check_date -= timedelta(days=1)
+        if current_streak == 0 and check_date not in active_dates:
+            break
+
+    longest_streak = 1
+    current_run = 1
+
+    for i in range(1, len(active_dates)):
+        if (active_dates[i] - active_dates[i-1]).days == 1:
+            current_run += 1
+            longest_streak = max(longest_streak, current_run)
+        else:
+            current_run = 1
+
+    return current_streak, longest_streak
+
+
+def vectorized(df):
+    days = days_where(df['Date'], df['Total Exercise (min)'] > 0)
+    return current_streak(days), longest_streak(days)
+
+
+def make_days(n_days, active_rate, end_offset, rng, keep_rate=0.9):
+    """Daily totals ending end_offset days before today, with gaps"""
+    end = pd.Timestamp(datetime.now().date()) - pd.Timedelta(days=end_offset)
+    dates = pd.date_range(end=end, periods=n_days, freq='D')
+    exercise = np.where(rng.random(n_days) < active_rate, rng.uniform(1, 90, n_days), 0.0)
+    # Days without any data are missing from the rollup altogether
+    keep = rng.random(n_days) < keep_rate
+    return pd.DataFrame({'Date': dates[keep], 'Total Exercise (min)': exercise[keep]})
+
+
+def main():
+    n_days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    rng = np.random.default_rng(0)
+
+    # Every day active: the current streak walks back through all of them
+    df = make_days(n_days, 1.0, 0, rng, keep_rate=1.0)
+    old, old_result = timed(lambda: legacy(df), repeat=1)
+    new, new_result = timed(lambda: vectorized(df))
+    assert old_result == new_result
+    print(f"{n_days:,} days, streaks {new_result}")
+    print(f"python loops: {old * 1000:9.1f}ms  vectorized: {new * 1000:6.2f}ms  ({old / new:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
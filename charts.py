@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+# =============================================================================
+# WEBGL TRACES
+# =============================================================================
+
+def scatter_class(n_points, threshold):
+    """go.Scattergl (WebGL) for traces of more than threshold points, else go.Scatter (SVG)"""
+    return go.Scattergl if n_points > threshold else go.Scatter
+
+
+def stacked_area_traces(x, layers, threshold):
+    """Traces of a stacked area chart, bottom layer first
+
+    Each layer is a dict of Scatter arguments including y. Up to threshold
+    points the layers go out as SVG traces in one stackgroup. Scattergl has
+    no stackgroup, so above it each layer draws its running total filled to
+    the layer below, with its own values in customdata for the hover text.
+    """
+    if scatter_class(len(x), threshold) is go.Scatter:
+        return [go.Scatter(x=x, stackgroup='one', **layer) for layer in layers]
+
+    traces = []
+    running = np.zeros(len(x))
+    for i, layer in enumerate(layers):
+        layer = dict(layer)
+        own = np.asarray(layer.pop('y'), dtype=float)
+        running = running + own
+        if 'hovertemplate' in layer:
+            layer['hovertemplate'] = layer['hovertemplate'].replace('%{y', '%{customdata')
+        traces.append(go.Scattergl(
+            x=x,
+            y=running,
+            customdata=own,
+            fill='tozeroy' if i == 0 else 'tonexty',
+            **layer
+        ))
+    return traces
+
+
+# =============================================================================
+# FIGURE CACHE
+# =============================================================================
+
+class FigureCache:
+    """Built figures by filter state, so a rerun only rebuilds what changed
+
+    figures(state) returns the dict of one state's figures, read and filled
+    by chart name. Names carry any chart-specific input, e.g.
+    ('heatmap', year, metric). The max_states most recently used states
+    are kept.
+    """
+
+    def __init__(self, max_states=4):
+        self.max_states = max_states
+        self._states = OrderedDict()
+
+    def figures(self, state):
+        figures = self._states.pop(state, {})
+        self._states[state] = figures
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+        return figures
@@ -3,12 +3,30 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import timedelta
+from functools import partial
+import os
+from urllib.parse import urlparse
 import numpy as np
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import calendar
 
+from charts import FigureCache, scatter_class, stacked_area_traces
+from downsampling import bar_widths, downsample
+from filters import apply_filters
+from geocoding import LOOKUP_FAILED, GeocodeStore, OfflineGeocoder, fallback_label, nominatim_reverse, reverse_many
+from preprocessing import ACTIVITY_NAMES, add_activity_columns, add_calendar_columns, assign_locations, day_name
+from rollups import HEATMAP_METRICS, DailyPrefix, LocationIndex, build_daily_rollup, daily_totals, heatmap_grids, heatmap_matrix
+from schema import SchemaDriftError
+from spatial import build_map_rollup, map_cells, split_levels, stored_level
+from streaks import current_streak, days_where, goal_progress, longest_streak
+from storage import load_enriched, load_user_store, session_frames, user_sources
+
+# All sessions read one shared copy of the data; with copy-on-write their
+# slices and edits never reach it (see session_frames)
+pd.set_option('mode.copy_on_write', True)
+
 # =============================================================================
 # PAGE CONFIGURATION & CUSTOM STYLING
 # =============================================================================
@@ -486,6 +504,9 @@ ACTIVITY_COLORS = {
     'Inactive': COLORS['navy'],
 }
 
+# Line and area traces with more points than this draw with WebGL instead of SVG
+WEBGL_THRESHOLD = 500
+
 # Plotly chart template
 CHART_TEMPLATE = {
     'layout': {
@@ -510,82 +531,85 @@ CHART_TEMPLATE = {
 # DATA LOADING & PREPROCESSING
 # =============================================================================
 
+# Point at a self-hosted or stub server with e.g. VERVE_NOMINATIM_URL=http://localhost:8088
+NOMINATIM_URL = os.environ.get('VERVE_NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+# Nominatim's usage policy allows at most one request per second
+GEOCODE_RATE_LIMIT = 1.0
+GEOCODE_MAX_WORKERS = 4
+
 @st.cache_resource
 def get_geocoder():
-    return Nominatim(user_agent="Verve_fitness_dashboard")
+    url = urlparse(NOMINATIM_URL)
+    return Nominatim(user_agent="Verve_fitness_dashboard", domain=url.netloc, scheme=url.scheme)
+
+@st.cache_resource
+def get_offline_geocoder():
+    return OfflineGeocoder()
 
+# Reverse geocoding backend: True or "nominatim" for the online service,
+# "offline" for the bundled city gazetteer, False for coordinates only
 USE_GEOCODING = True
 
-@st.cache_data
-def reverse_geocode(lat, lon):
-    """Convert latitude/longitude to city, country"""
-    if not USE_GEOCODING:
-        return f"Loc ({lat:.2f}, {lon:.2f})"
-    
-    try:
-        geocoder = get_geocoder()
-        location = geocoder.reverse(f"{lat}, {lon}", language='en', timeout=3)
-        if location and location.raw.get('address'):
-            address = location.raw['address']
-            city = address.get('city') or address.get('town') or address.get('village') or address.get('municipality') or 'Unknown'
-            country = address.get('country', 'Unknown')
-            return f"{city}, {country}"
-        return f"Loc ({lat:.2f}, {lon:.2f})"
-    except:
-        return f"Loc ({lat:.2f}, {lon:.2f})"
-
-@st.cache_data
-def batch_reverse_geocode(coordinates_list):
-    """Batch process unique coordinates"""
-    results = {}
-    for lat, lon in coordinates_list:
-        key = (round(lat, 2), round(lon, 2))
-        if key not in results:
-            results[key] = reverse_geocode(key[0], key[1])
-    return results
-
-@st.cache_data
-def load_data():
-    """Load and preprocess fitness data"""
-    df = pd.read_csv('fitness_data.csv', sep=',')
-    
-    # Convert date column (CSV uses DD/MM/YY format)
-    df['Date'] = pd.to_datetime(df['Date'], dayfirst=True, format='%d/%m/%y').dt.normalize()
-    
-    # Parse start and end times
-    df['Start time'] = pd.to_datetime(df['Start time'], format='%H:%M:%S.%f', errors='coerce')
-    df['End time'] = pd.to_datetime(df['End time'], format='%H:%M:%S.%f', errors='coerce')
-    
+def geocoding_backend():
+    """Normalise USE_GEOCODING to 'nominatim', 'offline' or None"""
+    if USE_GEOCODING is True or USE_GEOCODING == "nominatim":
+        return "nominatim"
+    if USE_GEOCODING == "offline":
+        return "offline"
+    return None
+
+@st.cache_resource
+def get_geocode_store():
+    return GeocodeStore()
+
+def batch_reverse_geocode(coordinates_list, progress=None):
+    """Batch process unique coordinates
+
+    Deliberately not st.cache_data: progress writes to the caller's element,
+    which a cache hit cannot replay. Nominatim results persist in the
+    GeocodeStore instead; the other backends are cheap to re-run.
+    """
+    keys = list(dict.fromkeys((round(lat, 2), round(lon, 2)) for lat, lon in coordinates_list))
+    backend = geocoding_backend()
+    
+    if backend == "offline":
+        # One nearest-neighbour query covers every coordinate
+        return dict(zip(keys, get_offline_geocoder().reverse_many(keys)))
+    if backend is None:
+        return {key: fallback_label(*key) for key in keys}
+    
+    # Only coordinates no other process has resolved recently go to Nominatim
+    store = get_geocode_store()
+    known = store.load()
+    fetched = reverse_many(
+        partial(nominatim_reverse, get_geocoder()),
+        [key for key in keys if key not in known],
+        max_workers=GEOCODE_MAX_WORKERS,
+        rate=GEOCODE_RATE_LIMIT,
+        progress=progress
+    )
+    store.save(fetched)
+    known.update(fetched)
+    # No address and failed lookups (retried next load) both fall back to coordinates
+    return {
+        key: fallback_label(*key) if known[key] in (None, LOOKUP_FAILED) else known[key]
+        for key in keys
+    }
+
+DATA_FILE = 'fitness_data.csv'
+
+# Append only rows newer than the last ingested interval when the CSV changes
+INCREMENTAL_INGEST = True
+
+def build_data(df):
+    """Parse and enrich raw Google Fit export rows"""
+    # Dates arrive parsed and start/end times as seconds since midnight (see schema.py)
     # Extract hour of day for time analysis
-    df['Hour'] = df['Start time'].dt.hour
-    
-    # Create activity type
-    def get_activity_type(row):
-        activities = []
-        if pd.notna(row.get('Walking duration (ms)', 0)) and row.get('Walking duration (ms)', 0) > 0:
-            activities.append('Walking')
-        if pd.notna(row.get('Cycling duration (ms)', 0)) and row.get('Cycling duration (ms)', 0) > 0:
-            activities.append('Cycling')
-        if pd.notna(row.get('Paced walking duration (ms)', 0)) and row.get('Paced walking duration (ms)', 0) > 0:
-            activities.append('Paced Walking')
-        if pd.notna(row.get('Running duration (ms)', 0)) and row.get('Running duration (ms)', 0) > 0:
-            activities.append('Running')
-        return ', '.join(activities) if activities else 'Inactive'
-    
-    df['Activity Type'] = df.apply(get_activity_type, axis=1)
-    
-    # Get primary activity (the one with most duration)
-    def get_primary_activity(row):
-        durations = {
-            'Walking': row.get('Walking duration (ms)', 0) or 0,
-            'Cycling': row.get('Cycling duration (ms)', 0) or 0,
-            'Paced Walking': row.get('Paced walking duration (ms)', 0) or 0,
-            'Running': row.get('Running duration (ms)', 0) or 0,
-        }
-        max_activity = max(durations, key=durations.get)
-        return max_activity if durations[max_activity] > 0 else 'Inactive'
+    df['Hour'] = (df['Start time'] // 3600).astype('Int8')
     
-    df['Primary Activity'] = df.apply(get_primary_activity, axis=1)
+    # Derive the activity bitmask and Primary Activity column-wise
+    add_activity_columns(df)
     
     # Calculate total exercise duration in minutes
     df['Total Exercise (min)'] = (
@@ -603,32 +627,97 @@ def load_data():
     
     if len(unique_coords) > 3 and USE_GEOCODING:
         with st.spinner(f'🌍 Loading location data for {len(unique_coords)} unique locations...'):
-            location_map = batch_reverse_geocode(unique_coords)
+            status = st.empty()
+            location_map = batch_reverse_geocode(
+                unique_coords,
+                progress=lambda done, total: status.caption(f"Resolved {done} of {total} new locations")
+            )
+            status.empty()
     else:
         location_map = batch_reverse_geocode(unique_coords)
     
-    df['Location'] = df.apply(
-        lambda x: location_map.get((round(x['Low latitude (deg)'], 2), round(x['Low longitude (deg)'], 2)), "Unknown") 
-        if pd.notna(x['Low latitude (deg)']) and pd.notna(x['Low longitude (deg)'])
-        else "Unknown",
-        axis=1
-    )
+    df['Location'] = pd.Categorical(assign_locations(df, location_map))
     
     df = df.drop(columns=['lat_rounded', 'lon_rounded'])
     
-    # Extract year, month, day of week for analysis
-    df['Year'] = df['Date'].dt.year
-    df['Month'] = df['Date'].dt.month
-    df['Month Name'] = df['Date'].dt.strftime('%B')
-    df['Day of Week'] = df['Date'].dt.dayofweek
-    df['Day Name'] = df['Date'].dt.strftime('%A')
-    df['Week'] = df['Date'].dt.isocalendar().week
-    df['Is Weekend'] = df['Day of Week'].isin([5, 6])  # Saturday=5, Sunday=6
-    
-    return df
+    # Extract year, month, day of week for analysis (day names come from
+    # day_name() when a chart needs them)
+    add_calendar_columns(df)
+    
+    # Keep rows in date order so date filters can binary-search
+    return df.sort_values('Date', kind='stable', ignore_index=True)
+
+# Per-day rollups the store keeps next to the enriched rows, appended to as
+# exports grow: the daily totals every section reads, and the hotspot map's
+# grid cells
+STORE_ROLLUPS = {'daily': build_daily_rollup, 'cells': build_map_rollup}
+
+@st.cache_resource(max_entries=1)
+def load_data(source_mtime):
+    """Open the memory-mapped history of enriched rows, plus the rollups the sections read"""
+    # Reuses the enriched store on disk until fitness_data.csv changes
+    return load_enriched(
+        DATA_FILE,
+        build_data,
+        STORE_ROLLUPS,
+        variant=f"geocoding={USE_GEOCODING}",
+        incremental=INCREMENTAL_INGEST
+    )
+
+# One sub-directory of Google Fit CSVs per user; unset to serve DATA_FILE alone
+EXPORTS_DIR = os.environ.get('VERVE_EXPORTS_DIR')
+
+# Users whose stores stay open at once
+MAX_CACHED_USERS = 16
 
-# Load the data
-df = load_data()
+# Daily (metric, threshold) goals tracked by the hero stats
+DAILY_GOALS = [('Step count', 10000), ('Heart Points', 21)]
+
+@st.cache_resource(max_entries=MAX_CACHED_USERS)
+def load_user_data(user, sources, source_mtimes):
+    """Load one user's exports via the chunked, year-partitioned store"""
+    return load_user_store(
+        user,
+        sources,
+        build_data,
+        STORE_ROLLUPS,
+        variant=f"geocoding={USE_GEOCODING}"
+    )
+
+@st.cache_resource(max_entries=4)
+def load_history_range(data_version, date_range, _history):
+    """Interval rows of a (start, end) range, or all of them, converted from the store once"""
+    return _history.read_range(*date_range)
+
+@st.cache_resource(max_entries=MAX_CACHED_USERS)
+def load_map_levels(data_version, _cells):
+    """The store's map cell rollup split by grid level, once per data version"""
+    return split_levels(_cells)
+
+@st.cache_resource(max_entries=MAX_CACHED_USERS)
+def load_location_index(data_version, _daily):
+    """Per-location running totals of the daily rollup, built once per data version"""
+    return LocationIndex(_daily)
+
+# Load the data (keyed on mtime so a refreshed export is picked up without a restart)
+try:
+    if EXPORTS_DIR:
+        exports = user_sources(EXPORTS_DIR)
+        if not exports:
+            st.error(f"No user exports found in {EXPORTS_DIR}: expected one sub-directory of Google Fit CSVs per user")
+            st.stop()
+        user = st.sidebar.selectbox("User", list(exports))
+        data_version = (user, tuple(os.path.getmtime(p) for p in exports[user]))
+        history, rollups = load_user_data(user, exports[user], list(data_version[1]))
+    else:
+        data_version = os.path.getmtime(DATA_FILE)
+        history, rollups = load_data(data_version)
+    (daily_df,) = session_frames([rollups['daily']])
+    location_index = load_location_index(data_version, rollups['daily'])
+    map_levels = load_map_levels(data_version, rollups['cells'])
+except SchemaDriftError as e:
+    st.error(str(e))
+    st.stop()
 
 # =============================================================================
 # SIDEBAR - FILTERS & NAVIGATION
@@ -643,13 +732,14 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     # Quick Stats
-    total_days = (df['Date'].max() - df['Date'].min()).days
+    # Bounds and locations come from the store's manifest, not from the rows
+    total_days = (history.max_date - history.min_date).days
     years_tracking = total_days / 365.25
     
     st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E, #252542); border-radius: 8px; padding: 0.5rem 0.7rem; margin-bottom: 0.5rem; border: 1px solid rgba(78, 205, 196, 0.2);">
         <p style="color: #6B6B80; font-size: 0.65rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px;">Tracking Since</p>
-        <p style="color: #4ECDC4; font-size: 0.95rem; font-weight: 600; margin: 0.1rem 0 0 0;">{df['Date'].min().strftime('%d %b %Y')} <span style="color: #A0A0B0; font-size: 0.75rem;">({years_tracking:.1f} yrs)</span></p>
+        <p style="color: #4ECDC4; font-size: 0.95rem; font-weight: 600; margin: 0.1rem 0 0 0;">{history.min_date.strftime('%d %b %Y')} <span style="color: #A0A0B0; font-size: 0.75rem;">({years_tracking:.1f} yrs)</span></p>
     </div>
     """, unsafe_allow_html=True)
     
@@ -662,8 +752,8 @@ with st.sidebar:
         index=0
     )
     
-    max_date = df['Date'].max()
-    min_date = df['Date'].min()
+    max_date = history.max_date
+    min_date = history.min_date
     
     if preset == "Last 7 Days":
         default_start = max_date - timedelta(days=6)  # 7 days including end date
@@ -696,7 +786,7 @@ with st.sidebar:
     
     # Activity Type Filter
     st.markdown('<p style="color: #A0A0B0; font-size: 0.75rem; font-weight: 600; margin: 0.5rem 0 0.2rem 0; text-transform: uppercase; letter-spacing: 0.5px;">Activities</p>', unsafe_allow_html=True)
-    all_activities = ['Walking', 'Cycling', 'Paced Walking', 'Running']
+    all_activities = ACTIVITY_NAMES
     selected_activities = st.multiselect(
         "Select Activities",
         options=all_activities,
@@ -706,7 +796,7 @@ with st.sidebar:
     
     # Location Filter
     st.markdown('<p style="color: #A0A0B0; font-size: 0.75rem; font-weight: 600; margin: 0.5rem 0 0.2rem 0; text-transform: uppercase; letter-spacing: 0.5px;">Locations</p>', unsafe_allow_html=True)
-    unique_locations = sorted([loc for loc in df['Location'].unique() if loc != "Unknown"])
+    unique_locations = [loc for loc in history.locations if loc != "Unknown"]
     selected_locations = st.multiselect(
         "Select Locations",
         options=unique_locations,
@@ -718,29 +808,21 @@ with st.sidebar:
 # FILTER DATA
 # =============================================================================
 
-if len(date_range) == 2:
-    filtered_df = df[
-        (df['Date'] >= pd.Timestamp(date_range[0])) &
-        (df['Date'] <= pd.Timestamp(date_range[1]))
-    ]
-else:
-    filtered_df = df.copy()
-
-# Filter by activity type
-if selected_activities:
-    def activity_matches(activity_type_str):
-        # Split the comma-separated activities and check for exact matches
-        activities_in_row = [a.strip() for a in activity_type_str.split(',')]
-        return any(act in activities_in_row for act in selected_activities)
-    
-    filtered_df = filtered_df[filtered_df['Activity Type'].apply(activity_matches)]
-
-# Filter by location
-if selected_locations:
-    filtered_df = filtered_df[
-        (filtered_df['Location'].isin(selected_locations)) | 
-        (filtered_df['Location'] == "Unknown")
-    ]
+# The interval rows and the daily rollup go through the same filters; only the
+# year partitions the date range touches are paged in, once per range for all sessions
+(interval_df,) = session_frames([
+    load_history_range(data_version, tuple(date_range) if len(date_range) == 2 else (), history)
+])
+filtered_df = apply_filters(interval_df, date_range, selected_activities, selected_locations)
+filtered_daily = apply_filters(daily_df, date_range, selected_activities, selected_locations)
+
+# Charts are rebuilt only when the data or the filters change; widgets that
+# feed a single chart (e.g. the heatmap metric) go in that chart's name
+if 'figure_cache' not in st.session_state:
+    st.session_state.figure_cache = FigureCache()
+figures = st.session_state.figure_cache.figures(
+    (data_version, tuple(date_range), tuple(selected_activities), tuple(selected_locations))
+)
 
 # =============================================================================
 # HELPER FUNCTIONS
@@ -779,41 +861,20 @@ def format_duration(minutes):
         hours = (minutes % 1440) // 60
         return f"{days:.0f}d {hours:.0f}h"
 
-def calculate_streak(df):
-    """Calculate current and longest workout streaks"""
-    if len(df) == 0:
-        return 0, 0
-    
-    active_dates = df[df['Total Exercise (min)'] > 0]['Date'].dt.date.unique()
-    active_dates = sorted(active_dates)
-    
-    if len(active_dates) == 0:
-        return 0, 0
-    
-    # Current streak
-    today = datetime.now().date()
-    current_streak = 0
-    check_date = today
-    
-    while check_date in active_dates or (check_date == today and today not in active_dates):
-        if check_date in active_dates:
-            current_streak += 1
-        check_date -= timedelta(days=1)
-        if current_streak == 0 and check_date not in active_dates:
-            break
-    
-    # Longest streak
-    longest_streak = 1
-    current_run = 1
-    
-    for i in range(1, len(active_dates)):
-        if (active_dates[i] - active_dates[i-1]).days == 1:
-            current_run += 1
-            longest_streak = max(longest_streak, current_run)
-        else:
-            current_run = 1
-    
-    return current_streak, longest_streak
+def calculate_streak(daily):
+    """Calculate current and longest workout streaks from per-day totals"""
+    days = days_where(daily['Date'], daily['Total Exercise (min)'] > 0)
+    return current_streak(days), longest_streak(days)
+
+@st.cache_resource(max_entries=32)
+def load_heatmap_grids(data_version, selected_activities, selected_locations, _daily):
+    """Calendar heatmap grids under the activity and location filters, shared by every date range"""
+    return heatmap_grids(daily_totals(apply_filters(_daily, [], selected_activities, selected_locations)))
+
+@st.cache_resource(max_entries=32)
+def load_daily_prefix(data_version, selected_activities, selected_locations, _daily):
+    """Running daily totals under the activity and location filters, shared by every date range"""
+    return DailyPrefix(daily_totals(apply_filters(_daily, [], selected_activities, selected_locations)))
 
 # =============================================================================
 # MAIN DASHBOARD
@@ -831,73 +892,56 @@ if len(filtered_df) == 0:
     st.warning("No data available for the selected filters. Please adjust your selection.")
     st.stop()
 
+# Per-day totals behind every section
+daily_agg = daily_totals(filtered_daily)
+
 # =============================================================================
 # SECTION 1: HERO STATS
 # =============================================================================
 
-# Calculate key metrics
-daily_agg = filtered_df.groupby('Date').agg({
-    'Step count': 'sum',
-    'Calories (kcal)': 'sum',
-    'Distance (m)': 'sum',
-    'Heart Points': 'sum',
-    'Total Exercise (min)': 'sum',
-}).reset_index()
-
-total_steps = daily_agg['Step count'].sum()
-total_calories = daily_agg['Calories (kcal)'].sum()
-total_distance = daily_agg['Distance (m)'].sum() / 1000  # Convert to km
-total_exercise = daily_agg['Total Exercise (min)'].sum()
-total_heart_points = daily_agg['Heart Points'].sum()
-avg_daily_steps = daily_agg['Step count'].mean()
-active_days = len(daily_agg[daily_agg['Total Exercise (min)'] > 0])
-total_days_range = len(daily_agg)
-
-current_streak, longest_streak = calculate_streak(filtered_df)
-
-# Calculate avg daily metrics
-avg_daily_distance = total_distance / total_days_range if total_days_range > 0 else 0
-avg_daily_calories = total_calories / total_days_range if total_days_range > 0 else 0
-avg_daily_exercise = total_exercise / total_days_range if total_days_range > 0 else 0
-
-# Calculate average daily heart points
-avg_daily_heart_points = total_heart_points / total_days_range if total_days_range > 0 else 0
-
-# Calculate consecutive days hitting 10,000 steps goal
-steps_goal_streak = 0
-if len(daily_agg) > 0:
-    # Sort by date descending to check from most recent
-    sorted_agg = daily_agg.sort_values('Date', ascending=False)
-    for _, row in sorted_agg.iterrows():
-        if row['Step count'] >= 10000:
-            steps_goal_streak += 1
-        else:
-            break
-
-# Calculate consecutive days hitting 21 heart points goal
-heart_goal_streak = 0
-if len(daily_agg) > 0:
-    for _, row in sorted_agg.iterrows():
-        if row['Heart Points'] >= 21:
-            heart_goal_streak += 1
-        else:
-            break
-
-# Hero Stats Row - Custom HTML to avoid delta arrows
-col1, col2, col3, col4, col5 = st.columns(5)
+@st.fragment
+def hero_stats():
+    """Headline totals and goal streaks"""
+    # Totals of the date range from the running totals of the current
+    # activity/location selection, so moving the dates never re-sums days
+    totals = load_daily_prefix(
+        data_version, tuple(selected_activities), tuple(selected_locations), daily_df
+    ).totals(date_range)
+    total_steps = totals['Step count']
+    total_calories = totals['Calories (kcal)']
+    total_distance = totals['Distance (m)'] / 1000  # Convert to km
+    total_exercise = totals['Total Exercise (min)']
+    total_heart_points = totals['Heart Points']
+    total_days_range = totals['days']
+
+    workout_streak, longest_workout_streak = calculate_streak(daily_agg)
+
+    # Calculate avg daily metrics
+    avg_daily_steps = total_steps / total_days_range if total_days_range > 0 else 0
+    avg_daily_distance = total_distance / total_days_range if total_days_range > 0 else 0
+    avg_daily_calories = total_calories / total_days_range if total_days_range > 0 else 0
+    avg_daily_exercise = total_exercise / total_days_range if total_days_range > 0 else 0
+
+    # Calculate average daily heart points
+    avg_daily_heart_points = total_heart_points / total_days_range if total_days_range > 0 else 0
+
+    # Trailing streak, best streak and hit rate of every daily goal in one pass
+    goals = goal_progress(daily_agg, DAILY_GOALS)
+
+    # Hero Stats Row - Custom HTML to avoid delta arrows
+    col1, col2, col3, col4, col5 = st.columns(5)
 
-with col1:
-    streak_emoji = "🔥" if steps_goal_streak > 0 else "📈"
-    st.markdown(f"""
+    with col1:
+        st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; min-height: 120px;">
         <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">Avg Steps/Day</p>
         <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{avg_daily_steps:,.0f}</p>
-        <p style="color: #A0A0B0; font-size: 0.85rem; margin: 0;">{streak_emoji} {steps_goal_streak} day 10K streak</p>
+        <p style="color: #A0A0B0; font-size: 0.85rem; margin: 0;">Total: {total_steps:,.0f}</p>
     </div>
     """, unsafe_allow_html=True)
 
-with col2:
-    st.markdown(f"""
+    with col2:
+        st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; min-height: 120px;">
         <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">Avg Distance/Day</p>
         <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{avg_daily_distance:.1f} km</p>
@@ -905,8 +949,8 @@ with col2:
     </div>
     """, unsafe_allow_html=True)
 
-with col3:
-    st.markdown(f"""
+    with col3:
+        st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; min-height: 120px;">
         <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">Avg Calories/Day</p>
         <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{avg_daily_calories:,.0f} kcal</p>
@@ -914,8 +958,8 @@ with col3:
     </div>
     """, unsafe_allow_html=True)
 
-with col4:
-    st.markdown(f"""
+    with col4:
+        st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; min-height: 120px;">
         <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">Avg Active Time/Day</p>
         <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{format_duration(avg_daily_exercise)}</p>
@@ -923,8 +967,8 @@ with col4:
     </div>
     """, unsafe_allow_html=True)
 
-with col5:
-    st.markdown(f"""
+    with col5:
+        st.markdown(f"""
     <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; min-height: 120px;">
         <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">Avg Heart Pts/Day</p>
         <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{avg_daily_heart_points:,.0f} pts</p>
@@ -932,256 +976,285 @@ with col5:
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown("---")
+    # Goals Row - one card per entry in DAILY_GOALS
+    for col, goal in zip(st.columns(len(goals)), goals.itertuples()):
+        streak_emoji = "🔥" if goal.trailing > 0 else "📈"
+        with col:
+            st.markdown(f"""
+    <div style="background: linear-gradient(145deg, #1A1A2E 0%, #252542 100%); border: 1px solid rgba(78, 205, 196, 0.2); border-radius: 16px; padding: 1.2rem 1.5rem; box-shadow: 0 4px 20px rgba(0, 0, 0, 0.3); transition: all 0.3s ease; margin-top: 1rem;">
+        <p style="color: #6B6B80; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 0.5px; font-weight: 500; white-space: nowrap;">{goal.metric} Goal: {goal.threshold:,.0f}/Day</p>
+        <p style="color: #FFFFFF; font-size: 2rem; font-weight: 700; margin: 0.5rem 0 0.3rem 0; font-family: 'Outfit', sans-serif;">{streak_emoji} {goal.trailing:.0f} day streak</p>
+        <p style="color: #A0A0B0; font-size: 0.85rem; margin: 0;">Best: {goal.best:.0f} days • Hit on {goal.hit_rate:.0%} of days</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("---")
+
+hero_stats()
 
 # =============================================================================
 # SECTION 2: ACTIVITY OVERVIEW
 # =============================================================================
 
-st.markdown("## Activity Overview")
+@st.fragment
+def activity_overview():
+    """Activity mix and daily steps against the goal"""
+    st.markdown("## Activity Overview")
 
-col1, col2 = st.columns([1, 2])
+    col1, col2 = st.columns([1, 2])
 
-with col1:
-    # Activity Distribution Donut Chart - Fixed to show all activities
-    # Calculate minutes for each activity across ALL rows (not just primary)
-    activity_minutes = {
-        'Walking': filtered_df['Walking duration (ms)'].fillna(0).sum() / 60000,
-        'Cycling': filtered_df['Cycling duration (ms)'].fillna(0).sum() / 60000,
-        'Paced Walking': filtered_df['Paced walking duration (ms)'].fillna(0).sum() / 60000,
-        'Running': filtered_df['Running duration (ms)'].fillna(0).sum() / 60000,
-    }
-    
-    # Remove activities with 0 minutes
-    activity_minutes = {k: v for k, v in activity_minutes.items() if v > 0}
-    
-    if len(activity_minutes) > 0:
-        activity_duration = pd.DataFrame([
-            {'Activity': k, 'Minutes': v} for k, v in activity_minutes.items()
-        ])
-        
-        fig_donut = go.Figure(data=[go.Pie(
-            labels=activity_duration['Activity'],
-            values=activity_duration['Minutes'],
-            hole=0.65,
-            marker=dict(
-                colors=[ACTIVITY_COLORS.get(act, COLORS['teal']) for act in activity_duration['Activity']],
-                line=dict(color='#0F0F1A', width=3)
-            ),
-            textinfo='percent',
-            textfont=dict(size=14, color='white', family='Outfit'),
-            hovertemplate="<b>%{label}</b><br>%{value:.0f} minutes<br>%{percent}<extra></extra>"
-        )])
+    with col1:
+        # Activity Distribution Donut Chart - Fixed to show all activities
+        # Calculate minutes for each activity across ALL rows (not just primary)
+        activity_minutes = {
+            'Walking': daily_agg['Walking (min)'].sum(),
+            'Cycling': daily_agg['Cycling (min)'].sum(),
+            'Paced Walking': daily_agg['Paced Walking (min)'].sum(),
+            'Running': daily_agg['Running (min)'].sum(),
+        }
         
-        total_activity_mins = activity_duration['Minutes'].sum()
+        # Remove activities with 0 minutes
+        activity_minutes = {k: v for k, v in activity_minutes.items() if v > 0}
         
-        fig_donut.update_layout(
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.2,
-                xanchor="center",
-                x=0.5,
-                font=dict(color='#A0A0B0', size=12)
-            ),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=40, b=60),
-            height=350,
-            annotations=[dict(
-                text=f"<b>{total_activity_mins:,.0f}</b><br>minutes",
-                x=0.5, y=0.5,
-                font=dict(size=16, color='white', family='Outfit'),
-                showarrow=False
-            )]
-        )
-        st.plotly_chart(fig_donut, use_container_width=True)
-    else:
-        st.info("No activity data available")
+        if len(activity_minutes) > 0:
+            if 'donut' not in figures:
+                activity_duration = pd.DataFrame([
+                    {'Activity': k, 'Minutes': v} for k, v in activity_minutes.items()
+                ])
+                
+                fig_donut = go.Figure(data=[go.Pie(
+                    labels=activity_duration['Activity'],
+                    values=activity_duration['Minutes'],
+                    hole=0.65,
+                    marker=dict(
+                        colors=[ACTIVITY_COLORS.get(act, COLORS['teal']) for act in activity_duration['Activity']],
+                        line=dict(color='#0F0F1A', width=3)
+                    ),
+                    textinfo='percent',
+                    textfont=dict(size=14, color='white', family='Outfit'),
+                    hovertemplate="<b>%{label}</b><br>%{value:.0f} minutes<br>%{percent}<extra></extra>"
+                )])
+                
+                total_activity_mins = activity_duration['Minutes'].sum()
+                
+                fig_donut.update_layout(
+                    showlegend=True,
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=-0.2,
+                        xanchor="center",
+                        x=0.5,
+                        font=dict(color='#A0A0B0', size=12)
+                    ),
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=20, r=20, t=40, b=60),
+                    height=350,
+                    annotations=[dict(
+                        text=f"<b>{total_activity_mins:,.0f}</b><br>minutes",
+                        x=0.5, y=0.5,
+                        font=dict(size=16, color='white', family='Outfit'),
+                        showarrow=False
+                    )]
+                )
+                figures['donut'] = fig_donut
+            st.plotly_chart(figures['donut'], use_container_width=True)
+        else:
+            st.info("No activity data available")
 
-with col2:
-    # Daily Steps Goal Chart (10,000 steps goal) - Updated with coral line and legend
-    steps_timeline = daily_agg.copy()
-    steps_timeline = steps_timeline.sort_values('Date')
-    
-    fig_steps = go.Figure()
-    
-    # Add bars colored by whether goal was met
-    colors = [COLORS['teal'] if steps >= 10000 else COLORS['coral'] 
-              for steps in steps_timeline['Step count']]
-    
-    fig_steps.add_trace(go.Bar(
-        x=steps_timeline['Date'],
-        y=steps_timeline['Step count'],
-        marker=dict(
-            color=colors,
-            line=dict(width=0)
-        ),
-        name='Daily Steps',
-        hovertemplate="<b>%{x|%b %d, %Y}</b><br>%{y:,.0f} steps<extra></extra>",
-        showlegend=False
-    ))
-    
-    # Add 10,000 steps goal line - changed to coral and added to legend
-    fig_steps.add_hline(
-        y=10000,
-        line_dash="dash",
-        line_color=COLORS['coral'],
-        line_width=2,
-        annotation=None  # Remove annotation from line
-    )
-    
-    # Add invisible trace for legend
-    fig_steps.add_trace(go.Scatter(
-        x=[None],
-        y=[None],
-        mode='lines',
-        line=dict(color=COLORS['coral'], width=2, dash='dash'),
-        name='10,000 Steps Goal',
-        showlegend=True
-    ))
-    
-    fig_steps.update_layout(
-        title=dict(text="Daily Steps vs Goal", font=dict(color='white', size=16)),
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=20, r=20, t=60, b=20),
-        height=350,
-        xaxis=dict(
-            gridcolor='rgba(78, 205, 196, 0.1)',
-            tickfont=dict(color='#A0A0B0'),
-        ),
-        yaxis=dict(
-            title=dict(text="Steps", font=dict(color='#A0A0B0')),
-            gridcolor='rgba(78, 205, 196, 0.1)',
-            tickfont=dict(color='#A0A0B0'),
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="top",
-            y=-0.15,
-            xanchor="center",
-            x=0.5,
-            font=dict(color='#A0A0B0', size=11)
-        ),
-        hovermode='x unified'
-    )
-    st.plotly_chart(fig_steps, use_container_width=True)
+    with col2:
+        # Daily Steps Goal Chart (10,000 steps goal) - Updated with coral line and legend
+        if 'steps' not in figures:
+            steps_timeline = downsample(daily_agg.sort_values('Date'), 'Step count')
+            steps_thinned = len(steps_timeline) < len(daily_agg)
+            
+            fig_steps = go.Figure()
+            
+            # Add bars colored by whether goal was met
+            colors = [COLORS['teal'] if steps >= 10000 else COLORS['coral'] 
+                      for steps in steps_timeline['Step count']]
+            
+            fig_steps.add_trace(go.Bar(
+                x=steps_timeline['Date'],
+                y=steps_timeline['Step count'],
+                marker=dict(
+                    color=colors,
+                    line=dict(width=0)
+                ),
+                name='Daily Steps',
+                width=bar_widths(steps_timeline['Date']) if steps_thinned else None,
+                offset=0 if steps_thinned else None,
+                hovertemplate="<b>%{x|%b %d, %Y}</b><br>%{y:,.0f} steps<extra></extra>",
+                showlegend=False
+            ))
+            
+            # Add 10,000 steps goal line - changed to coral and added to legend
+            fig_steps.add_hline(
+                y=10000,
+                line_dash="dash",
+                line_color=COLORS['coral'],
+                line_width=2,
+                annotation=None  # Remove annotation from line
+            )
+            
+            # Add invisible trace for legend
+            fig_steps.add_trace(go.Scatter(
+                x=[None],
+                y=[None],
+                mode='lines',
+                line=dict(color=COLORS['coral'], width=2, dash='dash'),
+                name='10,000 Steps Goal',
+                showlegend=True
+            ))
+            
+            fig_steps.update_layout(
+                title=dict(text="Daily Steps vs Goal", font=dict(color='white', size=16)),
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                margin=dict(l=20, r=20, t=60, b=20),
+                height=350,
+                xaxis=dict(
+                    gridcolor='rgba(78, 205, 196, 0.1)',
+                    tickfont=dict(color='#A0A0B0'),
+                ),
+                yaxis=dict(
+                    title=dict(text="Steps", font=dict(color='#A0A0B0')),
+                    gridcolor='rgba(78, 205, 196, 0.1)',
+                    tickfont=dict(color='#A0A0B0'),
+                ),
+                legend=dict(
+                    orientation="h",
+                    yanchor="top",
+                    y=-0.15,
+                    xanchor="center",
+                    x=0.5,
+                    font=dict(color='#A0A0B0', size=11)
+                ),
+                hovermode='x unified'
+            )
+            figures['steps'] = fig_steps
+        st.plotly_chart(figures['steps'], use_container_width=True)
 
+activity_overview()
 
 # =============================================================================
 # SECTION 4: PATTERNS & INSIGHTS
 # =============================================================================
 
-st.markdown("## Patterns & Insights")
+@st.fragment
+def patterns_and_insights():
+    """Week-on-week change, weekday pattern and time of day"""
+    st.markdown("## Patterns & Insights")
 
-col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
 
-with col1:
-    # This Week vs Last Week Comparison
-    st.markdown("### This Week vs Last Week")
-    st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Compare your average daily activity between the past two weeks</p>", unsafe_allow_html=True)
-    
-    compare_data = daily_agg[['Date', 'Total Exercise (min)', 'Step count', 'Calories (kcal)']].copy()
-    compare_data = compare_data.sort_values('Date')
-    
-    if len(compare_data) >= 14:
-        # Get last 7 days (this week) and previous 7 days (last week)
-        last_14 = compare_data.tail(14)
-        last_week = last_14.head(7)
-        this_week = last_14.tail(7)
-        
-        # Calculate averages
-        this_week_exercise = this_week['Total Exercise (min)'].mean()
-        last_week_exercise = last_week['Total Exercise (min)'].mean()
-        this_week_steps = this_week['Step count'].mean()
-        last_week_steps = last_week['Step count'].mean()
-        
-        # Calculate percentage changes
-        exercise_change = ((this_week_exercise - last_week_exercise) / last_week_exercise * 100) if last_week_exercise > 0 else 0
-        steps_change = ((this_week_steps - last_week_steps) / last_week_steps * 100) if last_week_steps > 0 else 0
-        
-        fig_compare = go.Figure()
-        
-        metrics = ['Exercise', 'Steps']
-        this_week_vals = [this_week_exercise, this_week_steps / 100]  # Scale steps for visibility
-        last_week_vals = [last_week_exercise, last_week_steps / 100]
-        
-        fig_compare.add_trace(go.Bar(
-            name='Last Week',
-            x=metrics,
-            y=last_week_vals,
-            marker_color=COLORS['purple'],
-            opacity=0.6,
-            text=[f"{last_week_exercise:.0f} min", f"{last_week_steps:,.0f}"],
-            textposition='outside',
-            textfont=dict(color='#A0A0B0', size=10),
-            hovertemplate="<b>Last Week</b><br>%{x}: %{text}<extra></extra>"
-        ))
-        
-        fig_compare.add_trace(go.Bar(
-            name='This Week',
-            x=metrics,
-            y=this_week_vals,
-            marker_color=COLORS['teal'],
-            text=[f"{this_week_exercise:.0f} min", f"{this_week_steps:,.0f}"],
-            textposition='outside',
-            textfont=dict(color='#FFFFFF', size=10),
-            hovertemplate="<b>This Week</b><br>%{x}: %{text}<extra></extra>"
-        ))
-        
-        fig_compare.update_layout(
-            barmode='group',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=20, b=10),
-            height=240,
-            xaxis=dict(
-                tickfont=dict(color='#A0A0B0', size=11),
-            ),
-            yaxis=dict(
-                visible=False,
-                range=[0, max(max(this_week_vals), max(last_week_vals)) * 1.25]
-            ),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(color='#A0A0B0', size=10)
-            ),
-            bargap=0.25,
-            hoverlabel=dict(
-                bgcolor='#1A1A2E',
-                font_size=12,
-                font_family='Outfit',
-                font_color='#FFFFFF',
-                bordercolor='#4ECDC4'
-            )
-        )
-        st.plotly_chart(fig_compare, use_container_width=True)
+    with col1:
+        # This Week vs Last Week Comparison
+        st.markdown("### This Week vs Last Week")
+        st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Compare your average daily activity between the past two weeks</p>", unsafe_allow_html=True)
         
-        # Show change indicators
-        exercise_color = COLORS['teal'] if exercise_change >= 0 else COLORS['coral']
-        steps_color = COLORS['teal'] if steps_change >= 0 else COLORS['coral']
-        exercise_arrow = "↑" if exercise_change >= 0 else "↓"
-        steps_arrow = "↑" if steps_change >= 0 else "↓"
+        compare_data = daily_agg[['Date', 'Total Exercise (min)', 'Step count', 'Calories (kcal)']].copy()
+        compare_data = compare_data.sort_values('Date')
         
-        st.markdown(f"""
+        if len(compare_data) >= 14:
+            # Get last 7 days (this week) and previous 7 days (last week)
+            last_14 = compare_data.tail(14)
+            last_week = last_14.head(7)
+            this_week = last_14.tail(7)
+            
+            # Calculate averages
+            this_week_exercise = this_week['Total Exercise (min)'].mean()
+            last_week_exercise = last_week['Total Exercise (min)'].mean()
+            this_week_steps = this_week['Step count'].mean()
+            last_week_steps = last_week['Step count'].mean()
+            
+            # Calculate percentage changes
+            exercise_change = ((this_week_exercise - last_week_exercise) / last_week_exercise * 100) if last_week_exercise > 0 else 0
+            steps_change = ((this_week_steps - last_week_steps) / last_week_steps * 100) if last_week_steps > 0 else 0
+            
+            if 'compare' not in figures:
+                fig_compare = go.Figure()
+                
+                metrics = ['Exercise', 'Steps']
+                this_week_vals = [this_week_exercise, this_week_steps / 100]  # Scale steps for visibility
+                last_week_vals = [last_week_exercise, last_week_steps / 100]
+                
+                fig_compare.add_trace(go.Bar(
+                    name='Last Week',
+                    x=metrics,
+                    y=last_week_vals,
+                    marker_color=COLORS['purple'],
+                    opacity=0.6,
+                    text=[f"{last_week_exercise:.0f} min", f"{last_week_steps:,.0f}"],
+                    textposition='outside',
+                    textfont=dict(color='#A0A0B0', size=10),
+                    hovertemplate="<b>Last Week</b><br>%{x}: %{text}<extra></extra>"
+                ))
+                
+                fig_compare.add_trace(go.Bar(
+                    name='This Week',
+                    x=metrics,
+                    y=this_week_vals,
+                    marker_color=COLORS['teal'],
+                    text=[f"{this_week_exercise:.0f} min", f"{this_week_steps:,.0f}"],
+                    textposition='outside',
+                    textfont=dict(color='#FFFFFF', size=10),
+                    hovertemplate="<b>This Week</b><br>%{x}: %{text}<extra></extra>"
+                ))
+                
+                fig_compare.update_layout(
+                    barmode='group',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=20, r=20, t=20, b=10),
+                    height=240,
+                    xaxis=dict(
+                        tickfont=dict(color='#A0A0B0', size=11),
+                    ),
+                    yaxis=dict(
+                        visible=False,
+                        range=[0, max(max(this_week_vals), max(last_week_vals)) * 1.25]
+                    ),
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="center",
+                        x=0.5,
+                        font=dict(color='#A0A0B0', size=10)
+                    ),
+                    bargap=0.25,
+                    hoverlabel=dict(
+                        bgcolor='#1A1A2E',
+                        font_size=12,
+                        font_family='Outfit',
+                        font_color='#FFFFFF',
+                        bordercolor='#4ECDC4'
+                    )
+                )
+                figures['compare'] = fig_compare
+            st.plotly_chart(figures['compare'], use_container_width=True)
+            
+            # Show change indicators
+            exercise_color = COLORS['teal'] if exercise_change >= 0 else COLORS['coral']
+            steps_color = COLORS['teal'] if steps_change >= 0 else COLORS['coral']
+            exercise_arrow = "↑" if exercise_change >= 0 else "↓"
+            steps_arrow = "↑" if steps_change >= 0 else "↓"
+            
+            st.markdown(f"""
         <div style='display: flex; justify-content: space-around; margin-top: -5px;'>
             <span style='color: {exercise_color}; font-size: 0.85rem;'>{exercise_arrow} {abs(exercise_change):.0f}% exercise</span>
             <span style='color: {steps_color}; font-size: 0.85rem;'>{steps_arrow} {abs(steps_change):.0f}% steps</span>
         </div>
         """, unsafe_allow_html=True)
-    elif len(compare_data) >= 7:
-        # Only have this week's data
-        this_week = compare_data.tail(7)
-        this_week_exercise = this_week['Total Exercise (min)'].mean()
-        this_week_steps = this_week['Step count'].mean()
-        
-        st.markdown(f"""
+        elif len(compare_data) >= 7:
+            # Only have this week's data
+            this_week = compare_data.tail(7)
+            this_week_exercise = this_week['Total Exercise (min)'].mean()
+            this_week_steps = this_week['Step count'].mean()
+            
+            st.markdown(f"""
         <div style='text-align: center; padding: 1rem;'>
             <p style='color: #A0A0B0; margin: 0.5rem 0;'>This Week's Average</p>
             <p style='color: {COLORS['teal']}; font-size: 1.5rem; font-weight: 700; margin: 0;'>{this_week_exercise:.0f} min/day</p>
@@ -1189,202 +1262,202 @@ with col1:
             <p style='color: #6B6B80; font-size: 0.75rem; margin-top: 1rem;'>Need 2 weeks of data for comparison</p>
         </div>
         """, unsafe_allow_html=True)
-    else:
-        st.info("Need at least 7 days of data")
-    
-
-with col2:
-    # Weekly Activity Pattern - Radial Chart
-    st.markdown("### Weekly Activity Pattern")
-    st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>See which days you're most active throughout the week</p>", unsafe_allow_html=True)
-    
-    # First aggregate by date to get daily totals, then average by day of week
-    daily_totals = filtered_df.groupby(['Date', 'Day Name']).agg({
-        'Total Exercise (min)': 'sum',
-        'Step count': 'sum',
-        'Calories (kcal)': 'sum'
-    }).reset_index()
-    
-    # Now calculate average per day of week
-    daily_pattern = daily_totals.groupby('Day Name').agg({
-        'Total Exercise (min)': 'mean',
-        'Step count': 'mean',
-        'Calories (kcal)': 'mean'
-    }).reset_index()
-    
-    # Ensure all days are present and in correct order (use full names for matching)
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily_pattern['Day Name'] = pd.Categorical(daily_pattern['Day Name'], categories=day_order, ordered=True)
-    daily_pattern = daily_pattern.sort_values('Day Name')
-    
-    # Fill missing days with 0
-    all_days = pd.DataFrame({'Day Name': day_order})
-    daily_pattern = all_days.merge(daily_pattern, on='Day Name', how='left').fillna(0)
-    
-    # Map to short day names for display
-    day_short = {'Monday': 'Mon', 'Tuesday': 'Tue', 'Wednesday': 'Wed', 
-                 'Thursday': 'Thu', 'Friday': 'Fri', 'Saturday': 'Sat', 'Sunday': 'Sun'}
-    daily_pattern['Day Short'] = daily_pattern['Day Name'].map(day_short)
-    
-    # Create radial/polar bar chart
-    fig_radial = go.Figure()
-    
-    # Add polar bar trace with reduced opacity for better axis visibility
-    fig_radial.add_trace(go.Barpolar(
-        r=daily_pattern['Total Exercise (min)'],
-        theta=daily_pattern['Day Short'],
-        marker=dict(
-            color=daily_pattern['Total Exercise (min)'],
-            colorscale=[[0, COLORS['purple']], [0.5, COLORS['teal']], [1, COLORS['coral']]],
-            line=dict(color='#0F0F1A', width=2),
-            opacity=0.85,
-            showscale=False
-        ),
-        hovertemplate="<b>%{theta}</b><br>%{r:.1f} min avg<extra></extra>",
-        text=daily_pattern['Total Exercise (min)'].round(1)
-    ))
-    
-    # Calculate a nice max value for the axis
-    max_val = daily_pattern['Total Exercise (min)'].max()
-    axis_max = max(max_val * 1.3, 10)  # At least 10 for visibility
-    
-    fig_radial.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                showline=True,
-                linewidth=2,
-                linecolor='rgba(78, 205, 196, 0.5)',
-                gridcolor='rgba(78, 205, 196, 0.3)',
-                gridwidth=1.5,
-                tickfont=dict(color='#FFFFFF', size=10),
-                tickangle=45,
-                range=[0, axis_max]
-            ),
-            angularaxis=dict(
-                tickfont=dict(color='#FFFFFF', size=12, family='Outfit'),
-                gridcolor='rgba(78, 205, 196, 0.25)',
-                gridwidth=1,
-                linecolor='rgba(78, 205, 196, 0.4)',
-                linewidth=2,
-                rotation=90,
-                direction='clockwise'
-            ),
-            bgcolor='rgba(26, 26, 46, 0.3)'
-        ),
-        paper_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=40, r=40, t=30, b=30),
-        height=320,
-        showlegend=False
-    )
-    st.plotly_chart(fig_radial, use_container_width=True)
-    
-    # Add unit label below the chart
-    st.markdown("<p style='text-align: center; color: #6B6B80; font-size: 0.8rem; margin-top: -15px;'>Average minutes per day</p>", unsafe_allow_html=True)
-    
-
-with col3:
-    # Time of Day Analysis - Fixed legend overlap and night color
-    st.markdown("### Time of Day")
-    st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Discover your peak activity hours throughout the day</p>", unsafe_allow_html=True)
-    
-    # Filter out rows without valid hour data
-    hourly_data = filtered_df[filtered_df['Hour'].notna()].copy()
-    
-    if len(hourly_data) > 0:
-        hourly_pattern = hourly_data.groupby('Hour').agg({
-            'Total Exercise (min)': 'sum'
-        }).reset_index()
-        
-        # Ensure all hours are represented
-        all_hours = pd.DataFrame({'Hour': range(24)})
-        hourly_pattern = all_hours.merge(hourly_pattern, on='Hour', how='left').fillna(0)
+        else:
+            st.info("Need at least 7 days of data")
         
-        # Create time categories
-        def get_time_period(hour):
-            if 5 <= hour < 12:
-                return 'Morning'
-            elif 12 <= hour < 17:
-                return 'Afternoon'
-            elif 17 <= hour < 21:
-                return 'Evening'
-            else:
-                return 'Night'
+
+    with col2:
+        # Weekly Activity Pattern - Radial Chart
+        st.markdown("### Weekly Activity Pattern")
+        st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>See which days you're most active throughout the week</p>", unsafe_allow_html=True)
         
-        hourly_pattern['Period'] = hourly_pattern['Hour'].apply(get_time_period)
+        if 'radial' not in figures:
+            # First aggregate by date to get daily totals, then average by day of week
+            weekday_totals = daily_agg[['Date', 'Total Exercise (min)', 'Step count', 'Calories (kcal)']].copy()
+            weekday_totals['Day Name'] = day_name(weekday_totals['Date'].dt.dayofweek)
+            
+            # Now calculate average per day of week
+            daily_pattern = weekday_totals.groupby('Day Name', observed=True).agg({
+                'Total Exercise (min)': 'mean',
+                'Step count': 'mean',
+                'Calories (kcal)': 'mean'
+            }).reset_index()
+            
+            # Ensure all days are present and in correct order (use full names for matching)
+            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+            daily_pattern['Day Name'] = pd.Categorical(daily_pattern['Day Name'], categories=day_order, ordered=True)
+            daily_pattern = daily_pattern.sort_values('Day Name')
+            
+            # Fill missing days with 0
+            all_days = pd.DataFrame({'Day Name': day_order})
+            daily_pattern = all_days.merge(daily_pattern, on='Day Name', how='left').fillna(0)
+            
+            # Map to short day names for display
+            day_short = {'Monday': 'Mon', 'Tuesday': 'Tue', 'Wednesday': 'Wed', 
+                         'Thursday': 'Thu', 'Friday': 'Fri', 'Saturday': 'Sat', 'Sunday': 'Sun'}
+            daily_pattern['Day Short'] = daily_pattern['Day Name'].map(day_short)
+            
+            # Create radial/polar bar chart
+            fig_radial = go.Figure()
+            
+            # Add polar bar trace with reduced opacity for better axis visibility
+            fig_radial.add_trace(go.Barpolar(
+                r=daily_pattern['Total Exercise (min)'],
+                theta=daily_pattern['Day Short'],
+                marker=dict(
+                    color=daily_pattern['Total Exercise (min)'],
+                    colorscale=[[0, COLORS['purple']], [0.5, COLORS['teal']], [1, COLORS['coral']]],
+                    line=dict(color='#0F0F1A', width=2),
+                    opacity=0.85,
+                    showscale=False
+                ),
+                hovertemplate="<b>%{theta}</b><br>%{r:.1f} min avg<extra></extra>",
+                text=daily_pattern['Total Exercise (min)'].round(1)
+            ))
+            
+            # Calculate a nice max value for the axis
+            max_val = daily_pattern['Total Exercise (min)'].max()
+            axis_max = max(max_val * 1.3, 10)  # At least 10 for visibility
+            
+            fig_radial.update_layout(
+                polar=dict(
+                    radialaxis=dict(
+                        visible=True,
+                        showline=True,
+                        linewidth=2,
+                        linecolor='rgba(78, 205, 196, 0.5)',
+                        gridcolor='rgba(78, 205, 196, 0.3)',
+                        gridwidth=1.5,
+                        tickfont=dict(color='#FFFFFF', size=10),
+                        tickangle=45,
+                        range=[0, axis_max]
+                    ),
+                    angularaxis=dict(
+                        tickfont=dict(color='#FFFFFF', size=12, family='Outfit'),
+                        gridcolor='rgba(78, 205, 196, 0.25)',
+                        gridwidth=1,
+                        linecolor='rgba(78, 205, 196, 0.4)',
+                        linewidth=2,
+                        rotation=90,
+                        direction='clockwise'
+                    ),
+                    bgcolor='rgba(26, 26, 46, 0.3)'
+                ),
+                paper_bgcolor='rgba(0,0,0,0)',
+                margin=dict(l=40, r=40, t=30, b=30),
+                height=320,
+                showlegend=False
+            )
+            figures['radial'] = fig_radial
+        st.plotly_chart(figures['radial'], use_container_width=True)
         
-        # Updated night color to be more visible
-        period_colors = {
-            'Morning': COLORS['gold'],
-            'Afternoon': COLORS['coral'],
-            'Evening': COLORS['purple'],
-            'Night': COLORS['blue']  # Changed from navy to blue for visibility
-        }
+        # Add unit label below the chart
+        st.markdown("<p style='text-align: center; color: #6B6B80; font-size: 0.8rem; margin-top: -15px;'>Average minutes per day</p>", unsafe_allow_html=True)
         
-        fig_hourly = go.Figure()
+
+    with col3:
+        # Time of Day Analysis - Fixed legend overlap and night color
+        st.markdown("### Time of Day")
+        st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Discover your peak activity hours throughout the day</p>", unsafe_allow_html=True)
         
-        for period in ['Morning', 'Afternoon', 'Evening', 'Night']:
-            period_data = hourly_pattern[hourly_pattern['Period'] == period]
-            fig_hourly.add_trace(go.Bar(
-                x=period_data['Hour'],
-                y=period_data['Total Exercise (min)'],
-                name=period,
-                marker_color=period_colors[period],
-                hovertemplate="%{x}:00<br>%{y:.0f} min<extra></extra>"
-            ))
+        # Filter out rows without valid hour data
+        hourly_data = filtered_df[filtered_df['Hour'].notna()].copy()
         
-        fig_hourly.update_layout(
-            barmode='stack',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=40, b=30),
-            height=300,
-            xaxis=dict(
-                tickvals=list(range(0, 24, 3)),
-                ticktext=['12am', '3am', '6am', '9am', '12pm', '3pm', '6pm', '9pm'],
-                tickfont=dict(color='#A0A0B0'),
-                gridcolor='rgba(78, 205, 196, 0.1)'
-            ),
-            yaxis=dict(
-                title=dict(text="Minutes", font=dict(color='#A0A0B0')),
-                tickfont=dict(color='#A0A0B0'),
-                gridcolor='rgba(78, 205, 196, 0.1)'
-            ),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(color='#A0A0B0', size=11)
-            ),
-            showlegend=True
-        )
-        st.plotly_chart(fig_hourly, use_container_width=True)
-    else:
-        st.info("No time-of-day data available")
+        if len(hourly_data) > 0:
+            if 'hourly' not in figures:
+                hourly_pattern = hourly_data.groupby('Hour').agg({
+                    'Total Exercise (min)': 'sum'
+                }).reset_index()
+                
+                # Ensure all hours are represented
+                all_hours = pd.DataFrame({'Hour': range(24)})
+                hourly_pattern = all_hours.merge(hourly_pattern, on='Hour', how='left').fillna(0)
+                
+                # Create time categories
+                def get_time_period(hour):
+                    if 5 <= hour < 12:
+                        return 'Morning'
+                    elif 12 <= hour < 17:
+                        return 'Afternoon'
+                    elif 17 <= hour < 21:
+                        return 'Evening'
+                    else:
+                        return 'Night'
+                
+                hourly_pattern['Period'] = hourly_pattern['Hour'].apply(get_time_period)
+                
+                # Updated night color to be more visible
+                period_colors = {
+                    'Morning': COLORS['gold'],
+                    'Afternoon': COLORS['coral'],
+                    'Evening': COLORS['purple'],
+                    'Night': COLORS['blue']  # Changed from navy to blue for visibility
+                }
+                
+                fig_hourly = go.Figure()
+                
+                for period in ['Morning', 'Afternoon', 'Evening', 'Night']:
+                    period_data = hourly_pattern[hourly_pattern['Period'] == period]
+                    fig_hourly.add_trace(go.Bar(
+                        x=period_data['Hour'],
+                        y=period_data['Total Exercise (min)'],
+                        name=period,
+                        marker_color=period_colors[period],
+                        hovertemplate="%{x}:00<br>%{y:.0f} min<extra></extra>"
+                    ))
+                
+                fig_hourly.update_layout(
+                    barmode='stack',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=20, r=20, t=40, b=30),
+                    height=300,
+                    xaxis=dict(
+                        tickvals=list(range(0, 24, 3)),
+                        ticktext=['12am', '3am', '6am', '9am', '12pm', '3pm', '6pm', '9pm'],
+                        tickfont=dict(color='#A0A0B0'),
+                        gridcolor='rgba(78, 205, 196, 0.1)'
+                    ),
+                    yaxis=dict(
+                        title=dict(text="Minutes", font=dict(color='#A0A0B0')),
+                        tickfont=dict(color='#A0A0B0'),
+                        gridcolor='rgba(78, 205, 196, 0.1)'
+                    ),
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="center",
+                        x=0.5,
+                        font=dict(color='#A0A0B0', size=11)
+                    ),
+                    showlegend=True
+                )
+                figures['hourly'] = fig_hourly
+            st.plotly_chart(figures['hourly'], use_container_width=True)
+        else:
+            st.info("No time-of-day data available")
+
+patterns_and_insights()
 
 # =============================================================================
 # SECTION 5: PERSONAL RECORDS
 # =============================================================================
 
-st.markdown("## Personal Records")
+@st.fragment
+def personal_records():
+    """Best days for steps, distance and calories"""
+    st.markdown("## Personal Records")
 
-# Calculate records
-daily_records = filtered_df.groupby('Date').agg({
-    'Step count': 'sum',
-    'Calories (kcal)': 'sum',
-    'Distance (m)': 'sum',
-    'Total Exercise (min)': 'sum',
-    'Heart Points': 'sum',
-}).reset_index()
+    # Records come straight from the per-day totals
+    daily_records = daily_agg
 
-col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns(3)
 
-with col1:
-    max_steps_row = daily_records.loc[daily_records['Step count'].idxmax()] if len(daily_records) > 0 else None
-    if max_steps_row is not None and pd.notna(max_steps_row['Step count']):
-        st.markdown(f"""
+    with col1:
+        max_steps_row = daily_records.loc[daily_records['Step count'].idxmax()] if len(daily_records) > 0 else None
+        if max_steps_row is not None and pd.notna(max_steps_row['Step count']):
+            st.markdown(f"""
         <div style="background: linear-gradient(145deg, #1A1A2E, #252542); border-radius: 16px; padding: 1.5rem; border: 1px solid rgba(255, 107, 107, 0.3); box-shadow: 0 0 20px rgba(255, 107, 107, 0.1); text-align: center;">
             <p style="color: #FF6B6B; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 1px;">🥇 Most Steps</p>
             <p style="color: white; font-size: 2rem; font-weight: 700; margin: 0.5rem 0;">{max_steps_row['Step count']:,.0f}</p>
@@ -1392,10 +1465,10 @@ with col1:
         </div>
         """, unsafe_allow_html=True)
 
-with col2:
-    max_distance_row = daily_records.loc[daily_records['Distance (m)'].idxmax()] if len(daily_records) > 0 else None
-    if max_distance_row is not None and pd.notna(max_distance_row['Distance (m)']):
-        st.markdown(f"""
+    with col2:
+        max_distance_row = daily_records.loc[daily_records['Distance (m)'].idxmax()] if len(daily_records) > 0 else None
+        if max_distance_row is not None and pd.notna(max_distance_row['Distance (m)']):
+            st.markdown(f"""
         <div style="background: linear-gradient(145deg, #1A1A2E, #252542); border-radius: 16px; padding: 1.5rem; border: 1px solid rgba(78, 205, 196, 0.3); box-shadow: 0 0 20px rgba(78, 205, 196, 0.1); text-align: center;">
             <p style="color: #4ECDC4; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 1px;">🥇 Longest Distance</p>
             <p style="color: white; font-size: 2rem; font-weight: 700; margin: 0.5rem 0;">{max_distance_row['Distance (m)']/1000:.1f} km</p>
@@ -1403,10 +1476,10 @@ with col2:
         </div>
         """, unsafe_allow_html=True)
 
-with col3:
-    max_calories_row = daily_records.loc[daily_records['Calories (kcal)'].idxmax()] if len(daily_records) > 0 else None
-    if max_calories_row is not None and pd.notna(max_calories_row['Calories (kcal)']):
-        st.markdown(f"""
+    with col3:
+        max_calories_row = daily_records.loc[daily_records['Calories (kcal)'].idxmax()] if len(daily_records) > 0 else None
+        if max_calories_row is not None and pd.notna(max_calories_row['Calories (kcal)']):
+            st.markdown(f"""
         <div style="background: linear-gradient(145deg, #1A1A2E, #252542); border-radius: 16px; padding: 1.5rem; border: 1px solid rgba(108, 99, 255, 0.3); box-shadow: 0 0 20px rgba(108, 99, 255, 0.1); text-align: center;">
             <p style="color: #6C63FF; font-size: 0.75rem; margin: 0; text-transform: uppercase; letter-spacing: 1px;">🥇 Most Calories</p>
             <p style="color: white; font-size: 2rem; font-weight: 700; margin: 0.5rem 0;">{max_calories_row['Calories (kcal)']:,.0f} kcal</p>
@@ -1414,298 +1487,307 @@ with col3:
         </div>
         """, unsafe_allow_html=True)
 
+personal_records()
+
 # =============================================================================
 # SECTION 6: LOCATION ANALYSIS
 # =============================================================================
 
-st.markdown("## Location Analysis")
+@st.fragment
+def location_analysis():
+    """Activity map and top locations"""
+    st.markdown("## Location Analysis")
 
-col1, col2 = st.columns([2, 1])
+    col1, col2 = st.columns([2, 1])
 
-with col1:
-    st.markdown("""
+    with col1:
+        st.markdown("""
     <div style="background: linear-gradient(135deg, rgba(78, 205, 196, 0.1) 0%, rgba(108, 99, 255, 0.1) 100%); border-radius: 12px; padding: 0.8rem 1rem; margin-bottom: 0.5rem; border: 1px solid rgba(78, 205, 196, 0.2);">
         <p style="color: white; font-weight: 600; margin: 0; font-size: 1rem;">📍 Your Activity Hotspots</p>
         <p style="color: #A0A0B0; margin: 0.2rem 0 0 0; font-size: 0.8rem;">Explore where you've been most active</p>
     </div>
     """, unsafe_allow_html=True)
-    
-    # Map visualization
-    map_data = filtered_df[
-        (filtered_df['Low latitude (deg)'].notna()) & 
-        (filtered_df['Low longitude (deg)'].notna())
-    ].copy()
-    
-    if len(map_data) > 0:
-        # Aggregate by location
-        location_agg = map_data.groupby(['Low latitude (deg)', 'Low longitude (deg)', 'Location']).agg({
-            'Total Exercise (min)': 'sum',
-            'Calories (kcal)': 'sum',
-            'Step count': 'sum'
-        }).reset_index()
-        
-        # Size based on exercise duration
-        max_exercise = location_agg['Total Exercise (min)'].max()
-        location_agg['size'] = (location_agg['Total Exercise (min)'] / max_exercise * 30 + 5) if max_exercise > 0 else 10
         
-        # Create the map with go.Scattermapbox for better color control
-        fig_map = go.Figure()
+        # Map visualization: the zoom picks the grid cells hotspots are binned into
+        map_zoom = st.slider("Map Zoom", min_value=1, max_value=16, value=3,
+                             help="Zoom in to split hotspots into smaller areas")
+        map_rows = apply_filters(map_levels[stored_level(map_zoom)], date_range, selected_activities, selected_locations)
         
-        # Normalize colors based on exercise minutes
-        min_exercise = location_agg['Total Exercise (min)'].min()
-        exercise_range = max_exercise - min_exercise if max_exercise > min_exercise else 1
+        if len(map_rows) > 0:
+            if ('map', map_zoom) not in figures:
+                # Per-cell sums straight from the stored map cells of the zoom's grid level
+                location_agg = map_cells(map_rows, map_zoom)
+                
+                # Size based on exercise duration
+                max_exercise = location_agg['Total Exercise (min)'].max()
+                location_agg['size'] = (location_agg['Total Exercise (min)'] / max_exercise * 30 + 5) if max_exercise > 0 else 10
+                
+                # Create the map with go.Scattermapbox for better color control
+                fig_map = go.Figure()
+                
+                # Color scale spans the exercise minutes on the map
+                min_exercise = location_agg['Total Exercise (min)'].min()
+                
+                fig_map.add_trace(go.Scattermapbox(
+                    lat=location_agg['Low latitude (deg)'],
+                    lon=location_agg['Low longitude (deg)'],
+                    mode='markers',
+                    marker=dict(
+                        size=location_agg['size'],
+                        color=location_agg['Total Exercise (min)'],
+                        colorscale=[[0, COLORS['purple']], [0.5, COLORS['teal']], [1, COLORS['coral']]],
+                        cmin=min_exercise,
+                        cmax=max_exercise,
+                        showscale=True,
+                        colorbar=dict(
+                            title=dict(text="Minutes", font=dict(color='#A0A0B0')),
+                            tickfont=dict(color='#A0A0B0'),
+                            bgcolor='rgba(0,0,0,0)',
+                            x=0.99
+                        ),
+                        opacity=0.9
+                    ),
+                    text=location_agg['Location'],
+                    customdata=np.column_stack((
+                        location_agg['Total Exercise (min)'],
+                        location_agg['Calories (kcal)'],
+                        location_agg['Step count']
+                    )),
+                    hovertemplate="<b>%{text}</b><br>" +
+                                  "Exercise: %{customdata[0]:.0f} min<br>" +
+                                  "Calories: %{customdata[1]:.0f} kcal<br>" +
+                                  "Steps: %{customdata[2]:,.0f}<extra></extra>"
+                ))
+                
+                fig_map.update_layout(
+                    mapbox=dict(
+                        style="carto-darkmatter",
+                        center=dict(
+                            lat=location_agg['Low latitude (deg)'].mean(),
+                            lon=location_agg['Low longitude (deg)'].mean()
+                        ),
+                        zoom=map_zoom
+                    ),
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=0, r=0, t=0, b=0),
+                    height=400,
+                    showlegend=False
+                )
+                figures[('map', map_zoom)] = fig_map
+            st.plotly_chart(figures[('map', map_zoom)], use_container_width=True)
+        else:
+            st.info("No location data available for the selected period")
+
+    with col2:
+        # Top locations
+        st.markdown("### Top Locations")
+        st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Your most visited workout spots ranked by exercise time</p>", unsafe_allow_html=True)
         
-        fig_map.add_trace(go.Scattermapbox(
-            lat=location_agg['Low latitude (deg)'],
-            lon=location_agg['Low longitude (deg)'],
-            mode='markers',
-            marker=dict(
-                size=location_agg['size'],
-                color=location_agg['Total Exercise (min)'],
-                colorscale=[[0, COLORS['purple']], [0.5, COLORS['teal']], [1, COLORS['coral']]],
-                cmin=min_exercise,
-                cmax=max_exercise,
-                showscale=True,
-                colorbar=dict(
-                    title=dict(text="Minutes", font=dict(color='#A0A0B0')),
-                    tickfont=dict(color='#A0A0B0'),
-                    bgcolor='rgba(0,0,0,0)',
-                    x=0.99
-                ),
-                opacity=0.9
-            ),
-            text=location_agg['Location'],
-            customdata=np.column_stack((
-                location_agg['Total Exercise (min)'],
-                location_agg['Calories (kcal)'],
-                location_agg['Step count']
-            )),
-            hovertemplate="<b>%{text}</b><br>" +
-                          "Exercise: %{customdata[0]:.0f} min<br>" +
-                          "Calories: %{customdata[1]:.0f} kcal<br>" +
-                          "Steps: %{customdata[2]:,.0f}<extra></extra>"
-        ))
+        # Top 5 straight from the location index, without regrouping interval rows
+        location_stats = location_index.top(date_range, selected_activities, selected_locations, k=5)
         
-        fig_map.update_layout(
-            mapbox=dict(
-                style="carto-darkmatter",
-                center=dict(
-                    lat=location_agg['Low latitude (deg)'].mean(),
-                    lon=location_agg['Low longitude (deg)'].mean()
-                ),
-                zoom=3
-            ),
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=0, b=0),
-            height=400,
-            showlegend=False
-        )
-        st.plotly_chart(fig_map, use_container_width=True)
-    else:
-        st.info("No location data available for the selected period")
-
-with col2:
-    # Top locations
-    st.markdown("### Top Locations")
-    st.markdown("<p style='color: #6B6B80; font-size: 0.8rem; margin: -10px 0 10px 0;'>Your most visited workout spots ranked by exercise time</p>", unsafe_allow_html=True)
-    
-    location_stats = filtered_df.groupby('Location').agg({
-        'Total Exercise (min)': 'sum',
-        'Step count': 'sum',
-        'Calories (kcal)': 'sum'
-    }).reset_index()
-    location_stats = location_stats[location_stats['Location'] != 'Unknown']
-    location_stats = location_stats.sort_values('Total Exercise (min)', ascending=False).head(5)
-    
-    for idx, row in location_stats.iterrows():
-        pct = row['Total Exercise (min)'] / location_stats['Total Exercise (min)'].sum() * 100
-        st.markdown(f"""
+        for idx, row in location_stats.iterrows():
+            st.markdown(f"""
         <div style="background: linear-gradient(145deg, #1A1A2E, #252542); border-radius: 10px; padding: 0.8rem 1rem; margin-bottom: 0.5rem; border-left: 3px solid {COLORS['teal']};">
             <p style="color: white; font-weight: 600; margin: 0; font-size: 0.9rem;">{row['Location']}</p>
             <p style="color: #A0A0B0; margin: 0.2rem 0 0 0; font-size: 0.8rem;">{format_duration(row['Total Exercise (min)'])} • {row['Step count']:,.0f} steps</p>
         </div>
         """, unsafe_allow_html=True)
 
+location_analysis()
+
 # =============================================================================
 # SECTION 7: DETAILED BREAKDOWN
 # =============================================================================
 
-st.markdown("## Detailed Breakdown")
-
-tab1, tab2, tab3 = st.tabs(["Exercise by Type", "Heart Health", "Calorie Trends"])
-
-with tab1:
-    # Stacked area chart for exercise types over time
-    st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>Track how your walking, cycling, running, and paced walking activities change over time</p>", unsafe_allow_html=True)
-    exercise_by_type = filtered_df.copy()
-    exercise_by_type['Walking (min)'] = exercise_by_type['Walking duration (ms)'].fillna(0) / 60000
-    exercise_by_type['Cycling (min)'] = exercise_by_type['Cycling duration (ms)'].fillna(0) / 60000
-    exercise_by_type['Paced Walking (min)'] = exercise_by_type['Paced walking duration (ms)'].fillna(0) / 60000
-    exercise_by_type['Running (min)'] = exercise_by_type['Running duration (ms)'].fillna(0) / 60000
-    
-    # Check if only one day is selected - use intra-day intervals instead of daily aggregation
-    unique_dates = exercise_by_type['Date'].nunique()
-    
-    if unique_dates == 1 and 'Start time' in exercise_by_type.columns:
-        # Single day: show 15-minute interval breakdown
-        exercise_by_type = exercise_by_type.dropna(subset=['Start time'])
-        exercise_by_type['Time'] = exercise_by_type['Start time'].dt.strftime('%H:%M')
-        daily_exercise = exercise_by_type.sort_values('Start time')
-        x_col = 'Time'
-        x_title = "Time of Day"
-    else:
-        # Multiple days: aggregate by date
-        daily_exercise = exercise_by_type.groupby('Date').agg({
-            'Walking (min)': 'sum',
-            'Cycling (min)': 'sum',
-            'Paced Walking (min)': 'sum',
-            'Running (min)': 'sum'
-        }).reset_index().sort_values('Date')
-        x_col = 'Date'
-        x_title = None
-    
-    fig_stacked = go.Figure()
-    
-    for activity, color in [('Walking (min)', COLORS['teal']), 
-                            ('Cycling (min)', COLORS['purple']),
-                            ('Paced Walking (min)', COLORS['gold']),
-                            ('Running (min)', COLORS['coral'])]:
-        fig_stacked.add_trace(go.Scatter(
-            x=daily_exercise[x_col],
-            y=daily_exercise[activity],
-            mode='lines+markers' if unique_dates == 1 else 'lines',
-            name=activity.replace(' (min)', ''),
-            stackgroup='one',
-            fillcolor=f'rgba({int(color[1:3], 16)}, {int(color[3:5], 16)}, {int(color[5:7], 16)}, 0.6)',
-            line=dict(width=0.5, color=color),
-            marker=dict(size=4, color=color) if unique_dates == 1 else None,
-            hovertemplate="%{y:.0f} min<extra></extra>"
-        ))
-    
-    fig_stacked.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=20, r=20, t=40, b=40),
-        height=400,
-        xaxis=dict(
-            tickfont=dict(color='#A0A0B0'),
-            gridcolor='rgba(78, 205, 196, 0.1)',
-            title=dict(text=x_title, font=dict(color='#A0A0B0')) if x_title else None
-        ),
-        yaxis=dict(
-            title=dict(text="Duration (minutes)", font=dict(color='#A0A0B0')),
-            tickfont=dict(color='#A0A0B0'),
-            gridcolor='rgba(78, 205, 196, 0.1)'
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="center",
-            x=0.5,
-            font=dict(color='#A0A0B0')
-        ),
-        hovermode='x unified'
+@st.fragment
+def detailed_breakdown():
+    """Exercise by type, heart health and calorie trend tabs"""
+    st.markdown("## Detailed Breakdown")
+
+    # Only the open tab's body runs; switching tabs reruns just this section
+    tab1, tab2, tab3 = st.tabs(
+        ["Exercise by Type", "Heart Health", "Calorie Trends"],
+        key="breakdown_tab",
+        on_change="rerun"
     )
-    st.plotly_chart(fig_stacked, use_container_width=True)
 
-with tab2:
-    # Heart Points analysis
-    st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>❤️ Monitor your cardiovascular health progress against WHO's recommended 21 heart points per day</p>", unsafe_allow_html=True)
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Heart Points over time
-        heart_data = daily_agg[['Date', 'Heart Points']].copy()
-        heart_data = heart_data.sort_values('Date')
-        
-        fig_heart = go.Figure()
-        
-        fig_heart.add_trace(go.Scatter(
-            x=heart_data['Date'],
-            y=heart_data['Heart Points'],
-            fill='tozeroy',
-            fillcolor='rgba(255, 107, 107, 0.3)',
-            line=dict(color=COLORS['coral'], width=2),
-            hovertemplate="<b>%{x|%b %d, %Y}</b><br>%{y:.0f} Heart Points<extra></extra>"
-        ))
-        
-        # Add WHO recommended line (150 min/week moderate = ~21/day)
-        fig_heart.add_hline(
-            y=21, 
-            line_dash="dash", 
-            line_color=COLORS['teal'],
-            annotation_text="WHO Daily Goal (21)",
-            annotation_position="top right",
-            annotation_font_color=COLORS['teal']
-        )
-        
-        fig_heart.update_layout(
-            title=dict(text="Daily Heart Points", font=dict(color='white', size=16)),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=60, b=40),
-            height=350,
-            xaxis=dict(tickfont=dict(color='#A0A0B0'), gridcolor='rgba(78, 205, 196, 0.1)'),
-            yaxis=dict(
-                title=dict(text="Heart Points", font=dict(color='#A0A0B0')),
-                tickfont=dict(color='#A0A0B0'),
-                gridcolor='rgba(78, 205, 196, 0.1)'
-            )
-        )
-        st.plotly_chart(fig_heart, use_container_width=True)
-    
-    with col2:
-        # Heart Points distribution
-        hp_stats = {
-            'Below Goal (<21)': len(heart_data[heart_data['Heart Points'] < 21]),
-            'Meeting Goal (21-42)': len(heart_data[(heart_data['Heart Points'] >= 21) & (heart_data['Heart Points'] < 42)]),
-            'Exceeding Goal (42+)': len(heart_data[heart_data['Heart Points'] >= 42])
-        }
-        
-        total_days_hp = sum(hp_stats.values())
-        
-        fig_hp_dist = go.Figure(data=[go.Pie(
-            labels=list(hp_stats.keys()),
-            values=list(hp_stats.values()),
-            hole=0.6,
-            marker=dict(
-                colors=[COLORS['coral'], COLORS['gold'], COLORS['teal']],
-                line=dict(color='#0F0F1A', width=3)
-            ),
-            textinfo='none',
-            hovertemplate="<b>%{label}</b><br>%{value} days (%{percent})<extra></extra>"
-        )])
-        
-        fig_hp_dist.update_layout(
-            title=dict(text="Heart Points Achievement", font=dict(color='white', size=16)),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=20, r=20, t=60, b=80),
-            height=350,
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.05,
-                xanchor="center",
-                x=0.5,
-                font=dict(color='#A0A0B0', size=11)
-            ),
-            annotations=[dict(
-                text=f"<b>{total_days_hp}</b><br>days",
-                x=0.5, y=0.5,
-                font=dict(size=18, color='white', family='Outfit'),
-                showarrow=False
-            )]
-        )
-        st.plotly_chart(fig_hp_dist, use_container_width=True)
-        
-        # Show breakdown below chart
-        below_pct = hp_stats['Below Goal (<21)'] / total_days_hp * 100 if total_days_hp > 0 else 0
-        meeting_pct = hp_stats['Meeting Goal (21-42)'] / total_days_hp * 100 if total_days_hp > 0 else 0
-        exceeding_pct = hp_stats['Exceeding Goal (42+)'] / total_days_hp * 100 if total_days_hp > 0 else 0
-        
-        st.markdown(f"""
+    with tab1:
+        if tab1.open:
+            # Stacked area chart for exercise types over time
+            st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>Track how your walking, cycling, running, and paced walking activities change over time</p>", unsafe_allow_html=True)
+            if 'stacked' not in figures:
+                # Check if only one day is selected - use intra-day intervals instead of daily aggregation
+                unique_dates = len(daily_agg)
+                
+                if unique_dates == 1 and 'Start time' in filtered_df.columns:
+                    # Single day: show 15-minute interval breakdown
+                    exercise_by_type = filtered_df.dropna(subset=['Start time']).copy()
+                    exercise_by_type['Walking (min)'] = exercise_by_type['Walking duration (ms)'].fillna(0) / 60000
+                    exercise_by_type['Cycling (min)'] = exercise_by_type['Cycling duration (ms)'].fillna(0) / 60000
+                    exercise_by_type['Paced Walking (min)'] = exercise_by_type['Paced walking duration (ms)'].fillna(0) / 60000
+                    exercise_by_type['Running (min)'] = exercise_by_type['Running duration (ms)'].fillna(0) / 60000
+                    exercise_by_type['Time'] = pd.to_datetime(exercise_by_type['Start time'], unit='s').dt.strftime('%H:%M')
+                    daily_exercise = exercise_by_type.sort_values('Start time')
+                    x_col = 'Time'
+                    x_title = "Time of Day"
+                else:
+                    # Multiple days: per-day minutes are already in the daily rollup,
+                    # thinned on the stack's total over long ranges
+                    daily_exercise = downsample(daily_agg, 'Total Exercise (min)')
+                    x_col = 'Date'
+                    x_title = None
+                
+                fig_stacked = go.Figure()
+                
+                stacked_layers = [
+                    dict(
+                        y=daily_exercise[activity],
+                        mode='lines+markers' if unique_dates == 1 else 'lines',
+                        name=activity.replace(' (min)', ''),
+                        fillcolor=f'rgba({int(color[1:3], 16)}, {int(color[3:5], 16)}, {int(color[5:7], 16)}, 0.6)',
+                        line=dict(width=0.5, color=color),
+                        marker=dict(size=4, color=color) if unique_dates == 1 else None,
+                        hovertemplate="%{y:.0f} min<extra></extra>"
+                    )
+                    for activity, color in [('Walking (min)', COLORS['teal']), 
+                                            ('Cycling (min)', COLORS['purple']),
+                                            ('Paced Walking (min)', COLORS['gold']),
+                                            ('Running (min)', COLORS['coral'])]
+                ]
+                fig_stacked.add_traces(stacked_area_traces(daily_exercise[x_col], stacked_layers, WEBGL_THRESHOLD))
+                
+                fig_stacked.update_layout(
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=20, r=20, t=40, b=40),
+                    height=400,
+                    xaxis=dict(
+                        tickfont=dict(color='#A0A0B0'),
+                        gridcolor='rgba(78, 205, 196, 0.1)',
+                        title=dict(text=x_title, font=dict(color='#A0A0B0')) if x_title else None
+                    ),
+                    yaxis=dict(
+                        title=dict(text="Duration (minutes)", font=dict(color='#A0A0B0')),
+                        tickfont=dict(color='#A0A0B0'),
+                        gridcolor='rgba(78, 205, 196, 0.1)'
+                    ),
+                    legend=dict(
+                        orientation="h",
+                        yanchor="bottom",
+                        y=1.02,
+                        xanchor="center",
+                        x=0.5,
+                        font=dict(color='#A0A0B0')
+                    ),
+                    hovermode='x unified'
+                )
+                figures['stacked'] = fig_stacked
+            st.plotly_chart(figures['stacked'], use_container_width=True)
+
+    with tab2:
+        if tab2.open:
+            # Heart Points analysis
+            st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>❤️ Monitor your cardiovascular health progress against WHO's recommended 21 heart points per day</p>", unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Heart Points over time
+                heart_data = daily_agg[['Date', 'Heart Points']].copy()
+                heart_data = heart_data.sort_values('Date')
+                if 'heart' not in figures:
+                    heart_trend = downsample(heart_data, 'Heart Points')
+                    
+                    fig_heart = go.Figure()
+                    
+                    fig_heart.add_trace(scatter_class(len(heart_trend), WEBGL_THRESHOLD)(
+                        x=heart_trend['Date'],
+                        y=heart_trend['Heart Points'],
+                        fill='tozeroy',
+                        fillcolor='rgba(255, 107, 107, 0.3)',
+                        line=dict(color=COLORS['coral'], width=2),
+                        hovertemplate="<b>%{x|%b %d, %Y}</b><br>%{y:.0f} Heart Points<extra></extra>"
+                    ))
+                    
+                    # Add WHO recommended line (150 min/week moderate = ~21/day)
+                    fig_heart.add_hline(
+                        y=21, 
+                        line_dash="dash", 
+                        line_color=COLORS['teal'],
+                        annotation_text="WHO Daily Goal (21)",
+                        annotation_position="top right",
+                        annotation_font_color=COLORS['teal']
+                    )
+                    
+                    fig_heart.update_layout(
+                        title=dict(text="Daily Heart Points", font=dict(color='white', size=16)),
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        margin=dict(l=20, r=20, t=60, b=40),
+                        height=350,
+                        xaxis=dict(tickfont=dict(color='#A0A0B0'), gridcolor='rgba(78, 205, 196, 0.1)'),
+                        yaxis=dict(
+                            title=dict(text="Heart Points", font=dict(color='#A0A0B0')),
+                            tickfont=dict(color='#A0A0B0'),
+                            gridcolor='rgba(78, 205, 196, 0.1)'
+                        )
+                    )
+                    figures['heart'] = fig_heart
+                st.plotly_chart(figures['heart'], use_container_width=True)
+            
+            with col2:
+                # Heart Points distribution
+                hp_stats = {
+                    'Below Goal (<21)': len(heart_data[heart_data['Heart Points'] < 21]),
+                    'Meeting Goal (21-42)': len(heart_data[(heart_data['Heart Points'] >= 21) & (heart_data['Heart Points'] < 42)]),
+                    'Exceeding Goal (42+)': len(heart_data[heart_data['Heart Points'] >= 42])
+                }
+                
+                total_days_hp = sum(hp_stats.values())
+                
+                if 'hp_dist' not in figures:
+                    fig_hp_dist = go.Figure(data=[go.Pie(
+                        labels=list(hp_stats.keys()),
+                        values=list(hp_stats.values()),
+                        hole=0.6,
+                        marker=dict(
+                            colors=[COLORS['coral'], COLORS['gold'], COLORS['teal']],
+                            line=dict(color='#0F0F1A', width=3)
+                        ),
+                        textinfo='none',
+                        hovertemplate="<b>%{label}</b><br>%{value} days (%{percent})<extra></extra>"
+                    )])
+                    
+                    fig_hp_dist.update_layout(
+                        title=dict(text="Heart Points Achievement", font=dict(color='white', size=16)),
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        margin=dict(l=20, r=20, t=60, b=80),
+                        height=350,
+                        legend=dict(
+                            orientation="h",
+                            yanchor="top",
+                            y=-0.05,
+                            xanchor="center",
+                            x=0.5,
+                            font=dict(color='#A0A0B0', size=11)
+                        ),
+                        annotations=[dict(
+                            text=f"<b>{total_days_hp}</b><br>days",
+                            x=0.5, y=0.5,
+                            font=dict(size=18, color='white', family='Outfit'),
+                            showarrow=False
+                        )]
+                    )
+                    figures['hp_dist'] = fig_hp_dist
+                st.plotly_chart(figures['hp_dist'], use_container_width=True)
+                
+                # Show breakdown below chart
+                below_pct = hp_stats['Below Goal (<21)'] / total_days_hp * 100 if total_days_hp > 0 else 0
+                meeting_pct = hp_stats['Meeting Goal (21-42)'] / total_days_hp * 100 if total_days_hp > 0 else 0
+                exceeding_pct = hp_stats['Exceeding Goal (42+)'] / total_days_hp * 100 if total_days_hp > 0 else 0
+                
+                st.markdown(f"""
         <div style="display: flex; justify-content: space-around; text-align: center; margin-top: -10px;">
             <div>
                 <p style="color: {COLORS['coral']}; font-size: 1.2rem; font-weight: 700; margin: 0;">{below_pct:.0f}%</p>
@@ -1722,311 +1804,282 @@ with tab2:
         </div>
         """, unsafe_allow_html=True)
 
-with tab3:
-    # Calorie Trends Analysis
-    st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>📈 Analyze your daily calorie burn patterns and see how your energy expenditure changes over time</p>", unsafe_allow_html=True)
-    calorie_data = daily_agg[['Date', 'Calories (kcal)']].copy()
-    calorie_data = calorie_data.sort_values('Date')
-    
-    if len(calorie_data) > 1:
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Daily Calorie Change from Previous Day
-            calorie_change = calorie_data.copy()
-            calorie_change['Prev Day Calories'] = calorie_change['Calories (kcal)'].shift(1)
-            calorie_change['Change'] = calorie_change['Calories (kcal)'] - calorie_change['Prev Day Calories']
-            calorie_change = calorie_change.dropna()
-            
-            # Color based on increase/decrease
-            colors_cal = [COLORS['teal'] if change >= 0 else COLORS['coral'] 
-                          for change in calorie_change['Change']]
-            
-            fig_calorie_change = go.Figure()
-            
-            fig_calorie_change.add_trace(go.Bar(
-                x=calorie_change['Date'],
-                y=calorie_change['Change'],
-                marker=dict(
-                    color=colors_cal,
-                    line=dict(width=0)
-                ),
-                hovertemplate="<b>%{x|%b %d}</b><br>Change: %{y:+,.0f} kcal<extra></extra>"
-            ))
-            
-            # Add zero line
-            fig_calorie_change.add_hline(
-                y=0,
-                line_dash="solid",
-                line_color='#6B6B80',
-                line_width=1
-            )
-            
-            fig_calorie_change.update_layout(
-                title=dict(text="Daily Calorie Change", font=dict(color='white', size=16)),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=20, r=20, t=60, b=40),
-                height=350,
-                xaxis=dict(
-                    tickfont=dict(color='#A0A0B0', size=9),
-                    gridcolor='rgba(78, 205, 196, 0.1)'
-                ),
-                yaxis=dict(
-                    title=dict(text="kcal change vs Previous Day", font=dict(color='#A0A0B0')),
-                    tickfont=dict(color='#A0A0B0'),
-                    gridcolor='rgba(78, 205, 196, 0.1)',
-                    zeroline=False
-                ),
-                showlegend=False
-            )
-            st.plotly_chart(fig_calorie_change, use_container_width=True)
-            st.markdown("<p style='color: #6B6B80; font-size: 0.75rem; margin-top: -10px; text-align: center;'>Green = burned more than yesterday • Red = burned fewer than yesterday</p>", unsafe_allow_html=True)
-        
-        with col2:
-            # Calorie trend with 7-day rolling average
-            calorie_trend = calorie_data.copy()
-            if len(calorie_trend) >= 7:
-                calorie_trend['Rolling Avg'] = calorie_trend['Calories (kcal)'].rolling(7, min_periods=1).mean()
-            
-            fig_calorie_trend = go.Figure()
+    with tab3:
+        if tab3.open:
+            # Calorie Trends Analysis
+            st.markdown("<p style='color: #6B6B80; font-size: 0.85rem; margin: 0 0 15px 0;'>📈 Analyze your daily calorie burn patterns and see how your energy expenditure changes over time</p>", unsafe_allow_html=True)
+            calorie_data = daily_agg[['Date', 'Calories (kcal)']].copy()
+            calorie_data = calorie_data.sort_values('Date')
             
-            # Daily calories as bars
-            fig_calorie_trend.add_trace(go.Bar(
-                x=calorie_trend['Date'],
-                y=calorie_trend['Calories (kcal)'],
-                marker=dict(
-                    color=COLORS['purple'],
-                    opacity=0.4
-                ),
-                name='Daily',
-                hovertemplate="<b>%{x|%b %d}</b><br>%{y:,.0f} kcal<extra></extra>"
-            ))
-            
-            # Rolling average as line
-            if 'Rolling Avg' in calorie_trend.columns:
-                fig_calorie_trend.add_trace(go.Scatter(
-                    x=calorie_trend['Date'],
-                    y=calorie_trend['Rolling Avg'],
-                    mode='lines',
-                    line=dict(color=COLORS['gold'], width=3),
-                    name='7-Day Avg',
-                    hovertemplate="%{y:,.0f} kcal<extra></extra>"
-                ))
-            
-            fig_calorie_trend.update_layout(
-                title=dict(text="Calorie Burn Trend", font=dict(color='white', size=16)),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=20, r=20, t=60, b=40),
-                height=350,
-                xaxis=dict(tickfont=dict(color='#A0A0B0'), gridcolor='rgba(78, 205, 196, 0.1)'),
-                yaxis=dict(
-                    title=dict(text="Calories (kcal)", font=dict(color='#A0A0B0')),
-                    tickfont=dict(color='#A0A0B0'),
-                    gridcolor='rgba(78, 205, 196, 0.1)'
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="center",
-                    x=0.5,
-                    font=dict(color='#A0A0B0')
-                ),
-                barmode='overlay'
-            )
-            st.plotly_chart(fig_calorie_trend, use_container_width=True)
-    else:
-        st.info("Insufficient calorie data for the selected period")
+            if len(calorie_data) > 1:
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    if 'calorie_change' not in figures:
+                        # Daily Calorie Change from Previous Day
+                        calorie_change = calorie_data.copy()
+                        calorie_change['Prev Day Calories'] = calorie_change['Calories (kcal)'].shift(1)
+                        calorie_change['Change'] = calorie_change['Calories (kcal)'] - calorie_change['Prev Day Calories']
+                        calorie_change = calorie_change.dropna()
+                        
+                        # Color based on increase/decrease
+                        colors_cal = [COLORS['teal'] if change >= 0 else COLORS['coral'] 
+                                      for change in calorie_change['Change']]
+                        
+                        fig_calorie_change = go.Figure()
+                        
+                        fig_calorie_change.add_trace(go.Bar(
+                            x=calorie_change['Date'],
+                            y=calorie_change['Change'],
+                            marker=dict(
+                                color=colors_cal,
+                                line=dict(width=0)
+                            ),
+                            hovertemplate="<b>%{x|%b %d}</b><br>Change: %{y:+,.0f} kcal<extra></extra>"
+                        ))
+                        
+                        # Add zero line
+                        fig_calorie_change.add_hline(
+                            y=0,
+                            line_dash="solid",
+                            line_color='#6B6B80',
+                            line_width=1
+                        )
+                        
+                        fig_calorie_change.update_layout(
+                            title=dict(text="Daily Calorie Change", font=dict(color='white', size=16)),
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            margin=dict(l=20, r=20, t=60, b=40),
+                            height=350,
+                            xaxis=dict(
+                                tickfont=dict(color='#A0A0B0', size=9),
+                                gridcolor='rgba(78, 205, 196, 0.1)'
+                            ),
+                            yaxis=dict(
+                                title=dict(text="kcal change vs Previous Day", font=dict(color='#A0A0B0')),
+                                tickfont=dict(color='#A0A0B0'),
+                                gridcolor='rgba(78, 205, 196, 0.1)',
+                                zeroline=False
+                            ),
+                            showlegend=False
+                        )
+                        figures['calorie_change'] = fig_calorie_change
+                    st.plotly_chart(figures['calorie_change'], use_container_width=True)
+                    st.markdown("<p style='color: #6B6B80; font-size: 0.75rem; margin-top: -10px; text-align: center;'>Green = burned more than yesterday • Red = burned fewer than yesterday</p>", unsafe_allow_html=True)
+                
+                with col2:
+                    # Calorie trend with 7-day rolling average
+                    if 'calorie_trend' not in figures:
+                        calorie_trend = calorie_data.copy()
+                        if len(calorie_trend) >= 7:
+                            calorie_trend['Rolling Avg'] = calorie_trend['Calories (kcal)'].rolling(7, min_periods=1).mean()
+                        # Thin after the rolling average so it still sees every day
+                        calorie_trend = downsample(calorie_trend, 'Calories (kcal)')
+                        calorie_thinned = len(calorie_trend) < len(calorie_data)
+                        
+                        fig_calorie_trend = go.Figure()
+                        
+                        # Daily calories as bars
+                        fig_calorie_trend.add_trace(go.Bar(
+                            x=calorie_trend['Date'],
+                            y=calorie_trend['Calories (kcal)'],
+                            marker=dict(
+                                color=COLORS['purple'],
+                                opacity=0.4
+                            ),
+                            name='Daily',
+                            width=bar_widths(calorie_trend['Date']) if calorie_thinned else None,
+                            offset=0 if calorie_thinned else None,
+                            hovertemplate="<b>%{x|%b %d}</b><br>%{y:,.0f} kcal<extra></extra>"
+                        ))
+                        
+                        # Rolling average as line
+                        if 'Rolling Avg' in calorie_trend.columns:
+                            fig_calorie_trend.add_trace(scatter_class(len(calorie_trend), WEBGL_THRESHOLD)(
+                                x=calorie_trend['Date'],
+                                y=calorie_trend['Rolling Avg'],
+                                mode='lines',
+                                line=dict(color=COLORS['gold'], width=3),
+                                name='7-Day Avg',
+                                hovertemplate="%{y:,.0f} kcal<extra></extra>"
+                            ))
+                        
+                        fig_calorie_trend.update_layout(
+                            title=dict(text="Calorie Burn Trend", font=dict(color='white', size=16)),
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            margin=dict(l=20, r=20, t=60, b=40),
+                            height=350,
+                            xaxis=dict(tickfont=dict(color='#A0A0B0'), gridcolor='rgba(78, 205, 196, 0.1)'),
+                            yaxis=dict(
+                                title=dict(text="Calories (kcal)", font=dict(color='#A0A0B0')),
+                                tickfont=dict(color='#A0A0B0'),
+                                gridcolor='rgba(78, 205, 196, 0.1)'
+                            ),
+                            legend=dict(
+                                orientation="h",
+                                yanchor="bottom",
+                                y=1.02,
+                                xanchor="center",
+                                x=0.5,
+                                font=dict(color='#A0A0B0')
+                            ),
+                            barmode='overlay'
+                        )
+                        figures['calorie_trend'] = fig_calorie_trend
+                    st.plotly_chart(figures['calorie_trend'], use_container_width=True)
+            else:
+                st.info("Insufficient calorie data for the selected period")
+
+detailed_breakdown()
+
 # =============================================================================
 # SECTION 3: CALENDAR HEATMAP
 # =============================================================================
 
-st.markdown("## Activity Calendar")
-
-# Create calendar heatmap data
-calendar_data = daily_agg[['Date', 'Step count', 'Total Exercise (min)', 'Calories (kcal)']].copy()
-calendar_data['Week'] = calendar_data['Date'].dt.isocalendar().week
-calendar_data['Year'] = calendar_data['Date'].dt.year
-calendar_data['Day'] = calendar_data['Date'].dt.dayofweek
-calendar_data['Month'] = calendar_data['Date'].dt.month
-
-# Select metric for heatmap
-heatmap_metric = st.selectbox(
-    "Select Metric",
-    ["Total Exercise (min)", "Step count", "Calories (kcal)"],
-    index=0,
-    label_visibility="collapsed"
-)
+@st.fragment
+def activity_calendar():
+    """Day-by-week heatmaps of the selected metric"""
+    st.markdown("## Activity Calendar")
 
-# Get unique years in selected date range
-years_in_range = sorted(calendar_data['Year'].unique(), reverse=True)
+    # Day-by-week grids of every year and metric under the activity/location
+    # selection; the date range is only a mask over them, so moving the dates
+    # or changing the metric never rebuilds them
+    calendar_grids = load_heatmap_grids(
+        data_version, tuple(selected_activities), tuple(selected_locations), daily_df
+    )
+    date_window = tuple(date_range) if len(date_range) == 2 else None
 
-# Calculate date range span
-if len(date_range) == 2:
-    date_span_days = (pd.Timestamp(date_range[1]) - pd.Timestamp(date_range[0])).days
-else:
-    date_span_days = 0
+    # Select metric for heatmap
+    heatmap_metric = st.selectbox(
+        "Select Metric",
+        HEATMAP_METRICS,
+        index=0,
+        label_visibility="collapsed"
+    )
 
-# Show multi-year view if range spans more than 365 days
-show_multi_year = date_span_days > 365 and len(years_in_range) > 1
+    # Get unique years in selected date range
+    years_in_range = sorted(map(int, daily_agg['Date'].dt.year.unique()), reverse=True)
 
-if show_multi_year:
-    st.markdown(f"<p style='color: #6B6B80; font-size: 0.8rem; margin-bottom: 1rem;'>Showing {len(years_in_range)} years of data</p>", unsafe_allow_html=True)
-    
-    # Create a heatmap for each year
-    for year in years_in_range:
-        year_data = calendar_data[calendar_data['Year'] == year].copy()
+    # Calculate date range span
+    if len(date_range) == 2:
+        date_span_days = (pd.Timestamp(date_range[1]) - pd.Timestamp(date_range[0])).days
+    else:
+        date_span_days = 0
+
+    # Show multi-year view if range spans more than 365 days
+    show_multi_year = date_span_days > 365 and len(years_in_range) > 1
+
+    if show_multi_year:
+        st.markdown(f"<p style='color: #6B6B80; font-size: 0.8rem; margin-bottom: 1rem;'>Showing {len(years_in_range)} years of data</p>", unsafe_allow_html=True)
         
-        if len(year_data) > 0:
-            # Create a complete date range for the year
+        # Create a heatmap for each year
+        for year in years_in_range:
+            # Clip to the filtered date range
             year_start = pd.Timestamp(f"{year}-01-01")
             year_end = pd.Timestamp(f"{year}-12-31")
-            
-            # Clip to the filtered date range
             if len(date_range) == 2:
                 year_start = max(year_start, pd.Timestamp(date_range[0]))
                 year_end = min(year_end, pd.Timestamp(date_range[1]))
+            heatmap_z, heatmap_weeks = heatmap_matrix(calendar_grids[year], heatmap_metric, year_start, year_end, date_window)
             
-            all_dates = pd.date_range(start=year_start, end=year_end, freq='D')
-            
-            complete_calendar = pd.DataFrame({'Date': all_dates})
-            complete_calendar['Week'] = complete_calendar['Date'].dt.isocalendar().week
-            complete_calendar['Day'] = complete_calendar['Date'].dt.dayofweek
-            complete_calendar['Month'] = complete_calendar['Date'].dt.month
-            
-            # Merge with actual data
-            year_data['Date'] = pd.to_datetime(year_data['Date'])
-            complete_calendar = complete_calendar.merge(
-                year_data[['Date', heatmap_metric]], 
-                on='Date', 
-                how='left'
-            )
-            complete_calendar[heatmap_metric] = complete_calendar[heatmap_metric].fillna(0)
-            
-            # Pivot for heatmap format
-            heatmap_pivot = complete_calendar.pivot_table(
-                index='Day', 
-                columns='Week', 
-                values=heatmap_metric, 
-                aggfunc='sum'
-            )
-            
-            # Day labels
-            day_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-            
-            fig_heatmap = go.Figure(data=go.Heatmap(
-                z=heatmap_pivot.values,
-                x=heatmap_pivot.columns,
-                y=day_labels,
-                colorscale=[
-                    [0, '#1A1A2E'],
-                    [0.25, '#2D4A4A'],
-                    [0.5, '#3D7A7A'],
-                    [0.75, '#4ECDC4'],
-                    [1, '#6FEDD6']
-                ],
-                hovertemplate="Week %{x}<br>%{y}<br>Value: %{z:,.0f}<extra></extra>",
-                showscale=True,
-                colorbar=dict(
-                    title=dict(text=heatmap_metric.split('(')[0].strip(), font=dict(color='#A0A0B0')),
-                    tickfont=dict(color='#A0A0B0'),
-                    bgcolor='rgba(0,0,0,0)'
-                )
-            ))
+            if heatmap_z.size > 0:
+                if ('heatmap', year, heatmap_metric) not in figures:
+                    # Day labels
+                    day_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+                    
+                    fig_heatmap = go.Figure(data=go.Heatmap(
+                        z=heatmap_z,
+                        x=heatmap_weeks,
+                        y=day_labels,
+                        colorscale=[
+                            [0, '#1A1A2E'],
+                            [0.25, '#2D4A4A'],
+                            [0.5, '#3D7A7A'],
+                            [0.75, '#4ECDC4'],
+                            [1, '#6FEDD6']
+                        ],
+                        hovertemplate="Week %{x}<br>%{y}<br>Value: %{z:,.0f}<extra></extra>",
+                        showscale=True,
+                        colorbar=dict(
+                            title=dict(text=heatmap_metric.split('(')[0].strip(), font=dict(color='#A0A0B0')),
+                            tickfont=dict(color='#A0A0B0'),
+                            bgcolor='rgba(0,0,0,0)'
+                        )
+                    ))
+                    
+                    fig_heatmap.update_layout(
+                        title=dict(text=str(year), font=dict(color='#FFFFFF', size=16), x=0.01),
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        margin=dict(l=50, r=20, t=40, b=20),
+                        height=200,
+                        xaxis=dict(
+                            title=dict(text="Week", font=dict(color='#A0A0B0', size=10)),
+                            tickfont=dict(color='#A0A0B0', size=10),
+                            dtick=4
+                        ),
+                        yaxis=dict(
+                            tickfont=dict(color='#A0A0B0'),
+                            autorange='reversed'
+                        )
+                    )
+                    figures[('heatmap', year, heatmap_metric)] = fig_heatmap
+                st.plotly_chart(figures[('heatmap', year, heatmap_metric)], use_container_width=True)
+
+    else:
+        # Single year view (original behavior)
+        if years_in_range:
+            latest_year = years_in_range[0]
+            year_start = pd.Timestamp(f"{latest_year}-01-01")
+            year_end = min(pd.Timestamp(f"{latest_year}-12-31"), history.max_date)
+            heatmap_z, heatmap_weeks = heatmap_matrix(calendar_grids[latest_year], heatmap_metric, year_start, year_end, date_window)
             
-            fig_heatmap.update_layout(
-                title=dict(text=str(year), font=dict(color='#FFFFFF', size=16), x=0.01),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                margin=dict(l=50, r=20, t=40, b=20),
-                height=200,
-                xaxis=dict(
-                    title=dict(text="Week", font=dict(color='#A0A0B0', size=10)),
-                    tickfont=dict(color='#A0A0B0', size=10),
-                    dtick=4
-                ),
-                yaxis=dict(
-                    tickfont=dict(color='#A0A0B0'),
-                    autorange='reversed'
+            if ('heatmap', latest_year, heatmap_metric) not in figures:
+                # Day labels
+                day_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+                
+                fig_heatmap = go.Figure(data=go.Heatmap(
+                    z=heatmap_z,
+                    x=heatmap_weeks,
+                    y=day_labels,
+                    colorscale=[
+                        [0, '#1A1A2E'],
+                        [0.25, '#2D4A4A'],
+                        [0.5, '#3D7A7A'],
+                        [0.75, '#4ECDC4'],
+                        [1, '#6FEDD6']
+                    ],
+                    hovertemplate="Week %{x}<br>%{y}<br>Value: %{z:,.0f}<extra></extra>",
+                    showscale=True,
+                    colorbar=dict(
+                        title=dict(text=heatmap_metric.split('(')[0].strip(), font=dict(color='#A0A0B0')),
+                        tickfont=dict(color='#A0A0B0'),
+                        bgcolor='rgba(0,0,0,0)'
+                    )
+                ))
+                
+                fig_heatmap.update_layout(
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    margin=dict(l=50, r=20, t=30, b=20),
+                    height=250,
+                    xaxis=dict(
+                        title=dict(text=f"Week of {latest_year}", font=dict(color='#A0A0B0')),
+                        tickfont=dict(color='#A0A0B0', size=10),
+                        dtick=4
+                    ),
+                    yaxis=dict(
+                        tickfont=dict(color='#A0A0B0'),
+                        autorange='reversed'
+                    )
                 )
-            )
-            st.plotly_chart(fig_heatmap, use_container_width=True)
-
-else:
-    # Single year view (original behavior)
-    latest_year = calendar_data['Year'].max()
-    year_data = calendar_data[calendar_data['Year'] == latest_year].copy()
-    
-    if len(year_data) > 0:
-        # Create a complete date range for the year
-        year_start = pd.Timestamp(f"{latest_year}-01-01")
-        year_end = min(pd.Timestamp(f"{latest_year}-12-31"), df['Date'].max())
-        all_dates = pd.date_range(start=year_start, end=year_end, freq='D')
-        
-        complete_calendar = pd.DataFrame({'Date': all_dates})
-        complete_calendar['Week'] = complete_calendar['Date'].dt.isocalendar().week
-        complete_calendar['Day'] = complete_calendar['Date'].dt.dayofweek
-        complete_calendar['Month'] = complete_calendar['Date'].dt.month
-        
-        # Merge with actual data
-        year_data['Date'] = pd.to_datetime(year_data['Date'])
-        complete_calendar = complete_calendar.merge(
-            year_data[['Date', heatmap_metric]], 
-            on='Date', 
-            how='left'
-        )
-        complete_calendar[heatmap_metric] = complete_calendar[heatmap_metric].fillna(0)
-        
-        # Create heatmap
-        # Pivot for heatmap format
-        heatmap_pivot = complete_calendar.pivot_table(
-            index='Day', 
-            columns='Week', 
-            values=heatmap_metric, 
-            aggfunc='sum'
-        )
-        
-        # Day labels
-        day_labels = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        
-        fig_heatmap = go.Figure(data=go.Heatmap(
-            z=heatmap_pivot.values,
-            x=heatmap_pivot.columns,
-            y=day_labels,
-            colorscale=[
-                [0, '#1A1A2E'],
-                [0.25, '#2D4A4A'],
-                [0.5, '#3D7A7A'],
-                [0.75, '#4ECDC4'],
-                [1, '#6FEDD6']
-            ],
-            hovertemplate="Week %{x}<br>%{y}<br>Value: %{z:,.0f}<extra></extra>",
-            showscale=True,
-            colorbar=dict(
-                title=dict(text=heatmap_metric.split('(')[0].strip(), font=dict(color='#A0A0B0')),
-                tickfont=dict(color='#A0A0B0'),
-                bgcolor='rgba(0,0,0,0)'
-            )
-        ))
-        
-        fig_heatmap.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=50, r=20, t=30, b=20),
-            height=250,
-            xaxis=dict(
-                title=dict(text=f"Week of {latest_year}", font=dict(color='#A0A0B0')),
-                tickfont=dict(color='#A0A0B0', size=10),
-                dtick=4
-            ),
-            yaxis=dict(
-                tickfont=dict(color='#A0A0B0'),
-                autorange='reversed'
-            )
-        )
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+                figures[('heatmap', latest_year, heatmap_metric)] = fig_heatmap
+            st.plotly_chart(figures[('heatmap', latest_year, heatmap_metric)], use_container_width=True)
+
+activity_calendar()
+
 # =============================================================================
 # SECTION 8: YEAR COMPARISON
 # =============================================================================
@@ -0,0 +1,69 @@
+"""Regenerate cities.csv, the offline geocoder's gazetteer, from GeoNames.
+
+The city and country data are GeoNames (https://www.geonames.org/),
+licensed CC BY 4.0, as packaged by the geonamescache library (the file
+in the repository was built with 3.0.2). Install it only to run this
+script; the dashboard itself doesn't need it:
+
+    pip install geonamescache==3.0.2
+    python data/build_cities.py [min_population]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocoding import EARTH_RADIUS_KM, GAZETTEER_FILE, NOMINATIM_COUNTRY_NAMES, to_unit_vectors
+
+MIN_POPULATION = 50_000
+
+# GeoNames lists city districts as cities of their own; a place this close
+# to a bigger one is taken for one of its districts, which Nominatim labels
+# with the city's name
+DISTRICT_KM = 15
+
+
+def drop_districts(cities, radius_km=DISTRICT_KM):
+    """Keep a city (largest first) only if no bigger kept city is within radius_km"""
+    points = to_unit_vectors(cities['lat'].to_numpy(), cities['lon'].to_numpy())
+    neighbours = cKDTree(points).query_ball_point(points, 2 * np.sin(radius_km / EARTH_RADIUS_KM / 2))
+    keep = np.zeros(len(cities), dtype=bool)
+    for i, near in enumerate(neighbours):
+        keep[i] = not any(keep[j] for j in near if j < i)
+    return cities[keep]
+
+
+def main():
+    from geonamescache import GeonamesCache
+
+    min_population = int(sys.argv[1]) if len(sys.argv) > 1 else MIN_POPULATION
+    geonames = GeonamesCache(min_city_population=15000)
+    countries = {
+        code: NOMINATIM_COUNTRY_NAMES.get(country['name'].strip(), country['name'].strip())
+        for code, country in geonames.get_countries().items()
+    }
+    cities = pd.DataFrame([
+        {
+            'city': city['name'],
+            'country': countries.get(city['countrycode'], ''),
+            'lat': round(city['latitude'], 4),
+            'lon': round(city['longitude'], 4),
+            'population': city['population'],
+        }
+        for city in geonames.get_cities().values()
+        if city['population'] >= min_population
+    ])
+    cities = cities[cities['country'] != '']
+    # Biggest first, so the file reads sensibly
+    cities = cities.sort_values(['population', 'city'], ascending=[False, True], kind='stable')
+    cities = drop_districts(cities.reset_index(drop=True))
+    cities[['city', 'country', 'lat', 'lon']].to_csv(GAZETTEER_FILE, index=False)
+    print(f"{len(cities):,} cities with population >= {min_population:,} -> {GAZETTEER_FILE}")
+
+
+if __name__ == '__main__':
+    main()
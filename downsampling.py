@@ -0,0 +1,62 @@
+import numpy as np
+
+# =============================================================================
+# CHART DOWNSAMPLING
+# =============================================================================
+
+# Most points a daily trace ships to the browser; shorter ranges go out as-is
+MAX_POINTS = 1000
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def lttb(x, y, n_out):
+    """Positions of the n_out points Largest-Triangle-Three-Buckets keeps
+
+    The first and last points always stay. Each bucket in between keeps the
+    point forming the largest triangle with the previously kept point and
+    the next bucket's average, which holds on to spikes and dips.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    kept = np.empty(n_out, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(frame, column, max_points=MAX_POINTS):
+    """Rows of a date-sorted daily frame thinned to at most max_points
+
+    Points are picked by LTTB on column, and the day column peaks on (the
+    personal record) is always kept. A frame that already fits comes back
+    untouched.
+    """
+    if len(frame) <= max_points:
+        return frame
+    days = frame['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    values = frame[column].to_numpy(dtype=float)
+    rows = np.union1d(lttb(days, values, max_points - 1), np.argmax(values))
+    return frame.iloc[rows]
+
+
+def bar_widths(dates):
+    """Bar widths (ms) reaching from each kept day to the next
+
+    With offset=0 the bars of a thinned trace still tile the date axis
+    instead of leaving gaps where days were dropped.
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    return (np.diff(days, append=days[-1] + 1) * DAY_MS).tolist() if len(days) else []
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import activity_bits
+
+# =============================================================================
+# SIDEBAR FILTERS
+# =============================================================================
+
+def date_slice(df, start, end, date_col='Date'):
+    """Rows with start <= Date <= end from a date-sorted frame
+
+    Two binary searches find the bounds and the result is a positional
+    slice, so no boolean mask is built and no rows are copied.
+    """
+    dates = df[date_col].to_numpy()
+    lo = dates.searchsorted(np.datetime64(start, 'ns'), side='left')
+    hi = dates.searchsorted(np.datetime64(end, 'ns'), side='right')
+    return df.iloc[lo:hi]
+
+
+def category_mask(series, selected):
+    """Boolean mask of rows whose categorical value is in selected"""
+    categories = series.cat.categories
+    # One extra slot so the -1 code of missing values maps to False
+    keep = np.zeros(len(categories) + 1, dtype=bool)
+    idx = categories.get_indexer(list(selected))
+    keep[idx[idx >= 0]] = True
+    return keep[series.cat.codes.to_numpy()]
+
+
+def apply_filters(frame, date_range, selected_activities, selected_locations):
+    """Apply the sidebar selections to the interval frame or the daily rollup
+
+    The date range is a positional slice, so it is a view of the shared
+    frame. The activity and location masks are combined and applied in one
+    row selection, which is skipped entirely when it would keep every row.
+    """
+    if len(date_range) == 2:
+        frame = date_slice(frame, pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+
+    keep = None
+    if selected_activities:
+        # Keep rows that share at least one bit with the selected activities
+        selected_bits = activity_bits(selected_activities)
+        keep = (frame['Activity Mask'].to_numpy() & selected_bits) != 0
+
+    if selected_locations:
+        in_locations = category_mask(frame['Location'], list(selected_locations) + ["Unknown"])
+        keep = in_locations if keep is None else keep & in_locations
+
+    if keep is not None and not keep.all():
+        frame = frame[keep]
+    return frame
@@ -0,0 +1,264 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from geopy.exc import (
+    ConfigurationError, GeocoderAuthenticationFailure, GeocoderInsufficientPrivileges, GeocoderParseError,
+    GeocoderQueryError, GeocoderRateLimited, GeocoderServiceError,
+)
+from scipy.spatial import cKDTree
+
+from storage import CACHE_DIR
+
+# =============================================================================
+# REVERSE GEOCODING
+# =============================================================================
+
+def fallback_label(lat, lon):
+    """Label used when a coordinate cannot be resolved to a place"""
+    return f"Loc ({lat:.2f}, {lon:.2f})"
+
+
+def place_label(city, country):
+    """The 'City, Country' label every backend gives a resolved place"""
+    return f"{(city or '').strip() or 'Unknown'}, {(country or '').strip() or 'Unknown'}"
+
+
+def nominatim_reverse(geocoder, lat, lon, timeout=3):
+    """Ask Nominatim for 'City, Country'; None when it has no address for the point"""
+    location = geocoder.reverse(f"{lat}, {lon}", language='en', timeout=timeout)
+    if location and location.raw.get('address'):
+        address = location.raw['address']
+        city = address.get('city') or address.get('town') or address.get('village') or address.get('municipality')
+        return place_label(city, address.get('country'))
+    return None
+
+
+# =============================================================================
+# CONCURRENT REMOTE LOOKUPS
+# =============================================================================
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request may be sent"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# reverse_many's result for a lookup that errored, as opposed to None for
+# "the service has no address here"
+LOOKUP_FAILED = object()
+
+# Errors that a retry won't fix
+PERMANENT_ERRORS = (
+    ConfigurationError,
+    GeocoderAuthenticationFailure,
+    GeocoderInsufficientPrivileges,
+    GeocoderParseError,
+    GeocoderQueryError,
+)
+
+
+def reverse_many(lookup, coordinates, max_workers=4, rate=1.0, retries=3, backoff=1.0, progress=None):
+    """Resolve (lat, lon) pairs with lookup(lat, lon) on a rate-limited thread pool
+
+    Timeouts and other service errors are retried with exponential backoff;
+    a pair that still fails, or hits a permanent error, maps to
+    LOOKUP_FAILED. progress(done, total) is called from the calling thread,
+    so it may safely update Streamlit elements.
+    """
+    bucket = TokenBucket(rate)
+
+    def resolve(key):
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            try:
+                return lookup(*key)
+            except GeocoderRateLimited as e:
+                delay = e.retry_after or backoff * 2 ** attempt
+            except PERMANENT_ERRORS:
+                return LOOKUP_FAILED
+            except GeocoderServiceError:
+                # Timeouts, unavailability and HTTP errors are usually transient
+                delay = backoff * 2 ** attempt
+            if attempt < retries:
+                time.sleep(delay)
+        return LOOKUP_FAILED
+
+    results = {}
+    if not coordinates:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(resolve, key): key for key in coordinates}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(futures))
+    return results
+
+
+# =============================================================================
+# OFFLINE REVERSE GEOCODING
+# =============================================================================
+
+# GeoNames cities (CC BY 4.0); regenerate with data/build_cities.py
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cities.csv')
+
+# GeoNames country names that OpenStreetMap (and so Nominatim) spells
+# differently in English; the gazetteer uses Nominatim's spelling so both
+# backends give a place the same label
+NOMINATIM_COUNTRY_NAMES = {
+    'Aland Islands': 'Åland Islands',
+    'Bahamas': 'The Bahamas',
+    'Cabo Verde': 'Cape Verde',
+    'Curacao': 'Curaçao',
+    'Gambia': 'The Gambia',
+    'Ivory Coast': "Côte d'Ivoire",
+    'Palestinian Territory': 'Palestinian Territories',
+    'Republic of the Congo': 'Congo-Brazzaville',
+    'Reunion': 'Réunion',
+    'Saint Barthelemy': 'Saint Barthélemy',
+    'The Netherlands': 'Netherlands',
+    'Timor Leste': 'Timor-Leste',
+    'Turkey': 'Türkiye',
+    'Vatican': 'Vatican City',
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+# Points further than this from every known city keep their coordinate label
+MAX_DISTANCE_KM = 75
+
+
+def to_unit_vectors(lat, lon):
+    """Project lat/lon degrees onto the unit sphere so Euclidean distance tracks great-circle distance"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.column_stack((
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat),
+    ))
+
+
+class OfflineGeocoder:
+    """Nearest-city lookup over the bundled gazetteer of city centroids"""
+
+    def __init__(self, path=GAZETTEER_FILE, max_distance_km=MAX_DISTANCE_KM):
+        cities = pd.read_csv(path, keep_default_na=False)
+        self.labels = np.array([place_label(*place) for place in zip(cities['city'], cities['country'])], dtype=object)
+        self.tree = cKDTree(to_unit_vectors(cities['lat'].to_numpy(), cities['lon'].to_numpy()))
+        # Chord length on the unit sphere matching the great-circle cutoff
+        self.max_chord = 2 * np.sin(max_distance_km / EARTH_RADIUS_KM / 2)
+
+    def reverse_many(self, coordinates):
+        """Resolve an (n, 2) array of lat/lon pairs to 'City, Country' labels in one query"""
+        coordinates = np.asarray(coordinates, dtype='float64').reshape(-1, 2)
+        if len(coordinates) == 0:
+            return np.array([], dtype=object)
+
+        _, idx = self.tree.query(
+            to_unit_vectors(coordinates[:, 0], coordinates[:, 1]),
+            distance_upper_bound=self.max_chord
+        )
+        # cKDTree reports "nothing within range" as idx == number of points
+        found = idx < len(self.labels)
+        labels = np.empty(len(coordinates), dtype=object)
+        labels[found] = self.labels[idx[found]]
+        labels[~found] = [fallback_label(lat, lon) for lat, lon in coordinates[~found]]
+        return labels
+
+
+# =============================================================================
+# PERSISTENT RESULT STORE
+# =============================================================================
+
+GEOCODE_DB = os.path.join(CACHE_DIR, 'geocode.sqlite')
+
+# Resolved places rarely change; points without an address are retried sooner
+GEOCODE_TTL_DAYS = 180
+NEGATIVE_TTL_DAYS = 7
+
+
+class GeocodeStore:
+    """SQLite cache of reverse geocoding results keyed by rounded (lat, lon)
+
+    WAL mode lets worker processes read while another writes, and each call
+    opens its own connection. Points the service has no address for are
+    stored with a NULL label so they are not retried until
+    NEGATIVE_TTL_DAYS has passed. Lookups that errored are not stored.
+    """
+
+    def __init__(self, path=GEOCODE_DB, ttl_days=GEOCODE_TTL_DAYS, negative_ttl_days=NEGATIVE_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    label TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (lat, lon)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self, now=None):
+        """All entries that are still fresh, as {(lat, lon): label or None}"""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            rows = conn.execute('SELECT lat, lon, label, fetched_at FROM geocodes').fetchall()
+        return {
+            (lat, lon): label
+            for lat, lon, label, fetched_at in rows
+            if now - fetched_at < (self.ttl if label is not None else self.negative_ttl)
+        }
+
+    def save(self, results, now=None):
+        """Upsert {(lat, lon): label or None}; None records a point with no address
+
+        LOOKUP_FAILED entries are skipped, so they are retried next time.
+        """
+        rows = [(lat, lon, label) for (lat, lon), label in results.items() if label is not LOOKUP_FAILED]
+        if not rows:
+            return
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO geocodes (lat, lon, label, fetched_at) VALUES (?, ?, ?, ?)',
+                [(lat, lon, label, now) for lat, lon, label in rows]
+            )
@@ -0,0 +1,131 @@
+import calendar
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# DATE & TIME PARSING
+# =============================================================================
+
+def raw_interval_starts(raw):
+    """Start timestamp of each interval from the raw 'Date' and 'Start time' seconds"""
+    # Rows without a start time count as the start of their day
+    return raw['Date'] + pd.to_timedelta(raw['Start time'].fillna(0).astype('int64'), unit='s')
+
+
+# =============================================================================
+# CALENDAR FIELDS
+# =============================================================================
+
+MONTH_NAMES = list(calendar.month_name[1:])
+DAY_NAMES = list(calendar.day_name)
+
+
+def add_calendar_columns(df):
+    """Add narrow Year/Month/Week/Day of Week/Is Weekend columns from 'Date' in place"""
+    dates = df['Date'].dt
+    df['Year'] = dates.year.astype('int16')
+    df['Month'] = dates.month.astype('int8')
+    df['Day of Week'] = dates.dayofweek.astype('int8')
+    df['Week'] = dates.isocalendar().week.astype('int8')
+    df['Is Weekend'] = df['Day of Week'] >= 5  # Saturday=5, Sunday=6
+    return df
+
+
+def day_name(days):
+    """Day names (ordered categorical) for 0-6 day-of-week numbers, Monday first"""
+    return pd.Categorical.from_codes(np.asarray(days), categories=DAY_NAMES, ordered=True)
+
+
+# =============================================================================
+# ACTIVITY DERIVATION
+# =============================================================================
+
+# Order matters: it is the order labels are joined in 'Activity Type' and the
+# tie-break order for 'Primary Activity'.
+ACTIVITY_COLUMNS = [
+    ('Walking', 'Walking duration (ms)'),
+    ('Cycling', 'Cycling duration (ms)'),
+    ('Paced Walking', 'Paced walking duration (ms)'),
+    ('Running', 'Running duration (ms)'),
+]
+
+ACTIVITY_NAMES = [name for name, _ in ACTIVITY_COLUMNS]
+ACTIVITY_BITS = {name: np.uint8(1 << i) for i, name in enumerate(ACTIVITY_NAMES)}
+
+# Every possible bitmask value mapped to its comma-joined label
+ACTIVITY_LABELS = np.array([
+    ', '.join(name for i, name in enumerate(ACTIVITY_NAMES) if mask & (1 << i)) or 'Inactive'
+    for mask in range(1 << len(ACTIVITY_NAMES))
+], dtype=object)
+
+
+def duration_matrix(df):
+    """Return the activity durations as an (n_rows, n_activities) float array"""
+    return np.column_stack([
+        df[col].to_numpy(dtype='float64', na_value=np.nan) if col in df.columns
+        else np.zeros(len(df))
+        for _, col in ACTIVITY_COLUMNS
+    ])
+
+
+def activity_bitmask(durations):
+    """Pack the activities with a positive duration into a uint8 bitmask"""
+    bits = np.array([ACTIVITY_BITS[name] for name in ACTIVITY_NAMES], dtype=np.uint8)
+    # NaN > 0 is False, matching the pd.notna() check of the row-wise version
+    return ((durations > 0) * bits).sum(axis=1).astype(np.uint8)
+
+
+def activity_type(mask):
+    """Turn activity bitmasks into 'Walking, Running' style labels"""
+    return ACTIVITY_LABELS[mask]
+
+
+def activity_bits(names):
+    """OR together the bits of the given activity names"""
+    bits = np.uint8(0)
+    for name in names:
+        bits |= ACTIVITY_BITS[name]
+    return bits
+
+
+def primary_activity(durations):
+    """Name of the activity with the longest duration, or 'Inactive'"""
+    filled = np.where(np.isnan(durations), -np.inf, durations)
+    idx = filled.argmax(axis=1)
+    best = filled[np.arange(len(filled)), idx]
+    # The old max(dict, key=...) never moved past a leading NaN, so rows
+    # without a walking duration always came out as Inactive. Kept for parity.
+    active = (best > 0) & ~np.isnan(durations[:, 0])
+    codes = np.where(active, idx, len(ACTIVITY_NAMES))
+    return pd.Categorical.from_codes(codes, categories=ACTIVITY_NAMES + ['Inactive'])
+
+
+def add_activity_columns(df):
+    """Add 'Activity Mask' and 'Primary Activity' to the frame in place"""
+    durations = duration_matrix(df)
+    # Labels are rebuilt from the mask with activity_type() only when displayed
+    df['Activity Mask'] = activity_bitmask(durations)
+    df['Primary Activity'] = primary_activity(durations)
+    return df
+
+
+# =============================================================================
+# LOCATION LOOKUP
+# =============================================================================
+
+def assign_locations(df, location_map, lat_col='Low latitude (deg)', lon_col='Low longitude (deg)'):
+    """Map each row's rounded coordinates to a location name"""
+    coords = df[[lat_col, lon_col]]
+    valid = coords.notna().all(axis=1).to_numpy()
+    locations = np.full(len(df), 'Unknown', dtype=object)
+    if not valid.any() or not location_map:
+        return locations
+
+    # Index lookup of the rounded coordinates against the geocoded keys
+    keys = pd.MultiIndex.from_tuples(list(location_map.keys()))
+    names = np.append(np.array(list(location_map.values()), dtype=object), 'Unknown')
+    rounded = coords[valid].round(2)
+    codes = keys.get_indexer(pd.MultiIndex.from_frame(rounded))
+    locations[valid] = names[codes]
+    return locations
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+
+from preprocessing import ACTIVITY_COLUMNS, activity_bits
+
+# =============================================================================
+# DAILY ROLLUP
+# =============================================================================
+
+DAILY_METRICS = [
+    'Step count',
+    'Calories (kcal)',
+    'Distance (m)',
+    'Heart Points',
+    'Total Exercise (min)',
+]
+
+ACTIVITY_MINUTES = [f"{name} (min)" for name, _ in ACTIVITY_COLUMNS]
+
+# Per-day sums keep the sidebar's filter keys so the same filters still apply
+ROLLUP_KEYS = ['Date', 'Activity Mask', 'Location']
+
+
+def build_daily_rollup(df):
+    """Per-day metric and activity-minute sums, split by activity mask and location
+
+    A day's filtered total is the sum of its rollup rows that pass the
+    sidebar filters, which touches a handful of rows per day instead of 96.
+    """
+    minutes = {
+        label: df[col].fillna(0) / 60000
+        for label, (_, col) in zip(ACTIVITY_MINUTES, ACTIVITY_COLUMNS)
+    }
+    frame = df[ROLLUP_KEYS + DAILY_METRICS].assign(**minutes)
+    return frame.groupby(ROLLUP_KEYS, observed=True, sort=True).sum().reset_index()
+
+
+def daily_totals(rollup):
+    """Collapse (already filtered) rollup rows to one row per date"""
+    return rollup.groupby('Date')[DAILY_METRICS + ACTIVITY_MINUTES].sum().reset_index()
+
+
+
+# =============================================================================
+# RANGE TOTALS
+# =============================================================================
+
+class DailyPrefix:
+    """Running totals of per-day rows over a dense calendar, for any date range
+
+    Slot i of each running array holds the sum of every day before
+    first_day + i, with days missing from the frame counted as zero. The
+    totals of a date range are the difference of two slots, so they cost
+    the same for a week as for a decade. Integer metrics keep an integer
+    running sum, so their totals stay exact.
+    """
+
+    def __init__(self, daily, metrics=DAILY_METRICS):
+        days = daily['Date'].to_numpy(dtype='datetime64[D]')
+        self.first_day = days.min() if len(days) else np.datetime64(0, 'D')
+        offsets = (days - self.first_day).astype(np.int64)
+        n_slots = (offsets.max() + 1) if len(days) else 0
+
+        def running(values, dtype):
+            dense = np.zeros(n_slots, dtype=dtype)
+            np.add.at(dense, offsets, values)
+            return np.r_[np.zeros(1, dtype=dtype), np.cumsum(dense)]
+
+        self.running = {
+            metric: running(daily[metric].to_numpy(), np.int64 if daily[metric].dtype.kind in 'iu' else np.float64)
+            for metric in metrics
+        }
+        self.running['days'] = running(1, np.int64)
+        self.running['active_days'] = running((daily['Total Exercise (min)'] > 0).to_numpy(), np.int64)
+
+    def _slot(self, day, side):
+        """Running-array slot just before (side='left') or after (side='right') a day"""
+        offset = (np.datetime64(pd.Timestamp(day), 'D') - self.first_day).astype(np.int64)
+        n_slots = len(self.running['days'])
+        return int(np.clip(offset + (side == 'right'), 0, n_slots - 1))
+
+    def totals(self, date_range):
+        """Metric totals, day count and active-day count of the days in date_range
+
+        As with apply_filters, a date range other than a (start, end) pair
+        means every day.
+        """
+        lo, hi = 0, len(self.running['days']) - 1
+        if len(date_range) == 2:
+            lo = self._slot(date_range[0], 'left')
+            hi = max(lo, self._slot(date_range[1], 'right'))
+        return {name: running[hi] - running[lo] for name, running in self.running.items()}
+
+
+# =============================================================================
+# LOCATION INDEX
+# =============================================================================
+
+LOCATION_STATS = ['Total Exercise (min)', 'Step count', 'Calories (kcal)']
+
+
+class LocationIndex:
+    """Running per-location totals of the daily rollup, for any date range
+
+    Rollup rows are ordered by (Location, Activity Mask, Date) with running
+    sums of LOCATION_STATS, so a date range costs two binary searches and
+    a subtraction per (Location, Activity Mask) group, however many days
+    or interval rows it covers.
+    """
+
+    def __init__(self, rollup):
+        self.locations = rollup['Location'].cat.categories
+        loc = rollup['Location'].cat.codes.to_numpy().astype(np.int64)
+        mask = rollup['Activity Mask'].to_numpy().astype(np.int64)
+        days = rollup['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        order = np.lexsort((days, mask, loc))
+        group = (loc * 256 + mask)[order]
+
+        groups, starts = np.unique(group, return_index=True)
+        self.group_loc = groups // 256
+        self.group_mask = (groups % 256).astype(np.uint8)
+        self.group_starts = starts
+        self.group_ends = np.r_[starts[1:], len(group)]
+
+        # One sorted key: the group's rank, then the day; zero means "before all days"
+        self.first_day = days.min() if len(days) else 0
+        self.span = (days.max() - self.first_day + 2) if len(days) else 2
+        rank = np.repeat(np.arange(len(groups)), np.diff(np.r_[starts, len(group)]))
+        self.keys = rank * self.span + (days[order] - self.first_day + 1)
+
+        values = rollup[LOCATION_STATS].to_numpy(dtype=np.float64)[order]
+        self.running = np.vstack([np.zeros(len(LOCATION_STATS)), np.cumsum(values, axis=0)])
+
+    def _day_offset(self, day):
+        day = np.datetime64(pd.Timestamp(day), 'D').astype(np.int64)
+        return int(np.clip(day - self.first_day + 1, 0, self.span - 1))
+
+    def totals(self, date_range, selected_activities, selected_locations):
+        """LOCATION_STATS summed per location under the sidebar filters, as apply_filters applies them
+
+        Returns the location codes with rows in range and their totals.
+        """
+        lo, hi = self.group_starts, self.group_ends
+        if len(date_range) == 2:
+            base = np.arange(len(self.group_loc)) * self.span
+            lo = np.searchsorted(self.keys, base + self._day_offset(date_range[0]), side='left')
+            hi = np.searchsorted(self.keys, base + self._day_offset(date_range[1]), side='right')
+
+        keep = hi > lo
+        if selected_activities:
+            keep &= (self.group_mask & activity_bits(selected_activities)) != 0
+        if selected_locations:
+            idx = self.locations.get_indexer(list(selected_locations) + ["Unknown"])
+            keep &= np.isin(self.group_loc, idx[idx >= 0])
+
+        n_locations = len(self.locations)
+        loc = self.group_loc[keep]
+        sums = self.running[hi[keep]] - self.running[lo[keep]]
+        present = np.bincount(loc, minlength=n_locations) > 0
+        totals = np.column_stack([
+            np.bincount(loc, weights=sums[:, i], minlength=n_locations)
+            for i in range(len(LOCATION_STATS))
+        ])
+        codes = np.flatnonzero(present)
+        return codes, totals[codes]
+
+    def top(self, date_range, selected_activities, selected_locations, k=5, exclude=("Unknown",)):
+        """The k locations with the most exercise under the sidebar filters"""
+        codes, totals = self.totals(date_range, selected_activities, selected_locations)
+        keep = ~np.isin(codes, self.locations.get_indexer(list(exclude)))
+        codes, totals = codes[keep], totals[keep]
+        exercise = totals[:, 0]
+        if len(codes) > k:
+            best = np.argpartition(-exercise, k - 1)[:k]
+        else:
+            best = np.arange(len(codes))
+        best = best[np.argsort(-exercise[best], kind='stable')]
+        stats = pd.DataFrame(totals[best], columns=LOCATION_STATS)
+        stats.insert(0, 'Location', self.locations[codes[best]])
+        return stats
+
+
+# =============================================================================
+# CALENDAR HEATMAP
+# =============================================================================
+
+HEATMAP_METRICS = ['Total Exercise (min)', 'Step count', 'Calories (kcal)']
+
+# Layer 1 holds the days that fall in the neighbouring year's ISO week 1 or
+# 52/53, which share a cell with a day at the other end of the year
+GRID_SHAPE = (2, 7, 53)
+
+
+def heatmap_grids(daily, metrics=HEATMAP_METRICS):
+    """Day-of-week by ISO-week grids of each metric for every year in daily
+
+    Returns {year: {'days': dates, metric: values, ...}} with arrays of
+    GRID_SHAPE: a day sits in row weekday, column ISO week - 1. Days with
+    no row in daily are 0 and cells no day maps to have a NaT date.
+    """
+    by_date = daily.set_index('Date')[metrics]
+    grids = {}
+    for year in daily['Date'].dt.year.unique():
+        dates = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq='D')
+        iso = dates.isocalendar()
+        cell = (
+            (iso['year'].to_numpy() != year).astype(np.intp),
+            dates.dayofweek.to_numpy(),
+            iso['week'].to_numpy(np.intp) - 1,
+        )
+        grid = {'days': np.full(GRID_SHAPE, np.datetime64('NaT'), dtype='datetime64[D]')}
+        grid['days'][cell] = dates.to_numpy(dtype='datetime64[D]')
+        values = by_date.reindex(dates, fill_value=0)
+        for metric in metrics:
+            # float32 metrics stay float32; integer counts widen to float for NaN
+            grid[metric] = np.zeros(GRID_SHAPE, dtype=np.result_type(values[metric].dtype, np.float32))
+            grid[metric][cell] = values[metric].to_numpy()
+        grids[int(year)] = grid
+    return grids
+
+
+def heatmap_matrix(grid, metric, start, end, window=None):
+    """7-row matrix of metric over the weeks with a day from start to end
+
+    Cells with no day in range are NaN; returns the matrix and its ISO weeks.
+    Days outside the (first, last) date window, e.g. the selected date
+    range, count as 0, so one grid serves every window.
+    """
+    days = grid['days']
+    in_range = (days >= np.datetime64(start, 'D')) & (days <= np.datetime64(end, 'D'))
+    shown = in_range
+    if window is not None:
+        shown = in_range & (days >= np.datetime64(window[0], 'D')) & (days <= np.datetime64(window[1], 'D'))
+    matrix = np.where(shown, grid[metric], 0).sum(axis=0)
+    matrix[~in_range.any(axis=0)] = np.nan
+    weeks = np.flatnonzero(in_range.any(axis=(0, 1)))
+    return matrix[:, weeks], weeks + 1
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# GOOGLE FIT EXPORT SCHEMA
+# =============================================================================
+
+# Every column of the daily-summary CSV export and the dtype it is read as.
+# Dates and times repeat on every day/interval, so they are read as
+# categoricals and each distinct string is parsed once. Metrics and
+# durations fit float32 (durations are whole milliseconds well under 2**24);
+# coordinates stay float64 because they key the location lookup at 0.01
+# degree resolution.
+EXPORT_DTYPES = {
+    'Date': 'category',
+    'Start time': 'category',
+    'End time': 'category',
+    'Move Minutes count': 'float32',
+    'Calories (kcal)': 'float32',
+    'Distance (m)': 'float32',
+    'Heart Points': 'float32',
+    'Heart Minutes': 'float32',
+    'Average speed (m/s)': 'float32',
+    'Max speed (m/s)': 'float32',
+    'Min speed (m/s)': 'float32',
+    'Step count': 'float32',
+    'Low latitude (deg)': 'float64',
+    'Low longitude (deg)': 'float64',
+    'High latitude (deg)': 'float64',
+    'High longitude (deg)': 'float64',
+    'Walking duration (ms)': 'float32',
+    'Cycling duration (ms)': 'float32',
+    'Paced walking duration (ms)': 'float32',
+    'Running duration (ms)': 'float32',
+}
+
+TIME_COLUMNS = ['Start time', 'End time']
+
+# pandas' CSV parser for whole-file reads: 'pyarrow' (multithreaded) or 'c'
+CSV_ENGINE = 'pyarrow'
+
+
+class SchemaDriftError(ValueError):
+    """The export's columns no longer match EXPORT_DTYPES"""
+
+
+def check_columns(columns):
+    """Raise SchemaDriftError unless columns are exactly the declared export columns"""
+    missing = [col for col in EXPORT_DTYPES if col not in columns]
+    unexpected = [col for col in columns if col not in EXPORT_DTYPES]
+    if missing or unexpected:
+        raise SchemaDriftError(
+            f"Google Fit export columns have changed (missing: {missing or 'none'}, "
+            f"unexpected: {unexpected or 'none'}); update EXPORT_DTYPES in schema.py"
+        )
+
+
+def seconds_since_midnight(times):
+    """'HH:MM:SS.fff' strings as whole seconds since midnight (nullable Int32)
+
+    Reads the digits straight out of a fixed-width byte array instead of
+    going through datetime parsing. Anything that isn't a valid clock time
+    becomes <NA>, like to_datetime(errors='coerce') did.
+    """
+    text = times.fillna('').to_numpy(dtype='S8')
+    digits = text.view(np.uint8).reshape(len(text), 8).astype(np.int32) - ord('0')
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    seconds = digits[:, 6] * 10 + digits[:, 7]
+    valid = (
+        ((digits[:, [0, 1, 3, 4, 6, 7]] >= 0) & (digits[:, [0, 1, 3, 4, 6, 7]] <= 9)).all(axis=1)
+        & (digits[:, 2] == ord(':') - ord('0'))
+        & (digits[:, 5] == ord(':') - ord('0'))
+        & (hours < 24) & (minutes < 60) & (seconds < 60)
+    )
+    total = hours * 3600 + minutes * 60 + seconds
+    return pd.Series(pd.arrays.IntegerArray(total, ~valid), index=times.index, name=times.name)
+
+
+def decode_categories(column, parse):
+    """Parse each distinct value of a categorical column once and expand by code"""
+    values = parse(pd.Series(column.cat.categories))
+    # One extra missing slot so the -1 code of missing values maps to NaT/<NA>
+    values = pd.concat([values, pd.Series([None], dtype=values.dtype)], ignore_index=True)
+    decoded = values.take(column.cat.codes.to_numpy())
+    decoded.index = column.index
+    return decoded.rename(column.name)
+
+
+def _apply_schema(raw):
+    check_columns(list(raw.columns))
+    raw['Date'] = decode_categories(raw['Date'], lambda dates: pd.to_datetime(dates, format='%d/%m/%y'))
+    # Missing step counts mean no steps were recorded in the interval
+    raw['Step count'] = raw['Step count'].fillna(0).astype('int32')
+    for col in TIME_COLUMNS:
+        raw[col] = decode_categories(raw[col], seconds_since_midnight)
+    return raw
+
+
+def read_export(source, chunksize=None, engine=None):
+    """Read a Google Fit CSV export with the declared schema
+
+    Dates come back as datetime64, step counts as int32 and the time
+    columns as seconds since midnight. With chunksize, yields frames of that
+    many rows; the pyarrow engine can't stream, so chunked reads always use
+    the C parser.
+    """
+    engine = engine or CSV_ENGINE
+    if chunksize is not None:
+        return (_apply_schema(chunk) for chunk in pd.read_csv(
+            source, sep=',', dtype=EXPORT_DTYPES, chunksize=chunksize, engine='c'
+        ))
+    return _apply_schema(pd.read_csv(source, sep=',', dtype=EXPORT_DTYPES, engine=engine))
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from rollups import ROLLUP_KEYS
+
+# =============================================================================
+# MAP CELL ROLLUP
+# =============================================================================
+
+# Most markers the hotspot map ships to the browser
+MAX_MAP_CELLS = 2000
+
+# Grid cells are 2**-level degrees on a side: level 12 is ~25 m, 0 is ~111 km
+# and -4 is ~1800 km. The map rollup stores these levels; any coarser level is
+# a bit shift of a stored one away
+MAP_LEVELS = [-4, 0, 4, 8, 12]
+FINEST_LEVEL = MAP_LEVELS[-1]
+COARSEST_LEVEL = MAP_LEVELS[0]
+
+# A level-(zoom - 4) cell is about 16 px wide on a map at that zoom, so the
+# map slider's zoom 1-16 covers the levels above
+ZOOM_LEVEL_OFFSET = -4
+
+MAP_COORDS = ['Low latitude (deg)', 'Low longitude (deg)']
+MAP_SUMS = ['Total Exercise (min)', 'Calories (kcal)', 'Step count']
+
+# Grid level, row and column of a cell, plus what cell centroids are built from
+CELL_KEYS = ['Level', 'Row', 'Col']
+CENTROID_SUMS = ['Latitude sum', 'Longitude sum', 'Fixes']
+
+
+def cell_index(lat, lon, level):
+    """Grid row and column of the cell each coordinate falls in at a level"""
+    scale = 2.0 ** level
+    row = np.floor((np.asarray(lat) + 90) * scale).astype(np.int32)
+    col = np.floor((np.asarray(lon) + 180) * scale).astype(np.int32)
+    return row, col
+
+
+def build_map_rollup(df):
+    """Per-day sums of rows with coordinates in each grid cell of every MAP_LEVELS level
+
+    Keeps the daily rollup's filter keys, so the sidebar filters apply to
+    it as they are, and like the daily rollup it only ever covers whole
+    days, so the store can re-roll just the days an append touches.
+    """
+    points = df[df[MAP_COORDS[0]].notna() & df[MAP_COORDS[1]].notna()]
+    values = points[ROLLUP_KEYS + MAP_SUMS].assign(**{
+        'Latitude sum': points[MAP_COORDS[0]],
+        'Longitude sum': points[MAP_COORDS[1]],
+        'Fixes': np.int64(1),
+    })
+    levels = []
+    for level in MAP_LEVELS:
+        row, col = cell_index(points[MAP_COORDS[0]], points[MAP_COORDS[1]], level)
+        levels.append(values.assign(Level=np.int8(level), Row=row, Col=col))
+    frame = pd.concat(levels, ignore_index=True)
+    return frame.groupby(ROLLUP_KEYS + CELL_KEYS, observed=True, sort=True).sum().reset_index()
+
+
+def split_levels(rollup):
+    """{level: map rollup rows of that level} for every MAP_LEVELS level, in date order"""
+    levels = rollup['Level'].to_numpy()
+    return {level: rollup[levels == level].reset_index(drop=True) for level in MAP_LEVELS}
+
+
+def zoom_level(zoom):
+    """Grid level whose cells are about marker-sized on a map at zoom"""
+    return int(np.clip(round(zoom) + ZOOM_LEVEL_OFFSET, COARSEST_LEVEL, FINEST_LEVEL))
+
+
+def stored_level(zoom):
+    """The coarsest stored level that is at least as fine as zoom_level(zoom)"""
+    return next(level for level in MAP_LEVELS if level >= zoom_level(zoom))
+
+
+def map_cells(rollup, zoom, max_cells=MAX_MAP_CELLS):
+    """One marker per occupied grid cell of (filtered) map rollup rows, for a map zoom
+
+    rollup holds the rows of stored_level(zoom). Cells are at
+    zoom_level(zoom), or coarser when that would be more than max_cells
+    markers. A cell sits at the mean of its fixes, sums their metrics and
+    takes the location with the most exercise in it.
+    """
+    row = rollup['Row'].to_numpy(np.int64)
+    col = rollup['Col'].to_numpy(np.int64)
+    stored = stored_level(zoom)
+    for level in range(zoom_level(zoom), COARSEST_LEVEL - 1, -1):
+        shift = stored - level
+        # Columns at FINEST_LEVEL stay below 2**25
+        cells, cell = np.unique(((row >> shift) << 25) | (col >> shift), return_inverse=True)
+        if len(cells) <= max_cells:
+            break
+
+    rows = rollup[['Location'] + MAP_SUMS + CENTROID_SUMS].assign(cell=cell)
+    sums = rows.groupby('cell', sort=True)[MAP_SUMS + CENTROID_SUMS].sum()
+    by_location = rows.groupby(['cell', 'Location'], observed=True)['Total Exercise (min)'].sum().reset_index()
+    busiest = by_location.sort_values(['cell', 'Total Exercise (min)'], ascending=[True, False], kind='stable')
+    busiest = busiest.drop_duplicates('cell').set_index('cell')['Location']
+
+    return pd.DataFrame({
+        MAP_COORDS[0]: sums['Latitude sum'] / sums['Fixes'],
+        MAP_COORDS[1]: sums['Longitude sum'] / sums['Fixes'],
+        'Location': busiest.reindex(sums.index),
+        **{col: sums[col] for col in MAP_SUMS},
+    }).reset_index(drop=True)
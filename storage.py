@@ -0,0 +1,487 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+from pyarrow import feather
+
+from preprocessing import raw_interval_starts
+from schema import read_export
+
+# =============================================================================
+# PERSISTENT ENRICHED STORE
+# =============================================================================
+
+CACHE_DIR = '.verve_cache'
+
+# Bump when the enrichment in load_data() changes shape so old caches are ignored
+CACHE_VERSION = 9
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Size, mtime and BLAKE2 content hash of a file"""
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': prefix_hash(path, None, chunk_size),
+    }
+
+
+def prefix_hash(path, n_bytes=None, chunk_size=1 << 20):
+    """BLAKE2 hash of the first n_bytes of a file (all of it when None)"""
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = n_bytes
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def store_root(source_path, cache_dir=CACHE_DIR):
+    """Directory holding the enriched store for a source CSV"""
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(source_path))[0])
+
+
+def load_enriched(source_path, build, rollups, variant='', incremental=True, cache_dir=CACHE_DIR):
+    """Return (YearPartitions of enriched rows, {name: rollup}) for a Google Fit CSV
+
+    build(raw) enriches raw CSV rows and rollups maps names (e.g. 'daily')
+    to functions that aggregate enriched rows by day; each rollup is kept
+    as <name>.parquet. While the CSV is unchanged the store is opened as
+    is. When rows were only appended to it and incremental is on, just
+    those rows are built and written as new parts, and only their days are
+    re-rolled. Any other change (edits, truncation, a fresh export)
+    rebuilds everything.
+    """
+    root = store_root(source_path, cache_dir)
+    fingerprint = file_fingerprint(source_path)
+    manifest = _read_manifest(os.path.join(root, 'manifest.json'))
+    compatible = (
+        manifest is not None
+        and manifest.get('version') == CACHE_VERSION
+        and manifest.get('variant') == variant
+        and manifest.get('rollups') == list(rollups)
+    )
+
+    if compatible and manifest['fingerprint'] == fingerprint:
+        return open_store(root, manifest)
+
+    if compatible and incremental and manifest['watermark']:
+        watermark = pd.Timestamp(manifest['watermark'])
+        raw = _read_appended_rows(source_path, manifest['fingerprint'])
+        starts = None if raw is None else raw_interval_starts(raw)
+        # Appended rows that reach back to ingested intervals are a rewrite, not new data
+        if raw is not None and not (starts <= watermark).any():
+            history, frames = open_store(root, manifest)
+            if len(raw) > 0:
+                _append(root, manifest, history, frames, build(raw), rollups)
+                watermark = starts.max()
+            manifest.update(fingerprint=fingerprint, watermark=watermark.isoformat())
+            _write_manifest(root, manifest)
+            return open_store(root, manifest)
+
+    raw = read_export(source_path)
+    watermark = raw_interval_starts(raw).max()
+    df = build(raw)
+    manifest = {
+        'version': CACHE_VERSION,
+        'variant': variant,
+        'rollups': list(rollups),
+        'fingerprint': fingerprint,
+        'watermark': watermark.isoformat() if pd.notna(watermark) else None,
+    }
+    frames = {name: rollup(df) for name, rollup in rollups.items()}
+    try:
+        return _build_store(root, df, frames, manifest)
+    except OSError:
+        # A read-only checkout still works, it just rebuilds every time
+        return _build_store(os.path.join(tempfile.mkdtemp(prefix='verve-'), 'store'), df, frames, manifest)
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_appended_rows(source_path, previous):
+    """Raw rows appended since the file described by the previous fingerprint
+
+    Returns None unless the previous file is an exact prefix of the current
+    one (same bytes, ending on a line break), i.e. the CSV was edited,
+    truncated or replaced rather than appended to.
+    """
+    old_size = previous['size']
+    with open(source_path, 'rb') as f:
+        header = f.readline()
+        if os.path.getsize(source_path) >= old_size > len(header):
+            f.seek(old_size - 1)
+            ends_line = f.read(1) == b'\n'
+            if ends_line and prefix_hash(source_path, old_size) == previous['hash']:
+                return read_export(io.BytesIO(header + f.read()))
+    return None
+
+
+def _append(root, manifest, history, frames, new_rows, rollups):
+    """Write enriched rows as new parts and re-roll only the days they touch
+
+    New rows all start after the watermark, so the existing parts are left
+    alone and stay in date order ahead of the new ones.
+    """
+    first_day = new_rows['Date'].min()
+    touched = _concat([history.read_range(first_day), new_rows])
+    manifest['parts'] += write_parts(root, new_rows, f"part-{manifest['next_part']:05d}")
+    manifest['next_part'] += 1
+    manifest['locations'] = sorted(set(manifest['locations']) | set(new_rows['Location'].unique()))
+    for name, rollup in rollups.items():
+        frame = frames[name]
+        _write_frame(_concat([frame[frame['Date'] < first_day], rollup(touched)]), _rollup_path(root, name))
+
+
+def _rollup_path(root, name):
+    return os.path.join(root, f"{name}.parquet")
+
+
+def _build_store(root, df, frames, manifest):
+    """Write a complete store into a fresh directory and swap it in for root"""
+    tmp_dir = f"{root}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    manifest = dict(
+        manifest,
+        parts=write_parts(tmp_dir, df, 'part-00000'),
+        next_part=1,
+        locations=sorted(df['Location'].unique()),
+    )
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, frame in frames.items():
+        _write_frame(frame, _rollup_path(tmp_dir, name))
+    _write_manifest(tmp_dir, manifest)
+    _swap_dir(tmp_dir, root)
+    return open_store(root, manifest)
+
+
+def _concat(frames):
+    """pd.concat that keeps categorical columns categorical when categories differ"""
+    combined = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        dtype = frames[0][col].dtype
+        # Same categories concatenate as categorical already, order intact
+        if isinstance(dtype, pd.CategoricalDtype) and any(frame[col].dtype != dtype for frame in frames):
+            combined[col] = union_categoricals([frame[col] for frame in frames], sort_categories=True)
+    return combined
+
+
+def _write_frame(frame, path):
+    # Via a temp file so readers never see half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(root, manifest):
+    # Written last, so it never points at data that isn't there yet
+    path = os.path.join(root, 'manifest.json')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def _swap_dir(new_dir, final_dir):
+    """Replace final_dir with new_dir, deleting the old contents afterwards"""
+    old_dir = f"{final_dir}.{os.getpid()}.old"
+    if os.path.exists(final_dir):
+        os.replace(final_dir, old_dir)
+    os.replace(new_dir, final_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    _remove_legacy(final_dir)
+
+
+def _remove_legacy(final_dir):
+    """Delete the single-file caches earlier layouts kept next to a store directory
+
+    Parquet caches keyed by fingerprint (<stem>-<key>.parquet) and the
+    <stem>.parquet / .daily.parquet / .json stores that came after them are
+    never read by the partitioned layout, so they go once it is written.
+    """
+    parent, stem = os.path.split(final_dir)
+    legacy = {f"{stem}.parquet", f"{stem}.daily.parquet", f"{stem}.json"}
+    for name in os.listdir(parent or '.'):
+        if name in legacy or (name.startswith(f"{stem}-") and name.endswith('.parquet')):
+            try:
+                os.remove(os.path.join(parent, name))
+            except OSError:
+                pass
+
+
+# =============================================================================
+# MEMORY-MAPPED YEAR PARTITIONS
+# =============================================================================
+
+def write_parts(root, df, name):
+    """Write date-sorted enriched rows as one Arrow IPC file per year
+
+    Returns the manifest entries of the written files: their path under
+    root, row count and date bounds.
+    """
+    entries = []
+    for year, part in df.groupby(df['Date'].dt.year, sort=True):
+        rel_path = os.path.join(str(year), f"{name}.arrow")
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Uncompressed, so the file can be memory-mapped without decoding
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        feather.write_feather(table, f"{path}.tmp", compression='uncompressed')
+        os.replace(f"{path}.tmp", path)
+        entries.append({
+            'path': rel_path,
+            'rows': len(part),
+            'min_date': part['Date'].min().isoformat(),
+            'max_date': part['Date'].max().isoformat(),
+        })
+    return entries
+
+
+def open_store(root, manifest):
+    """(YearPartitions, {name: rollup}) of a store written with write_parts()"""
+    history = YearPartitions(root, manifest['parts'], manifest['locations'])
+    return history, {name: pd.read_parquet(_rollup_path(root, name)) for name in manifest['rollups']}
+
+
+class YearPartitions:
+    """Enriched rows kept on disk as memory-mapped Arrow IPC files, one directory per year
+
+    Date bounds, row counts and location names come from the manifest, so
+    the sidebar can be built without opening a single file. read_range()
+    maps only the files whose dates overlap the range and converts only the
+    rows inside it, so the default 30-day view pages in one or two years of
+    a decade-long history.
+    """
+
+    def __init__(self, root, parts, locations):
+        self.root = root
+        self.parts = parts
+        self.locations = locations
+        self._tables = {}
+
+    def __len__(self):
+        return sum(part['rows'] for part in self.parts)
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(min(part['min_date'] for part in self.parts))
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(max(part['max_date'] for part in self.parts))
+
+    def _table(self, rel_path):
+        table = self._tables.get(rel_path)
+        if table is None:
+            table = feather.read_table(os.path.join(self.root, rel_path), memory_map=True)
+            self._tables[rel_path] = table
+        return table
+
+    def read_range(self, start=None, end=None):
+        """Rows with start <= Date <= end as a DataFrame (None leaves that side open)"""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        frames = []
+        for part in self.parts:
+            if start is not None and pd.Timestamp(part['max_date']) < start:
+                continue
+            if end is not None and pd.Timestamp(part['min_date']) > end:
+                continue
+            table = self._table(part['path'])
+            # Each file is date-sorted, so the range is two binary searches
+            dates = table.column('Date').to_numpy()
+            lo = 0 if start is None else dates.searchsorted(start.to_datetime64(), side='left')
+            hi = len(dates) if end is None else dates.searchsorted(end.to_datetime64(), side='right')
+            frames.append(table.slice(lo, hi - lo).to_pandas())
+
+        if not frames:
+            return self._table(self.parts[0]['path']).slice(0, 0).to_pandas()
+        df = _concat(frames)
+        # Parts of several overlapping exports can interleave in time
+        if not df['Date'].is_monotonic_increasing:
+            df = df.sort_values('Date', kind='stable', ignore_index=True)
+        return df
+
+
+# =============================================================================
+# PARTITIONED MULTI-USER STORE
+# =============================================================================
+
+PARTITION_DIR = os.path.join(CACHE_DIR, 'users')
+
+# Raw CSV rows parsed and enriched at a time; bounds peak memory during ingest
+CHUNK_ROWS = 50_000
+
+
+def user_sources(exports_dir):
+    """Map each user sub-directory of exports_dir to its sorted CSV exports"""
+    sources = {}
+    for user in sorted(os.listdir(exports_dir)):
+        user_dir = os.path.join(exports_dir, user)
+        if os.path.isdir(user_dir):
+            paths = sorted(
+                os.path.join(user_dir, name) for name in os.listdir(user_dir)
+                if name.lower().endswith('.csv')
+            )
+            if paths:
+                sources[user] = paths
+    return sources
+
+
+def load_user_store(user, sources, build, rollups, variant='', chunk_rows=CHUNK_ROWS, store_dir=PARTITION_DIR):
+    """Return (YearPartitions of enriched rows, {name: rollup}) for one user's exports
+
+    The exports are streamed into the user's partitions only when they have
+    changed since the last ingest; otherwise the partitions are opened as is.
+    """
+    expected = {
+        'version': CACHE_VERSION,
+        'variant': variant,
+        'rollups': list(rollups),
+        'sources': [[path, file_fingerprint(path)] for path in sources],
+    }
+    user_dir = os.path.join(store_dir, user)
+    manifest = _read_manifest(os.path.join(user_dir, 'manifest.json'))
+    if manifest is None or {key: manifest.get(key) for key in expected} != expected:
+        manifest = ingest_exports(user, sources, build, rollups, expected, chunk_rows, store_dir)
+    return open_store(user_dir, manifest)
+
+
+def ingest_exports(user, sources, build, rollups, manifest, chunk_rows=CHUNK_ROWS, store_dir=PARTITION_DIR):
+    """Stream CSV exports chunk by chunk into <store_dir>/<user>/<year>/ Arrow parts
+
+    Each chunk is enriched, rolled up and written out on its own, so only
+    one chunk of rows is ever held in memory (plus the per-day rollups,
+    which are tiny). Exports may overlap in time: an interval start already
+    ingested from an earlier export (in sources order) is skipped, so
+    overlapping intervals count once. The parts of a leading run of exports
+    unchanged since the last ingest are kept and only re-rolled, so adding
+    a new export does not re-parse the old ones. The user's previous
+    partitions are swapped out only once the new ones are complete.
+    Returns the new manifest.
+    """
+    user_dir = os.path.join(store_dir, user)
+    tmp_dir = f"{user_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    previous = _read_manifest(os.path.join(user_dir, 'manifest.json'))
+    n_kept = _unchanged_sources(previous, manifest)
+
+    # Every interval start ingested so far, sorted; 8 bytes a row is all that
+    # grows with the history
+    seen = np.empty(0, dtype='datetime64[ns]')
+    parts, locations = [], set()
+    chunks = {name: [] for name in rollups}
+    for part in previous['parts'] if n_kept else []:
+        if part['source'] < n_kept:
+            df = _keep_part(user_dir, tmp_dir, part['path'])
+            parts.append(part)
+            locations.update(df['Location'].unique())
+            for name, rollup in rollups.items():
+                chunks[name].append(rollup(df))
+            seen = _merge_sorted(seen, raw_interval_starts(df).to_numpy())
+
+    for file_no, path in enumerate(sources):
+        if file_no < n_kept:
+            continue
+        for chunk_no, raw in enumerate(read_export(path, chunksize=chunk_rows)):
+            starts = raw_interval_starts(raw).to_numpy()
+            new = _unseen(starts, seen)
+            if not new.any():
+                continue
+            seen = _merge_sorted(seen, starts[new])
+            df = build(raw[new].reset_index(drop=True))
+            entries = write_parts(tmp_dir, df, f"part-{file_no:03d}-{chunk_no:05d}")
+            parts += [dict(entry, source=file_no) for entry in entries]
+            locations.update(df['Location'].unique())
+            for name, rollup in rollups.items():
+                chunks[name].append(rollup(df))
+
+    manifest = dict(manifest, parts=parts, locations=sorted(locations))
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, frames in chunks.items():
+        # A day that straddles two chunks has rollup rows from both; readers
+        # such as daily_totals() sum them anyway
+        frame = _concat(frames)
+        if not frame['Date'].is_monotonic_increasing:
+            frame = frame.sort_values('Date', kind='stable', ignore_index=True)
+        _write_frame(frame, _rollup_path(tmp_dir, name))
+    _write_manifest(tmp_dir, manifest)
+    _swap_dir(tmp_dir, user_dir)
+    return manifest
+
+
+def _unseen(starts, seen):
+    """Mask of starts neither in the sorted array seen nor repeated earlier in starts"""
+    idx = np.minimum(np.searchsorted(seen, starts), max(len(seen) - 1, 0))
+    found = seen[idx] == starts if len(seen) else np.zeros(len(starts), dtype=bool)
+    return ~found & ~pd.Series(starts).duplicated().to_numpy()
+
+
+def _merge_sorted(seen, starts):
+    """seen with starts (none of them already in it) inserted in order"""
+    starts = np.sort(starts)
+    return np.insert(seen, np.searchsorted(seen, starts), starts)
+
+
+def _unchanged_sources(previous, expected):
+    """How many leading sources the previous ingest read exactly as they are now"""
+    if previous is None or any(previous.get(key) != expected[key] for key in ('version', 'variant', 'rollups')):
+        return 0
+    # Stores written before parts recorded their source can't be split up
+    if any('source' not in part for part in previous['parts']):
+        return 0
+    n_kept = 0
+    for old, new in zip(previous['sources'], expected['sources']):
+        if old != new:
+            break
+        n_kept += 1
+    return n_kept
+
+
+def _keep_part(user_dir, tmp_dir, rel_path):
+    """Carry an existing part over into the new store and return its rows"""
+    path = os.path.join(tmp_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.link(os.path.join(user_dir, rel_path), path)
+    except OSError:
+        shutil.copyfile(os.path.join(user_dir, rel_path), path)
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+# =============================================================================
+# SHARED READ-ONLY FRAMES
+# =============================================================================
+
+def session_frames(frames):
+    """Per-session handles on frames shared by every session via st.cache_resource
+
+    Each handle is a shallow copy that shares every column buffer with the
+    cached frame, so handing one out costs nothing. Under pandas
+    copy-on-write, a session that writes to its handle (or to anything
+    sliced from it) copies the touched column first, and the shared
+    buffers are never modified.
+    """
+    if not pd.get_option('mode.copy_on_write'):
+        raise RuntimeError("session_frames() needs pd.options.mode.copy_on_write enabled")
+    return tuple(frame.copy(deep=False) for frame in frames)
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# STREAKS
+# =============================================================================
+
+def day_ordinals(dates):
+    """Dates (or a single date) as integer days since the epoch"""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def days_where(dates, mask):
+    """Sorted, unique day ordinals of the dates where mask is true
+
+    mask is any per-row condition, e.g. exercise > 0 or steps >= 10000, so
+    the same streak functions serve workouts and goal thresholds alike.
+    """
+    return np.unique(day_ordinals(dates)[np.asarray(mask, dtype=bool)])
+
+
+def run_lengths(days):
+    """Length of the run of consecutive days ending at each day of a sorted, unique array"""
+    if len(days) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # A run starts wherever the gap to the previous day isn't exactly one day
+    breaks = np.r_[True, np.diff(days) != 1]
+    run_start = np.flatnonzero(breaks)[np.cumsum(breaks) - 1]
+    return np.arange(len(days)) - run_start + 1
+
+
+def longest_streak(days):
+    """Longest run of consecutive days"""
+    return int(run_lengths(days).max()) if len(days) else 0
+
+
+def current_streak(days, today=None):
+    """Run of consecutive days ending today, or yesterday if today isn't active yet"""
+    today = day_ordinals(today if today is not None else datetime.now().date())
+    runs = run_lengths(days)
+    for anchor in (today, today - 1):
+        i = np.searchsorted(days, anchor)
+        if i < len(days) and days[i] == anchor:
+            return int(runs[i])
+    return 0
+
+
+# =============================================================================
+# GOALS
+# =============================================================================
+
+def hit_run_lengths(hits):
+    """Length of the run of consecutive hits ending at each row (0 on a miss)
+
+    Works column-wise on a 2-D array, so several goals share one pass.
+    """
+    hits = np.asarray(hits, dtype=bool)
+    rows = np.arange(len(hits)).reshape((-1,) + (1,) * (hits.ndim - 1))
+    # Position of the latest miss at or before each row (-1 before the first)
+    last_miss = np.maximum.accumulate(np.where(hits, -1, rows), axis=0)
+    return rows - last_miss
+
+
+def goal_progress(daily, goals):
+    """Trailing streak, best streak and hit rate of each (metric, threshold) goal
+
+    daily holds one date-sorted row per day, as from daily_totals(). Streaks
+    count consecutive rows, so a day missing from the filtered rollup
+    neither extends nor breaks one.
+    """
+    metrics = [metric for metric, _ in goals]
+    thresholds = np.array([threshold for _, threshold in goals], dtype=float)
+    hits = daily[metrics].to_numpy(dtype=float) >= thresholds
+    runs = hit_run_lengths(hits)
+    has_days = len(hits) > 0
+    return pd.DataFrame({
+        'metric': metrics,
+        'threshold': thresholds,
+        'trailing': runs[-1] if has_days else 0,
+        'best': runs.max(axis=0) if has_days else 0,
+        'hit_rate': hits.mean(axis=0) if has_days else 0.0,
+    })
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tests import the app modules, and the legacy reference implementations the
+# benchmark scripts keep for parity checks
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import DAY_MS, MAX_POINTS, bar_widths, downsample, lttb
+
+
+def daily_steps(n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2015-01-01', periods=n_days, freq='D')
+    return pd.DataFrame({'Date': dates, 'Step count': rng.gamma(4, 2500, n_days).astype(np.int32)})
+
+
+def test_lttb_keeps_the_ends_and_picks_one_point_per_bucket():
+    x = np.arange(500)
+    y = np.sin(x / 20.0)
+    kept = lttb(x, y, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 499
+    assert (np.diff(kept) > 0).all()
+
+
+@pytest.mark.parametrize('n_out', [2, 10, 11])
+def test_lttb_returns_every_point_when_nothing_needs_dropping(n_out):
+    assert list(lttb(np.arange(10), np.zeros(10), n_out)) == list(range(10))
+
+
+def test_short_frames_come_back_untouched():
+    daily = daily_steps(MAX_POINTS)
+    assert downsample(daily, 'Step count') is daily
+
+
+@pytest.mark.parametrize('n_days', [MAX_POINTS + 1, 3650, 20000])
+def test_long_frames_are_thinned_in_date_order_with_the_record_day(n_days):
+    daily = daily_steps(n_days, seed=n_days)
+    # Isolated record days a bucket average would flatten
+    spikes = np.random.default_rng(1).choice(n_days, 5, replace=False)
+    daily.loc[spikes, 'Step count'] = 50000 + np.arange(len(spikes), dtype=np.int32)
+
+    thinned = downsample(daily, 'Step count')
+    assert len(thinned) <= MAX_POINTS
+    assert thinned['Date'].is_monotonic_increasing
+    assert daily['Step count'].idxmax() in thinned.index
+    assert np.isin(spikes, thinned.index).all()
+
+
+def test_bar_widths_tile_the_date_axis():
+    dates = pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-05'])
+    assert bar_widths(dates) == [DAY_MS, 3 * DAY_MS, DAY_MS]
+    assert bar_widths(dates[:0]) == []
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+from bench_filters import legacy, make_filter_frame
+from filters import apply_filters
+
+FRAME = make_filter_frame(20000)
+FIRST, LAST = FRAME['Date'].iloc[0], FRAME['Date'].iloc[-1]
+
+
+@pytest.mark.parametrize('date_range', [
+    (),
+    (FIRST, LAST),
+    (FIRST + pd.Timedelta(days=30), FIRST + pd.Timedelta(days=90)),
+    # Ends before the first day and between two days
+    (FIRST - pd.Timedelta(days=5), FIRST + pd.Timedelta(days=3, hours=12)),
+])
+@pytest.mark.parametrize('activities', [[], ['Running'], ['Walking', 'Cycling']])
+@pytest.mark.parametrize('locations', [[], ['Place 3'], ['Place 1', 'Place 250', 'Nowhere']])
+def test_filters_match_the_original(date_range, activities, locations):
+    old = legacy(FRAME, date_range, activities, locations)
+    new = apply_filters(FRAME, date_range, activities, locations)
+    assert new.index.equals(old.index)
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from geopy.exc import GeocoderQueryError, GeocoderTimedOut
+
+import numpy as np
+
+from geocoding import LOOKUP_FAILED, GeocodeStore, OfflineGeocoder, fallback_label, nominatim_reverse, reverse_many
+
+
+def lookup(lat, lon):
+    """Stub service: a place at lat 1, no address at lat 2, down at lat 3, bad query at lat 4"""
+    if lat == 1:
+        return "Town, Country"
+    if lat == 2:
+        return None
+    if lat == 3:
+        raise GeocoderTimedOut("timed out")
+    raise GeocoderQueryError("bad query")
+
+
+def test_errors_are_told_apart_from_missing_addresses():
+    results = reverse_many(lookup, [(1, 0), (2, 0), (3, 0), (4, 0)], rate=1000, backoff=0)
+    assert results == {(1, 0): "Town, Country", (2, 0): None, (3, 0): LOOKUP_FAILED, (4, 0): LOOKUP_FAILED}
+
+
+def test_failed_lookups_are_not_stored(tmp_path):
+    store = GeocodeStore(str(tmp_path / 'geocode.sqlite'))
+    store.save({(1, 0): "Town, Country", (2, 0): None, (3, 0): LOOKUP_FAILED})
+    assert store.load() == {(1, 0): "Town, Country", (2, 0): None}
+
+
+def test_offline_geocoder_labels_the_nearest_city():
+    labels = OfflineGeocoder().reverse_many([
+        (51.51, -0.12),    # central London
+        (41.03, 28.98),    # Istanbul, not one of its districts
+        (48.86, 2.35),     # Paris
+        (0.0, -140.0),     # mid-Pacific
+    ])
+    assert list(labels) == ["London, United Kingdom", "Istanbul, Türkiye", "Paris, France", fallback_label(0.0, -140.0)]
+    assert len(OfflineGeocoder().reverse_many(np.empty((0, 2)))) == 0
+
+
+class StubNominatim:
+    """Answers reverse() with a fixed raw address"""
+
+    def __init__(self, address):
+        self.address = address
+
+    def reverse(self, query, **kwargs):
+        return SimpleNamespace(raw={'address': self.address}) if self.address is not None else None
+
+
+def test_nominatim_and_offline_labels_share_one_format():
+    address = {'town': ' Istanbul ', 'country': 'Türkiye'}
+    assert nominatim_reverse(StubNominatim(address), 41.03, 28.98) == OfflineGeocoder().reverse_many([(41.03, 28.98)])[0]
+    assert nominatim_reverse(StubNominatim({'country': 'Türkiye'}), 41.03, 28.98) == "Unknown, Türkiye"
+    assert nominatim_reverse(StubNominatim(None), 0.0, -140.0) is None
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_goals import GOALS, legacy, make_days, reference_best, vectorized
+from streaks import goal_progress
+
+
+def test_no_days():
+    progress = goal_progress(make_days(0, 1.0, np.random.default_rng(0)), GOALS)
+    assert list(progress['metric']) == [metric for metric, _ in GOALS]
+    assert (progress[['trailing', 'best', 'hit_rate']] == 0).all().all()
+
+
+def test_missing_days_neither_extend_nor_break_a_streak():
+    daily = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-06-01', '2024-06-02', '2024-06-05', '2024-06-06']),
+        'Step count': [12000, 3000, 11000, 10000],
+        'Heart Points': [30.0, 30.0, 30.0, 5.0],
+    })
+    progress = goal_progress(daily, GOALS).set_index('metric')
+    assert progress.at['Step count', 'trailing'] == 2
+    assert progress.at['Step count', 'best'] == 2
+    assert progress.at['Step count', 'hit_rate'] == 0.75
+    assert progress.at['Heart Points', 'trailing'] == 0
+    assert progress.at['Heart Points', 'best'] == 3
+
+
+@pytest.mark.parametrize('hit_rate', [0.0, 0.3, 0.9, 1.0])
+def test_matches_the_original_loops(hit_rate):
+    rng = np.random.default_rng(int(hit_rate * 10))
+    for _ in range(50):
+        df = make_days(int(rng.integers(0, 60)), hit_rate, rng)
+        assert vectorized(df) == legacy(df)
+        progress = goal_progress(df, GOALS)
+        for i, (metric, threshold) in enumerate(GOALS):
+            hits = (df[metric] >= threshold).to_numpy()
+            assert progress['best'][i] == reference_best(hits)
+            assert np.isclose(progress['hit_rate'][i], hits.mean() if len(hits) else 0.0)
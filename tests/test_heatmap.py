@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_heatmap import legacy, make_daily
+from rollups import HEATMAP_METRICS, heatmap_grids, heatmap_matrix
+
+DAILY = make_daily(4, np.random.default_rng(0))
+GRIDS = heatmap_grids(DAILY)
+
+
+def year_bounds(year, rng):
+    """The whole year plus ranges clipped inside it, some at the ISO weeks that straddle New Year"""
+    first = pd.Timestamp(f"{year}-01-01")
+    bounds = [(first, pd.Timestamp(f"{year}-12-31"))]
+    for _ in range(10):
+        start, end = np.sort(rng.integers(0, 365, 2))
+        bounds.append((first + pd.Timedelta(days=int(start)), first + pd.Timedelta(days=int(end))))
+    return bounds
+
+
+@pytest.mark.parametrize('year', sorted(GRIDS))
+def test_matches_the_original_pivot(year):
+    for year_start, year_end in year_bounds(year, np.random.default_rng(year)):
+        for metric in HEATMAP_METRICS:
+            old = legacy(DAILY, year, metric, year_start, year_end)
+            matrix, weeks = heatmap_matrix(GRIDS[year], metric, year_start, year_end)
+            # The pivot drops weekdays outside short ranges; the grid keeps all seven
+            assert list(weeks) == list(old.columns)
+            np.testing.assert_allclose(matrix, old.reindex(range(7)).to_numpy(dtype=float), rtol=1e-6)
+
+
+@pytest.mark.parametrize('year', sorted(GRIDS))
+def test_date_window_matches_the_pivot_of_the_window(year):
+    # Masking the grid of every day equals pivoting only the window's days
+    first, last = pd.Timestamp(f"{year}-01-01"), pd.Timestamp(f"{year}-12-31")
+    window = (first + pd.Timedelta(days=40), first + pd.Timedelta(days=200))
+    in_window = DAILY[DAILY['Date'].between(*window)]
+    for metric in HEATMAP_METRICS:
+        old = legacy(in_window, year, metric, first, last)
+        matrix, weeks = heatmap_matrix(GRIDS[year], metric, first, last, window)
+        assert list(weeks) == list(old.columns)
+        np.testing.assert_allclose(matrix, old.reindex(range(7)).to_numpy(dtype=float), rtol=1e-6)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from bench_hero import date_ranges, legacy, make_daily
+from rollups import DAILY_METRICS, DailyPrefix
+
+
+def test_range_totals_match_summing_the_filtered_days():
+    rng = np.random.default_rng(0)
+    daily = make_daily(3, rng)
+    prefix = DailyPrefix(daily)
+    for date_range in date_ranges(daily, rng):
+        expected, got = legacy(daily, date_range), prefix.totals(date_range)
+        assert got['Step count'] == expected['Step count']
+        assert got['days'] == expected['days']
+        assert got['active_days'] == expected['active_days']
+        for metric in DAILY_METRICS:
+            assert np.isclose(got[metric], expected[metric], rtol=1e-5), (date_range, metric)
+
+
+def test_no_days():
+    totals = DailyPrefix(make_daily(1, np.random.default_rng(0)).iloc[:0]).totals([])
+    assert totals['days'] == totals['active_days'] == 0
+    assert all(totals[metric] == 0 for metric in DAILY_METRICS)
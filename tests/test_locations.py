@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from bench_locations import legacy, location_rollup, make_rows, selections
+from rollups import LOCATION_STATS, LocationIndex
+
+ROWS = make_rows(1, 300, np.random.default_rng(0))
+INDEX = LocationIndex(location_rollup(ROWS))
+
+
+@pytest.mark.parametrize('name', sorted(selections(ROWS)))
+def test_top_locations_match_the_original_groupby(name):
+    date_range, activities, locations = selections(ROWS)[name]
+    expected = legacy(ROWS, date_range, activities, locations)
+    top = INDEX.top(date_range, activities, locations)
+    assert list(top['Location']) == [str(loc) for loc in expected['Location']]
+    for col in LOCATION_STATS:
+        np.testing.assert_allclose(top[col], expected[col], rtol=1e-4)
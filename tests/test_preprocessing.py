@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+
+from bench_preprocessing import legacy, make_frame, vectorized
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_activity_and_location_columns_match_the_row_wise_original(seed):
+    base = make_frame(5000, seed=seed)
+    coords = base[['Low latitude (deg)', 'Low longitude (deg)']].round(2).drop_duplicates().dropna()
+    # Leave some coordinates out of the map so they fall back to "Unknown"
+    location_map = {(lat, lon): f"Place {i}" for i, (lat, lon) in enumerate(coords.values.tolist()[::2])}
+
+    old = legacy(base.copy(), location_map)
+    new = vectorized(base.copy(), location_map)
+    cols = ['Activity Type', 'Primary Activity', 'Location']
+    pd.testing.assert_frame_equal(old[cols], new[cols].astype(object))
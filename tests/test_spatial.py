@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_map import legacy, make_points
+from filters import apply_filters
+from spatial import MAP_LEVELS, MAP_SUMS, MAX_MAP_CELLS, build_map_rollup, map_cells, split_levels, stored_level, zoom_level
+
+POINTS = make_points(1, np.random.default_rng(0))
+LEVELS = split_levels(build_map_rollup(POINTS))
+
+
+@pytest.mark.parametrize('zoom', range(1, 17))
+def test_every_zoom_has_a_stored_level_at_least_as_fine(zoom):
+    assert stored_level(zoom) in MAP_LEVELS
+    assert stored_level(zoom) >= zoom_level(zoom)
+
+
+def test_levels_keep_date_order():
+    assert all(rows['Date'].is_monotonic_increasing for rows in LEVELS.values())
+
+
+@pytest.mark.parametrize('zoom', [1, 3, 8, 12, 16])
+def test_cells_keep_the_totals_of_the_original_per_fix_markers(zoom):
+    date_range = [POINTS['Date'].max() - pd.Timedelta(days=90), POINTS['Date'].max()]
+    per_fix = legacy(apply_filters(POINTS, date_range, [], []))
+    cells = map_cells(apply_filters(LEVELS[stored_level(zoom)], date_range, [], []), zoom)
+    assert len(cells) <= MAX_MAP_CELLS
+    for col in MAP_SUMS:
+        assert np.isclose(cells[col].sum(), per_fix[col].sum(), rtol=1e-4)
+
+
+def test_cells_of_a_coarser_zoom_match_shifting_a_finer_stored_level():
+    # Zoom 5 is level 1, shifted down from stored level 4
+    cells = map_cells(LEVELS[stored_level(5)], 5)
+    lat, lon = POINTS['Low latitude (deg)'], POINTS['Low longitude (deg)']
+    expected = POINTS.groupby([np.floor((lat + 90) * 2), np.floor((lon + 180) * 2)])['Step count'].sum()
+    assert sorted(cells['Step count']) == sorted(expected)
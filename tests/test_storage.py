@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import ACTIVITY_COLUMNS, add_activity_columns
+from rollups import build_daily_rollup
+from schema import EXPORT_DTYPES
+from spatial import MAP_LEVELS, build_map_rollup
+from storage import load_enriched, load_user_store
+
+
+def export_rows(first_day, days, steps=100):
+    """Raw export rows: one 15-minute interval per hour, every metric set"""
+    slot = np.arange(days * 24)
+    dates = pd.Timestamp(first_day) + pd.to_timedelta(slot // 24, unit='D')
+    starts = pd.to_datetime((slot % 24) * 3600, unit='s')
+    rows = pd.DataFrame({
+        'Date': dates.strftime('%d/%m/%y'),
+        'Start time': starts.strftime('%H:%M:%S.000'),
+        'End time': (starts + pd.Timedelta(minutes=15)).strftime('%H:%M:%S.000'),
+    })
+    for col in list(EXPORT_DTYPES)[3:]:
+        rows[col] = 1.0
+    rows['Step count'] = float(steps)
+    rows['Walking duration (ms)'] = 60000.0
+    # A walk east along a line of latitude, over several map cells a day
+    rows['Low latitude (deg)'] = 51.5
+    rows['Low longitude (deg)'] = (slot % 24) * 0.01
+    return rows
+
+
+def write_csv(path, rows):
+    rows.to_csv(path, index=False)
+
+
+ROLLUPS = {'daily': build_daily_rollup, 'cells': build_map_rollup}
+
+
+def build(raw):
+    """A minimal enrichment with every column the store and the rollup need"""
+    df = raw.copy()
+    add_activity_columns(df)
+    df['Total Exercise (min)'] = sum(df[col].fillna(0) for _, col in ACTIVITY_COLUMNS) / 60000
+    df['Location'] = pd.Categorical(['Unknown'] * len(df))
+    return df.sort_values('Date', kind='stable', ignore_index=True)
+
+
+def check_rollups(history, rollups):
+    """Each stored rollup sums to the same totals as rolling up every row afresh"""
+    rows = history.read_range()
+    assert rows['Step count'].sum() == rollups['daily']['Step count'].sum()
+    cells, expected = rollups['cells'], build_map_rollup(rows)
+    for level in MAP_LEVELS:
+        got = cells[cells['Level'] == level].groupby(['Date', 'Row', 'Col'])[['Step count', 'Fixes']].sum()
+        want = expected[expected['Level'] == level].groupby(['Date', 'Row', 'Col'])[['Step count', 'Fixes']].sum()
+        pd.testing.assert_frame_equal(got, want)
+    assert cells['Date'].is_monotonic_increasing
+
+
+def total_steps(source, cache_dir):
+    history, rollups = load_enriched(source, build, ROLLUPS, cache_dir=cache_dir)
+    check_rollups(history, rollups)
+    return rollups['daily']['Step count'].sum()
+
+
+def test_appended_rows_are_ingested_incrementally(tmp_path):
+    source = str(tmp_path / 'export.csv')
+    cache_dir = str(tmp_path / 'cache')
+    write_csv(source, export_rows('2024-01-01', 3))
+    assert total_steps(source, cache_dir) == 3 * 24 * 100
+
+    with open(source, 'a') as f:
+        export_rows('2024-01-04', 2).to_csv(f, index=False, header=False)
+    assert total_steps(source, cache_dir) == 5 * 24 * 100
+    # The appended days went into a second part instead of a rebuild
+    assert len(os.listdir(os.path.join(cache_dir, 'export', '2024'))) == 2
+
+
+def test_edited_csv_rebuilds_the_store(tmp_path):
+    source = str(tmp_path / 'export.csv')
+    cache_dir = str(tmp_path / 'cache')
+    write_csv(source, export_rows('2024-01-01', 3))
+    assert total_steps(source, cache_dir) == 3 * 24 * 100
+
+    write_csv(source, export_rows('2024-01-01', 3, steps=200))
+    assert total_steps(source, cache_dir) == 3 * 24 * 200
+    # Still right when the store is opened again, e.g. after a restart
+    assert total_steps(source, cache_dir) == 3 * 24 * 200
+
+
+def test_truncated_csv_rebuilds_the_store(tmp_path):
+    source = str(tmp_path / 'export.csv')
+    cache_dir = str(tmp_path / 'cache')
+    write_csv(source, export_rows('2024-01-01', 3))
+    assert total_steps(source, cache_dir) == 3 * 24 * 100
+
+    write_csv(source, export_rows('2024-01-01', 1))
+    assert total_steps(source, cache_dir) == 24 * 100
+
+    # Growing again from the truncated file is an append once more
+    with open(source, 'a') as f:
+        export_rows('2024-01-02', 1, steps=300).to_csv(f, index=False, header=False)
+    assert total_steps(source, cache_dir) == 24 * 100 + 24 * 300
+
+
+def user_steps(sources, store_dir):
+    history, rollups = load_user_store('alice', sources, build, ROLLUPS, chunk_rows=30, store_dir=store_dir)
+    check_rollups(history, rollups)
+    return history.read_range(), rollups['daily']['Step count'].sum()
+
+
+def test_overlapping_exports_count_each_interval_once(tmp_path):
+    store_dir = str(tmp_path / 'users')
+    first, second = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    # Days 2-3 are in both exports
+    write_csv(first, export_rows('2024-01-01', 3))
+    write_csv(second, export_rows('2024-01-02', 3))
+
+    rows, steps = user_steps([first, second], store_dir)
+    assert steps == 4 * 24 * 100
+    assert not (rows['Date'] + pd.to_timedelta(rows['Start time'], unit='s')).duplicated().any()
+
+
+def test_new_export_keeps_the_parts_of_unchanged_ones(tmp_path):
+    store_dir = str(tmp_path / 'users')
+    first, second = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    write_csv(first, export_rows('2024-01-01', 3))
+    user_steps([first], store_dir)
+    part = os.path.join(store_dir, 'alice', '2024', 'part-000-00000.arrow')
+    inode = os.stat(part).st_ino
+
+    write_csv(second, export_rows('2024-01-03', 2))
+    _, steps = user_steps([first, second], store_dir)
+    assert steps == 4 * 24 * 100
+    # The first export's part was carried over, not parsed and written again
+    assert os.stat(part).st_ino == inode
+
+
+def test_rebuild_removes_caches_of_earlier_layouts(tmp_path):
+    source = str(tmp_path / 'export.csv')
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    legacy = ['export-0123456789abcdef.parquet', 'export.parquet', 'export.daily.parquet', 'export.json']
+    for name in legacy + ['other.parquet']:
+        (cache_dir / name).write_bytes(b'')
+    write_csv(source, export_rows('2024-01-01', 1))
+
+    total_steps(source, str(cache_dir))
+    assert sorted(os.listdir(cache_dir)) == ['export', 'other.parquet']
+
+
+def test_repeated_intervals_across_chunks_count_once(tmp_path):
+    store_dir = str(tmp_path / 'users')
+    source = str(tmp_path / 'a.csv')
+    # The second day repeats, 48 rows apart, so chunks of 30 split the copies
+    rows = export_rows('2024-01-01', 2)
+    write_csv(source, pd.concat([rows, rows.tail(24)], ignore_index=True))
+
+    _, steps = user_steps([source], store_dir)
+    assert steps == 2 * 24 * 100
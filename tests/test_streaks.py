@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_streaks import legacy, make_days, vectorized
+from streaks import current_streak, day_ordinals, days_where, longest_streak
+
+TODAY = pd.Timestamp('2024-06-15')
+
+
+def days(*offsets):
+    """Sorted, unique day ordinals offsets days before TODAY"""
+    return np.unique(day_ordinals(TODAY) - np.array(offsets, dtype=np.int64))
+
+
+def test_no_days():
+    assert longest_streak(days()) == 0
+    assert current_streak(days(), today=TODAY) == 0
+
+
+def test_single_day():
+    assert longest_streak(days(0)) == 1
+    assert current_streak(days(0), today=TODAY) == 1
+    assert current_streak(days(10), today=TODAY) == 0
+
+
+def test_streak_still_counts_until_today_is_over():
+    # Active through yesterday: today just isn't done yet
+    assert current_streak(days(1, 2, 3), today=TODAY) == 3
+    # Active today after a gap yesterday: only today counts
+    assert current_streak(days(0, 2, 3), today=TODAY) == 1
+    # Last active the day before yesterday: the streak is broken
+    assert current_streak(days(2, 3, 4), today=TODAY) == 0
+
+
+def test_longest_streak_picks_the_longest_run():
+    assert longest_streak(days(0, 1, 5, 6, 7, 8, 20)) == 4
+
+
+def test_unsorted_and_repeated_dates():
+    dates = pd.to_datetime(['2024-06-14', '2024-06-12', '2024-06-15', '2024-06-13', '2024-06-15', '2024-06-01'])
+    active = days_where(dates, [True] * len(dates))
+    assert list(active) == sorted(set(active))
+    assert longest_streak(active) == 4
+    assert current_streak(active, today=TODAY) == 4
+
+
+def test_inactive_rows_are_ignored():
+    dates = pd.to_datetime(['2024-06-13', '2024-06-14', '2024-06-15'])
+    active = days_where(dates, np.array([10.0, 0.0, 5.0]) > 0)
+    assert longest_streak(active) == 1
+    assert current_streak(active, today=TODAY) == 1
+
+
+@pytest.mark.parametrize('end_offset', [0, 1, 2, 400])
+@pytest.mark.parametrize('active_rate', [0.0, 0.3, 0.9, 1.0])
+def test_matches_the_original_loops(end_offset, active_rate):
+    rng = np.random.default_rng(end_offset * 10 + int(active_rate * 10))
+    for _ in range(25):
+        df = make_days(int(rng.integers(0, 60)), active_rate, end_offset, rng)
+        assert vectorized(df) == legacy(df)